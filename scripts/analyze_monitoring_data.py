@@ -6,32 +6,48 @@
 """
 
 import os
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 from datetime import datetime
+from render_profiles import add_render_profile_argument, save_figure
+import stage_profiler
+from font_cache import apply_japanese_font
+import system_sampler
 import json
+import argparse
 import warnings
 warnings.filterwarnings('ignore')
 
-# 日本語フォント設定
-plt.rcParams['font.family'] = ['Hiragino Sans', 'Arial Unicode MS', 'DejaVu Sans']
+# pandas・matplotlib と日本語フォントの設定は使うメソッドの中で読み込む (--help を速くする)
 
 class MonitoringDataAnalyzer:
-    def __init__(self, log_dir):
+    def __init__(self, log_dir, render_profile='publication'):
         self.log_dir = Path(log_dir)
+        self.render_profile = render_profile
         self.monitoring_data = {}
         self.analysis_results = {}
+        self.network_cumulative = None  # None: 累積値か区間ごとの値かを列ごとに判定
         
     def load_monitoring_data(self):
         """監視データを読み込み"""
+        import pandas as pd
         print("🔍 監視データを読み込み中...")
         
+        # system_sampler のバイナリトレース (あれば CSV より優先)
+        try:
+            traces = system_sampler.load_traces(self.log_dir)
+        except Exception as e:
+            print(f"❌ システムトレース読み込みエラー: {e}")
+            traces = None
+        if traces is not None:
+            self.monitoring_data['system'], network = traces
+            print(f"✅ システムトレース読み込み: {len(self.monitoring_data['system'])} サンプル")
+            if network is not None:
+                self.monitoring_data['network'] = network
+                self.network_cumulative = True  # トレースは常に累積カウンタ
+        
         # システム監視データ
         system_monitor_files = list(self.log_dir.glob("system_monitor_*.csv"))
-        if system_monitor_files:
+        if system_monitor_files and 'system' not in self.monitoring_data:
             system_file = system_monitor_files[0]
             try:
                 self.monitoring_data['system'] = pd.read_csv(system_file)
@@ -41,7 +57,7 @@ class MonitoringDataAnalyzer:
         
         # ネットワーク監視データ
         network_stats_file = self.log_dir / "network_stats.csv"
-        if network_stats_file.exists():
+        if network_stats_file.exists() and 'network' not in self.monitoring_data:
             try:
                 self.monitoring_data['network'] = pd.read_csv(network_stats_file)
                 print(f"✅ ネットワーク監視データ読み込み: {len(self.monitoring_data['network'])} 行")
@@ -113,6 +129,7 @@ class MonitoringDataAnalyzer:
         
     def analyze_network_performance(self):
         """ネットワーク性能の分析"""
+        import network_rates
         print("\n📡 ネットワーク性能分析を開始...")
         
         if 'network' not in self.monitoring_data:
@@ -121,77 +138,80 @@ class MonitoringDataAnalyzer:
         
         df = self.monitoring_data['network']
         
+        # 累積カウンタを区間ごとの率 (bytes/s, packets/s) に変換 (折り返し・リセット対応)
+        rates = network_rates.counter_rates(df, cumulative=self.network_cumulative)
+        
         # インターフェース別の統計
-        interface_stats = {}
-        for interface in df['interface'].unique():
-            interface_data = df[df['interface'] == interface]
-            interface_stats[interface] = {
-                'rx_bytes_total': interface_data['rx_bytes'].sum(),
-                'tx_bytes_total': interface_data['tx_bytes'].sum(),
-                'rx_packets_total': interface_data['rx_packets'].sum(),
-                'tx_packets_total': interface_data['tx_packets'].sum(),
-                'avg_rx_rate': interface_data['rx_bytes'].mean(),
-                'avg_tx_rate': interface_data['tx_bytes'].mean()
-            }
+        interface_stats = network_rates.summarize(rates)
         
-        # ネットワーク変動性
-        network_variability = {
-            'rx_bytes_cv': df['rx_bytes'].std() / df['rx_bytes'].mean() if df['rx_bytes'].mean() > 0 else 0,
-            'tx_bytes_cv': df['tx_bytes'].std() / df['tx_bytes'].mean() if df['tx_bytes'].mean() > 0 else 0,
-            'rx_packets_cv': df['rx_packets'].std() / df['rx_packets'].mean() if df['rx_packets'].mean() > 0 else 0,
-            'tx_packets_cv': df['tx_packets'].std() / df['tx_packets'].mean() if df['tx_packets'].mean() > 0 else 0
-        }
+        # ネットワーク変動性 (率の変動係数)
+        network_variability = {}
+        for counter in ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets'):
+            column = rates[f'{counter}_per_s']
+            mean = column.mean()
+            network_variability[f'{counter}_cv'] = column.std() / mean if mean > 0 else 0
         
+        rates_path = self.log_dir / "network_rates.csv"
+        rates.to_csv(rates_path, index=False)
         self.analysis_results['network'] = {
             'interface_stats': interface_stats,
             'variability': network_variability,
-            'data': df
+            'data': df,
+            'rates': rates
         }
         
-        print("✅ ネットワーク性能分析完了")
+        print(f"✅ ネットワーク性能分析完了: {rates_path}")
         
     def analyze_correlation_with_performance(self):
-        """性能との相関分析"""
+        """性能との相関分析 (監視サンプルの時間窓ごとにリクエストを集計して相関)"""
+        import monitor_correlation
+        import network_rates
         print("\n📊 性能との相関分析を開始...")
         
-        # ベンチマーク結果ファイルを検索
-        csv_files = list(self.log_dir.glob("*.csv"))
-        benchmark_data = None
-        
-        for csv_file in csv_files:
-            if 'h2_' in csv_file.name or 'h3_' in csv_file.name:
-                try:
-                    df = pd.read_csv(csv_file, header=None, sep='\t')
-                    df.columns = ['timestamp', 'status_code', 'response_time']
-                    df['protocol'] = 'HTTP/2' if 'h2_' in csv_file.name else 'HTTP/3'
-                    df['response_time_ms'] = df['response_time'] / 1000
-                    
-                    if benchmark_data is None:
-                        benchmark_data = df
-                    else:
-                        benchmark_data = pd.concat([benchmark_data, df])
-                except Exception as e:
-                    print(f"⚠️ ベンチマークデータ読み込みエラー ({csv_file.name}): {e}")
-        
-        if benchmark_data is not None and 'system' in self.analysis_results:
-            # システムリソースとベンチマーク性能の相関
-            system_data = self.analysis_results['system']['data']
-            
-            # 時間ベースでの相関分析（簡易版）
-            correlation_analysis = {
-                'cpu_vs_response_time': np.corrcoef(system_data['cpu_usage'], 
-                                                   benchmark_data['response_time_ms'].iloc[:len(system_data)])[0,1] if len(system_data) > 0 else 0,
-                'memory_vs_response_time': np.corrcoef(system_data['memory_usage'], 
-                                                      benchmark_data['response_time_ms'].iloc[:len(system_data)])[0,1] if len(system_data) > 0 else 0
-            }
-            
-            self.analysis_results['correlation'] = correlation_analysis
-            print("✅ 性能との相関分析完了")
-        else:
+        # ベンチマーク結果ファイル (h2load --log-file のリクエストごとの記録) を検索
+        request_files = [(csv_file, 'HTTP/2' if 'h2_' in csv_file.name else 'HTTP/3')
+                         for csv_file in sorted(self.log_dir.glob("*.csv"))
+                         if 'h2_' in csv_file.name or 'h3_' in csv_file.name]
+        try:
+            benchmark_data = monitor_correlation.load_requests(request_files)
+        except Exception as e:
+            print(f"⚠️ ベンチマークデータ読み込みエラー: {e}")
+            benchmark_data = None
+        
+        if benchmark_data is None or 'system' not in self.analysis_results:
             print("⚠️ ベンチマークデータまたはシステムデータが不足しています")
+            return
+        
+        # 監視サンプルの時間窓にリクエストを割り当て、窓ごとのレイテンシと相関を計算
+        system_data = self.analysis_results['system']['data']
+        joined = monitor_correlation.window_latency(system_data, benchmark_data)
+        metrics = [c for c in system_data.select_dtypes('number').columns if c != 'timestamp']
+        if 'network' in self.analysis_results:
+            # ループバック以外のインターフェース合計の率を同じ時間窓で平均して指標に追加
+            totals = network_rates.total_rates(self.analysis_results['network']['rates'])
+            columns = [c for c in totals.columns if c != 'time']
+            joined = monitor_correlation.window_means(joined, totals, columns, prefix='net_')
+            metrics += [f'net_{c}' for c in columns]
+        protocols = sorted(benchmark_data['protocol'].unique())
+        correlation = monitor_correlation.correlate(joined, metrics, protocols)
+        windows = {}
+        for protocol in protocols:
+            column = f"{protocol.lower().replace('/', '')}_requests"
+            windows[protocol] = int((joined[column] > 0).sum()) if column in joined else 0
+        if not any(windows.values()):
+            print("⚠️ 監視期間と重なるリクエストがありません (タイムスタンプを確認してください)")
+            return
+        
+        joined_path = self.log_dir / "monitoring_latency_windows.csv"
+        joined.to_csv(joined_path, index=False)
+        self.analysis_results['correlation'] = {'protocols': correlation, 'windows': windows,
+                                                'joined_file': joined_path}
+        print(f"✅ 性能との相関分析完了: {joined_path}")
         
     def generate_monitoring_report(self):
         """監視データ分析レポートを生成"""
+        import monitor_correlation
+        import pandas as pd
         print("\n📄 監視データ分析レポートを生成中...")
         
         # レポート内容
@@ -232,10 +252,14 @@ class MonitoringDataAnalyzer:
             # Dockerコンテナ数
             container_stats = system_stats['docker_containers']
             report_content.append("🐳 Dockerコンテナ数:")
-            report_content.append(f"  - 平均: {container_stats['mean']:.1f}")
-            report_content.append(f"  - 標準偏差: {container_stats['std']:.2f}")
-            report_content.append(f"  - 変動係数: {container_stats['cv']:.3f}")
-            report_content.append(f"  - 範囲: {container_stats['min']:.0f} 〜 {container_stats['max']:.0f}")
+            if pd.isna(container_stats['mean']):
+                # system_sampler で docker の cgroup が見つからなかった場合
+                report_content.append("  - 記録なし")
+            else:
+                report_content.append(f"  - 平均: {container_stats['mean']:.1f}")
+                report_content.append(f"  - 標準偏差: {container_stats['std']:.2f}")
+                report_content.append(f"  - 変動係数: {container_stats['cv']:.3f}")
+                report_content.append(f"  - 範囲: {container_stats['min']:.0f} 〜 {container_stats['max']:.0f}")
             report_content.append("")
             
             # 異常検出
@@ -256,6 +280,18 @@ class MonitoringDataAnalyzer:
             report_content.append(f"  - 送信バイト変動係数: {network_variability['tx_bytes_cv']:.3f}")
             report_content.append(f"  - 受信パケット変動係数: {network_variability['rx_packets_cv']:.3f}")
             report_content.append(f"  - 送信パケット変動係数: {network_variability['tx_packets_cv']:.3f}")
+            report_content.append("📊 インターフェース別の平均レート (ピーク):")
+            for interface, entry in self.analysis_results['network']['interface_stats'].items():
+                line = (f"  - {interface}: 受信 {entry['mean_rx_bytes_per_s'] / 1e6:.3f} MB/s "
+                        f"({entry['peak_rx_bytes_per_s'] / 1e6:.3f}), "
+                        f"送信 {entry['mean_tx_bytes_per_s'] / 1e6:.3f} MB/s "
+                        f"({entry['peak_tx_bytes_per_s'] / 1e6:.3f}), "
+                        f"{entry['mean_rx_packets_per_s']:.0f}/{entry['mean_tx_packets_per_s']:.0f} pkt/s")
+                for ratio, label in (('drop_ratio', 'ドロップ率'), ('error_ratio', 'エラー率'),
+                                     ('retransmit_ratio', '再送率')):
+                    if ratio in entry:
+                        line += f", {label} {entry[ratio] * 100:.3f}%"
+                report_content.append(line)
             report_content.append("")
         
         # 相関分析結果
@@ -264,8 +300,18 @@ class MonitoringDataAnalyzer:
             report_content.append("-" * 40)
             
             correlation = self.analysis_results['correlation']
-            report_content.append(f"• CPU使用率 vs レスポンス時間: {correlation['cpu_vs_response_time']:.3f}")
-            report_content.append(f"• メモリ使用率 vs レスポンス時間: {correlation['memory_vs_response_time']:.3f}")
+            report_content.append("監視サンプルの時間窓ごとの平均レスポンス時間との相関 "
+                                  f"(lag > 0: 指標が lag サンプル先行, {monitor_correlation.MIN_REQUESTS} 件未満の窓は除外)")
+            for protocol, metrics in correlation['protocols'].items():
+                report_content.append(f"[{protocol}] 時間窓: {correlation['windows'][protocol]}")
+                for metric, result in metrics.items():
+                    if result['pearson'] is None:
+                        report_content.append(f"  • {metric}: 計算不可 (変動なし、または窓が不足)")
+                        continue
+                    best = result['best_lag']
+                    report_content.append(f"  • {metric} vs レスポンス時間: Pearson {result['pearson']:+.3f}, "
+                                          f"Spearman {result['spearman']:+.3f} ({result['windows']} 窓), "
+                                          f"最大 |r| は lag {best:+d}: {result['lags'][best]:+.3f}")
             report_content.append("")
         
         # 総合評価
@@ -338,6 +384,9 @@ class MonitoringDataAnalyzer:
         
     def generate_monitoring_plots(self):
         """監視データの可視化グラフを生成"""
+        import matplotlib.pyplot as plt
+        # 日本語フォント設定 (解決結果は font_cache にキャッシュ)
+        apply_japanese_font()
         print("📊 監視データ可視化グラフを生成中...")
         
         # システムリソース監視グラフ
@@ -380,7 +429,7 @@ class MonitoringDataAnalyzer:
             
             plt.tight_layout()
             plot_path = self.log_dir / "system_monitoring_analysis.png"
-            plt.savefig(plot_path, dpi=300, bbox_inches='tight')
+            save_figure(fig, plot_path, self.render_profile)
             plt.close()
             
             print(f"✅ システム監視グラフ保存: {plot_path}")
@@ -390,52 +439,58 @@ class MonitoringDataAnalyzer:
             fig, axes = plt.subplots(2, 2, figsize=(15, 12))
             fig.suptitle('ネットワーク監視結果', fontsize=16, fontweight='bold')
             
-            df = self.analysis_results['network']['data']
+            rates = self.analysis_results['network']['rates']
+            elapsed = rates['time'] - rates['time'].min()
+            interfaces = list(rates['interface'].unique()[:3])  # 上位3つのインターフェース
             
-            # 受信バイト数の推移
+            # 受信レートの推移
             ax1 = axes[0, 0]
-            for interface in df['interface'].unique()[:3]:  # 上位3つのインターフェース
-                interface_data = df[df['interface'] == interface]
-                ax1.plot(interface_data.index, interface_data['rx_bytes'], label=interface, alpha=0.7)
-            ax1.set_title('受信バイト数の推移')
-            ax1.set_ylabel('受信バイト数')
+            for interface in interfaces:
+                mask = rates['interface'] == interface
+                ax1.plot(elapsed[mask], rates.loc[mask, 'rx_bytes_per_s'] / 1e6, label=interface, alpha=0.7)
+            ax1.set_title('受信レートの推移')
+            ax1.set_xlabel('経過時間 (秒)')
+            ax1.set_ylabel('受信レート (MB/s)')
             ax1.legend()
             ax1.grid(True, alpha=0.3)
             
-            # 送信バイト数の推移
+            # 送信レートの推移
             ax2 = axes[0, 1]
-            for interface in df['interface'].unique()[:3]:
-                interface_data = df[df['interface'] == interface]
-                ax2.plot(interface_data.index, interface_data['tx_bytes'], label=interface, alpha=0.7)
-            ax2.set_title('送信バイト数の推移')
-            ax2.set_ylabel('送信バイト数')
+            for interface in interfaces:
+                mask = rates['interface'] == interface
+                ax2.plot(elapsed[mask], rates.loc[mask, 'tx_bytes_per_s'] / 1e6, label=interface, alpha=0.7)
+            ax2.set_title('送信レートの推移')
+            ax2.set_xlabel('経過時間 (秒)')
+            ax2.set_ylabel('送信レート (MB/s)')
             ax2.legend()
             ax2.grid(True, alpha=0.3)
             
-            # パケット数の推移
+            # パケットレートの推移
             ax3 = axes[1, 0]
-            for interface in df['interface'].unique()[:3]:
-                interface_data = df[df['interface'] == interface]
-                ax3.plot(interface_data.index, interface_data['rx_packets'], label=f"{interface}_rx", alpha=0.7)
-                ax3.plot(interface_data.index, interface_data['tx_packets'], label=f"{interface}_tx", alpha=0.7, linestyle='--')
-            ax3.set_title('パケット数の推移')
-            ax3.set_ylabel('パケット数')
+            for interface in interfaces:
+                mask = rates['interface'] == interface
+                ax3.plot(elapsed[mask], rates.loc[mask, 'rx_packets_per_s'], label=f"{interface}_rx", alpha=0.7)
+                ax3.plot(elapsed[mask], rates.loc[mask, 'tx_packets_per_s'], label=f"{interface}_tx", alpha=0.7,
+                         linestyle='--')
+            ax3.set_title('パケットレートの推移')
+            ax3.set_xlabel('経過時間 (秒)')
+            ax3.set_ylabel('パケット/秒')
             ax3.legend()
             ax3.grid(True, alpha=0.3)
             
-            # ネットワーク使用量の分布
+            # レートの分布
             ax4 = axes[1, 1]
-            ax4.hist(df['rx_bytes'], bins=20, alpha=0.7, label='受信', color='blue')
-            ax4.hist(df['tx_bytes'], bins=20, alpha=0.7, label='送信', color='red')
-            ax4.set_title('ネットワーク使用量の分布')
-            ax4.set_xlabel('バイト数')
+            ax4.hist(rates['rx_bytes_per_s'].dropna() / 1e6, bins=20, alpha=0.7, label='受信', color='blue')
+            ax4.hist(rates['tx_bytes_per_s'].dropna() / 1e6, bins=20, alpha=0.7, label='送信', color='red')
+            ax4.set_title('ネットワークレートの分布')
+            ax4.set_xlabel('レート (MB/s)')
             ax4.set_ylabel('頻度')
             ax4.legend()
             ax4.grid(True, alpha=0.3)
             
             plt.tight_layout()
             plot_path = self.log_dir / "network_monitoring_analysis.png"
-            plt.savefig(plot_path, dpi=300, bbox_inches='tight')
+            save_figure(fig, plot_path, self.render_profile)
             plt.close()
             
             print(f"✅ ネットワーク監視グラフ保存: {plot_path}")
@@ -444,22 +499,21 @@ class MonitoringDataAnalyzer:
         """完全な監視データ分析を実行"""
         print("🚀 監視データ分析を開始...")
         
-        self.load_monitoring_data()
-        self.analyze_system_resources()
-        self.analyze_network_performance()
-        self.analyze_correlation_with_performance()
-        self.generate_monitoring_report()
+        for step in (self.load_monitoring_data, self.analyze_system_resources, self.analyze_network_performance,
+                     self.analyze_correlation_with_performance, self.generate_monitoring_report):
+            with stage_profiler.stage(step.__name__):
+                step()
         
         print(f"\n✅ 監視データ分析完了！")
         print(f"📁 結果保存先: {self.log_dir}")
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) != 2:
-        print("使用方法: python3 scripts/analyze_monitoring_data.py <log_directory>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='監視データ分析')
+    parser.add_argument('log_dir', help='ログディレクトリ')
+    add_render_profile_argument(parser)
+    stage_profiler.add_profile_argument(parser)
+    args = parser.parse_args()
     
-    log_dir = sys.argv[1]
-    analyzer = MonitoringDataAnalyzer(log_dir)
-    analyzer.run_analysis() 
\ No newline at end of file
+    analyzer = MonitoringDataAnalyzer(args.log_dir, render_profile=args.render_profile)
+    with stage_profiler.profiling(args.profile, args.log_dir, 'analyze_monitoring_data', memory=args.profile_memory):
+        analyzer.run_analysis()
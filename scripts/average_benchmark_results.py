@@ -8,40 +8,34 @@ import os
 import sys
 import csv
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib import rcParams
-import seaborn as sns
 from datetime import datetime
 import glob
 import re
-import matplotlib
 import shutil
 import argparse
 from collections import defaultdict
 
-matplotlib.rcParams['font.family'] = ['DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
-from matplotlib.font_manager import FontProperties, findSystemFonts
-import matplotlib.font_manager as fm
+from render_profiles import add_render_profile_argument
+from render_core import render, subplots
+import stage_profiler
+from font_cache import apply_japanese_font
 
-# --- 日本語フォント自動検出 ---
-def detect_japanese_font():
-    candidates = [
-        'Noto Sans CJK JP', 'Noto Serif CJK JP', 'IPAPGothic', 'IPA明朝', 'IPAMincho',
-        'Hiragino Sans', 'Yu Gothic', 'Meiryo', 'Takao', 'IPAexGothic', 'VL PGothic', 'DejaVu Sans'
-    ]
-    available = [f.name for f in fm.fontManager.ttflist]
-    for font in candidates:
-        if font in available:
-            return font
-    return 'DejaVu Sans'
+# --- matplotlib設定 (日本語フォントは font_cache に解決結果をキャッシュ) ---
+# matplotlib の読み込みとフォント解決は描画の直前に setup_fonts() で行う (--help では読み込まない)
+detected_font = None
+jp_font = None
 
-# --- matplotlib設定 ---
-detected_font = detect_japanese_font()
-jp_font = FontProperties(family=detected_font)
-matplotlib.rcParams['font.family'] = [detected_font]
-matplotlib.rcParams['axes.unicode_minus'] = False
+def setup_fonts():
+    """Load matplotlib and apply the Japanese font once, before the first figure"""
+    global detected_font, jp_font
+    if jp_font is not None:
+        return
+    import matplotlib
+    from matplotlib.font_manager import FontProperties
+    matplotlib.rcParams['font.family'] = ['DejaVu Sans']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    detected_font = apply_japanese_font()
+    jp_font = FontProperties(family=detected_font)
 
 def extract_metrics_from_log(logfile):
     """ログファイルからメトリクスを抽出"""
@@ -233,7 +227,7 @@ def average_benchmark_results(log_dirs):
     
     return averaged_data
 
-def create_performance_comparison_overview(data, output_dir):
+def create_performance_comparison_overview(data, output_dir, profile='publication'):
     """performance_comparison_overview.pngと同様のグラフを生成"""
     if not data:
         print("Error: No averaged data to plot")
@@ -257,7 +251,7 @@ def create_performance_comparison_overview(data, output_dir):
     connection_advantage = [row['Connection Advantage (%)'] for row in data]
     
     # Create figure with subplots
-    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+    fig, axes = subplots(2, 3, figsize=(18, 12))
     fig.suptitle('HTTP/3 vs HTTP/2 性能比較 - 5回実行平均結果', fontsize=16, fontweight='bold', fontproperties=jp_font)
     
     # 1. Throughput comparison
@@ -338,12 +332,9 @@ def create_performance_comparison_overview(data, output_dir):
     ax6.set_xticklabels([f"{d}ms\n{b}Mbps" for d, b in zip(delays, bandwidths)], fontproperties=jp_font)
     ax6.grid(True, alpha=0.3)
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'performance_comparison_overview.png'), 
-                dpi=150, bbox_inches='tight')
-    plt.close()
+    render(fig, os.path.join(output_dir, 'performance_comparison_overview.png'), profile, dpi=150, layout=True)
 
-def create_detailed_performance_analysis(data, output_dir):
+def create_detailed_performance_analysis(data, output_dir, profile='publication'):
     """detailed_performance_analysis.pngと同様のグラフを生成"""
     if not data:
         return
@@ -358,7 +349,7 @@ def create_detailed_performance_analysis(data, output_dir):
     latency_advantage = [row['Latency Advantage (%)'] for row in data]
     
     # Create detailed analysis figure
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig, axes = subplots(2, 2, figsize=(16, 12))
     fig.suptitle('HTTP/3 vs HTTP/2 性能逆転現象 詳細分析 - 5回実行平均結果', fontsize=16, fontweight='bold', fontproperties=jp_font)
     
     # 1. Throughput advantage trend
@@ -383,7 +374,7 @@ def create_detailed_performance_analysis(data, output_dir):
     ax2.grid(True, alpha=0.3)
     
     # Add colorbar
-    cbar = plt.colorbar(scatter, ax=ax2)
+    cbar = fig.colorbar(scatter, ax=ax2)
     cbar.set_label('遅延 (ms)', fontproperties=jp_font)
     
     # 3. Performance reversal threshold analysis
@@ -440,15 +431,12 @@ def create_detailed_performance_analysis(data, output_dir):
     ax4.set_title('性能比較マトリクス (5回平均)\n(緑=HTTP/3優位、赤=HTTP/2優位)', fontproperties=jp_font)
     
     # Add colorbar
-    cbar2 = plt.colorbar(im, ax=ax4)
+    cbar2 = fig.colorbar(im, ax=ax4)
     cbar2.set_label('HTTP/3優位性 (%)', fontproperties=jp_font)
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'detailed_performance_analysis.png'), 
-                dpi=150, bbox_inches='tight')
-    plt.close()
+    render(fig, os.path.join(output_dir, 'detailed_performance_analysis.png'), profile, dpi=150, layout=True)
 
-def create_network_conditions_info(data, output_dir):
+def create_network_conditions_info(data, output_dir, profile='publication'):
     """network_conditions_info.pngと同様のグラフを生成"""
     if not data:
         return
@@ -466,7 +454,7 @@ def create_network_conditions_info(data, output_dir):
     connection_advantages = [row['Connection Advantage (%)'] for row in data]
     
     # 図の作成
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig, axes = subplots(2, 2, figsize=(16, 12))
     fig.suptitle('テスト条件とネットワーク環境設定 - 5回実行平均結果', fontsize=18, fontweight='bold', fontproperties=jp_font)
     
     # 1. ネットワーク条件の分布
@@ -581,14 +569,13 @@ def create_network_conditions_info(data, output_dir):
         env_table[(i, 1)].set_facecolor('#E3F2FD')
     
     # 図の調整
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.92)
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.92)
     
     # 保存
     fig.canvas.draw()
     output_file = os.path.join(output_dir, 'network_conditions_info.png')
-    plt.savefig(output_file, dpi=150, bbox_inches='tight')
-    plt.close()
+    render(fig, output_file, profile, dpi=150)
     print(f"Network Conditions Information Graph Generation Completed: {output_file}")
 
 def create_averaged_summary(data, output_dir):
@@ -654,48 +641,53 @@ def main():
     parser = argparse.ArgumentParser(description='Average benchmark results from multiple executions')
     parser.add_argument('log_dirs', nargs='+', help='Benchmark log directories')
     parser.add_argument('--output_dir', help='Output directory for averaged results')
+    add_render_profile_argument(parser)
+    stage_profiler.add_profile_argument(parser)
     args = parser.parse_args()
     
-    # 平均化データを計算
-    averaged_data = average_benchmark_results(args.log_dirs)
-    
-    if not averaged_data:
-        print("Error: Failed to average benchmark data")
-        sys.exit(1)
-    
-    # 出力ディレクトリ作成
+    # 出力ディレクトリ名 (--profile の出力先にも使う)
     if args.output_dir:
         output_dir = args.output_dir
     else:
         now = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_dir = f"logs/average_benchmark_{now}"
     
-    os.makedirs(output_dir, exist_ok=True)
+    with stage_profiler.profiling(args.profile, output_dir, 'average_benchmark_results', memory=args.profile_memory):
+        # 平均化データを計算
+        averaged_data = average_benchmark_results(args.log_dirs)
+    
+        if not averaged_data:
+            print("Error: Failed to average benchmark data")
+            sys.exit(1)
+    
+        # 出力ディレクトリ作成
+        os.makedirs(output_dir, exist_ok=True)
     
-    print(f"Output directory: {output_dir}")
+        print(f"Output directory: {output_dir}")
     
-    # 5回のベンチマーク結果ディレクトリをコピー
-    benchmark_dirs = copy_benchmark_directories(args.log_dirs, output_dir)
+        # 5回のベンチマーク結果ディレクトリをコピー
+        benchmark_dirs = copy_benchmark_directories(args.log_dirs, output_dir)
     
-    # 平均化データをCSVに保存
-    csv_file = os.path.join(output_dir, 'averaged_results.csv')
-    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-        if averaged_data:
-            writer = csv.DictWriter(f, fieldnames=averaged_data[0].keys())
-            writer.writeheader()
-            writer.writerows(averaged_data)
+        # 平均化データをCSVに保存
+        csv_file = os.path.join(output_dir, 'averaged_results.csv')
+        with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+            if averaged_data:
+                writer = csv.DictWriter(f, fieldnames=averaged_data[0].keys())
+                writer.writeheader()
+                writer.writerows(averaged_data)
     
-    print(f"Averaged data saved: {csv_file}")
+        print(f"Averaged data saved: {csv_file}")
     
-    # 3つのグラフを生成
-    create_performance_comparison_overview(averaged_data, output_dir)
-    create_detailed_performance_analysis(averaged_data, output_dir)
-    create_network_conditions_info(averaged_data, output_dir)
+        # 3つのグラフを生成
+        setup_fonts()
+        create_performance_comparison_overview(averaged_data, output_dir, args.render_profile)
+        create_detailed_performance_analysis(averaged_data, output_dir, args.render_profile)
+        create_network_conditions_info(averaged_data, output_dir, args.render_profile)
     
-    # サマリー作成
-    create_averaged_summary(averaged_data, output_dir)
+        # サマリー作成
+        create_averaged_summary(averaged_data, output_dir)
     
-    print(f"All averaged graphs created in: {output_dir}")
+        print(f"All averaged graphs created in: {output_dir}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the benchmark and analysis scripts
+Only the chosen script is loaded, so listing the commands and the text-only
+commands (event summaries, campaign state, benchmark history, font cache) never
+import numpy, pandas or matplotlib. Everything after the command is passed to
+the script unchanged.
+
+  bench_cli.py                                  list the commands
+  bench_cli.py events logs/ultra_final_analysis
+  bench_cli.py final --simulate --sim_seed 1 --log_dir logs/sim
+  bench_cli.py graphs --help
+"""
+
+import argparse
+import runpy
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# command: (script, heavy = numpy/pandas/matplotlib を読み込む, description)
+COMMANDS = {
+    'final': ('ultra_final_analysis.py', True, 'Boundary analysis campaign (h2load + netem, or --simulate)'),
+    'fast': ('ultra_fast_benchmark.py', True, 'Three-minute benchmark'),
+    'graphs': ('generate_performance_graphs.py', True, 'Performance graphs of a benchmark directory'),
+    'simple': ('simple_graph_generator.py', True, 'Report and graphs of a run_bench.sh directory'),
+    'average': ('average_benchmark_results.py', True, 'Average the results of repeated executions'),
+    'monitor': ('analyze_monitoring_data.py', True, 'Analyze the system and network monitoring data'),
+    'network': ('network_rates.py', True, 'Per-interface rates of a network_stats.csv'),
+    'sampler': ('system_sampler.py', True, 'Record /proc into a binary trace or summarize a trace'),
+    'report': ('html_report.py', True, 'Self-contained interactive HTML report'),
+    'baseline': ('regression_baseline.py', True, 'Mark baseline campaigns and check new ones for regressions'),
+    'import': ('load_backends.py', False, 'Import load-generator results into a campaign directory'),
+    'events': ('event_log.py', False, 'Time breakdown of a campaign event log'),
+    'state': ('campaign_state.py', False, 'Query or update a campaign state file'),
+    'benchmarks': ('pipeline_benchmarks.py', False, 'Benchmarks of the analysis scripts (--compare is text-only)'),
+    'fonts': ('font_cache.py', False, 'Show or refresh the cached Japanese font'),
+}
+
+
+def command_list():
+    lines = ['commands:']
+    for name, (script, heavy, description) in COMMANDS.items():
+        marker = '' if heavy else '  [text]'
+        lines.append(f"  {name:<12} {description} ({script}){marker}")
+    lines.append('')
+    lines.append('[text]: starts without loading numpy, pandas or matplotlib')
+    return '\n'.join(lines)
+
+
+def run(command, argv):
+    """Run the script of `command` as __main__ with `argv` as its arguments"""
+    script = SCRIPT_DIR / COMMANDS[command][0]
+    if str(SCRIPT_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPT_DIR))
+    sys.argv = [str(script), *argv]
+    runpy.run_path(str(script), run_name='__main__')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark and analysis commands', epilog=command_list(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', choices=list(COMMANDS), metavar='command',
+                        help='Command to run (see below)')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='Arguments of the command')
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return
+    run(args.command, args.args)
+
+
+if __name__ == '__main__':
+    main()
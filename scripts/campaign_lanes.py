@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Execution lanes for benchmark campaigns
+Each testbed (netem + h2load) must be driven strictly one run at a time,
+while parsing, aggregation and rendering of finished runs can run side by side.
+CampaignLanes gives asyncio code one serial bench lane per testbed and a pool of
+post-processing lanes, so the next run starts while earlier ones are rendered.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_POST_WORKERS = 2
+
+
+class CampaignLanes:
+    """One serial bench lane per testbed plus post_workers concurrent post-processing lanes
+
+    bench() is awaited by the coroutine driving a testbed, so that testbed's runs
+    happen in order; post() returns a future right away so the campaign can move on.
+    """
+
+    def __init__(self, post_workers=DEFAULT_POST_WORKERS, bench_lanes=('default',)):
+        self._bench = {name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'bench-{name}')
+                       for name in bench_lanes}
+        self._default_lane = next(iter(self._bench))
+        self._post = ThreadPoolExecutor(max_workers=max(1, post_workers), thread_name_prefix='post')
+        self._stats_lock = threading.Lock()
+        self.busy = {name: 0.0 for name in self._bench}
+        self.post_busy = 0.0
+        self._started = time.perf_counter()
+
+    def _timed(self, lane, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                if lane is None:
+                    self.post_busy += elapsed
+                else:
+                    self.busy[lane] += elapsed
+
+    async def bench(self, func, *args, lane=None, **kwargs):
+        """Run func on a bench lane (default: the first) and wait for it"""
+        lane = lane or self._default_lane
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._bench[lane], functools.partial(self._timed, lane, func, *args, **kwargs))
+
+    def post(self, func, *args, **kwargs):
+        """Queue func on a post-processing lane and return its future without waiting"""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(
+            self._post, functools.partial(self._timed, None, func, *args, **kwargs))
+
+    def close(self):
+        """Wait for queued work and print how busy each bench lane was"""
+        for executor in self._bench.values():
+            executor.shutdown(wait=True)
+        self._post.shutdown(wait=True)
+        wall = time.perf_counter() - self._started
+        if wall > 0:
+            for name, busy in self.busy.items():
+                print(f"Lanes: bench [{name}] busy {busy:.1f}s / {wall:.1f}s ({busy / wall:.0%})")
+            print(f"Lanes: post-processing {self.post_busy:.1f}s")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Checkpoint file for resumable benchmark campaigns
+Every completed unit (condition, protocol, repetition) is recorded with its raw
+artifacts and parsed summary in <log_dir>/campaign_state.json. The file is
+rewritten atomically after each unit, so a campaign killed by a reboot or a
+container restart can be resumed with --resume and only reruns unfinished units.
+
+Shell usage (run_bench.sh):
+  campaign_state.py done   <state.json> <unit>
+  campaign_state.py record <state.json> <unit> --log <h2load log> [--artifact path ...]
+                   (exit status 1 without recording if the log has no h2load summary)
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from h2load_stream import parse_summary
+
+STATE_FILE = 'campaign_state.json'
+STATE_VERSION = 1
+
+
+def unit_key(*parts):
+    """Identifier of one campaign unit, e.g. '150:3:0/http2/measurement_1/score_2'"""
+    return '/'.join(str(part) for part in parts)
+
+
+class CampaignState:
+    """Completed campaign units, persisted after every change
+
+    With resume=False an existing state file is ignored (and replaced on the
+    first record), so a fresh campaign never skips anything by accident.
+    """
+
+    def __init__(self, path, resume=False, params=None):
+        self.path = Path(path)
+        self._lock = threading.Lock()  # units are recorded from the bench and post-processing lanes
+        self.data = {'version': STATE_VERSION, 'params': params or {}, 'units': {}}
+        if resume and self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            if params and self.data.get('params') != params:
+                print(f"Warning: campaign parameters changed since {self.path} was written")
+                print(f"  previous: {self.data.get('params')}")
+                print(f"  current:  {params}")
+
+    def __len__(self):
+        return len(self.data['units'])
+
+    def completed(self, key):
+        """Return the recorded unit if it finished and its raw artifacts still exist"""
+        with self._lock:
+            entry = self.data['units'].get(key)
+        if entry is None:
+            return None
+        if not all(Path(path).exists() for path in entry.get('artifacts', {}).values()):
+            return None
+        return entry
+
+    def record(self, key, artifacts, summary, **extra):
+        """Mark a unit as completed and write the state file"""
+        with self._lock:
+            self.data['units'][key] = {
+                'completed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'artifacts': {name: str(path) for name, path in artifacts.items()},
+                'summary': summary,
+                **extra,
+            }
+            self._save()
+
+    def update(self, key, **fields):
+        """Add fields (e.g. post-processing outputs) to a recorded unit"""
+        with self._lock:
+            if key in self.data['units']:
+                self.data['units'][key].update(fields)
+                self._save()
+
+    def _save(self):
+        # 一時ファイルに書いてから置き換える (書き込み途中で落ちても前の状態が残る)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=self.path.name, suffix='.tmp', dir=self.path.parent)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query or update a campaign state file')
+    parser.add_argument('command', choices=['done', 'record'])
+    parser.add_argument('state_file')
+    parser.add_argument('unit')
+    parser.add_argument('--log', help='h2load output log; its last summary is recorded')
+    parser.add_argument('--artifact', action='append', default=[], help='Additional raw artifact path')
+    args = parser.parse_args()
+
+    state = CampaignState(args.state_file, resume=True)
+    if args.command == 'done':
+        # 終了コード 0: 完了済み (スキップ可)
+        sys.exit(0 if state.completed(args.unit) else 1)
+
+    artifacts = {f'artifact_{i}': path for i, path in enumerate(args.artifact, 1)}
+    summary = {}
+    if args.log:
+        artifacts['log_file'] = args.log
+        with open(args.log, 'r', errors='replace') as f:
+            output = f.read()
+        # ウォームアップの出力は判定に使わない: 計測フェーズ以降のみを見る
+        output = output.rpartition('=== MEASUREMENT PHASE ===')[2]
+        # h2load のサマリーがないログ (失敗・タイムアウト) は完了として記録しない
+        if 'finished in' not in output:
+            print(f"{args.log}: no h2load summary ('finished in'), {args.unit} not recorded", file=sys.stderr)
+            sys.exit(1)
+        summary = parse_summary(output)
+    state.record(args.unit, artifacts, summary)
+
+
+if __name__ == "__main__":
+    main()
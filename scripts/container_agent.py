@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Persistent exec agent for benchmark containers
+One `docker exec -i <container> sh -c <agent>` is started per container and kept
+open; commands are sent over its stdin and length-framed results come back on
+stdout, so each command no longer pays a docker CLI/API round trip.
+
+Request (host -> agent):  <id> <timeout_s> <run|stream> <base64 command>\n
+Response (agent -> host): @@<id> <returncode> <expired> <stdout_len> <stderr_len>\n<stdout><stderr>
+In stream mode every stdout line is sent as it is produced, as "@@<id>+ <line>",
+followed by an empty line and the response with stdout_len 0. expired is 1 only
+when the agent's own timeout stopped the command.
+"""
+
+import atexit
+import base64
+import contextlib
+import math
+import shlex
+import subprocess
+import threading
+
+import stage_profiler
+
+# POSIX sh で動作 (ubuntu:22.04 の coreutils: base64, timeout, wc, mktemp と GNU sed)
+# timeout --verbose のメッセージだけを $d/expired に分け、コマンド自身の終了コード 124 と区別する
+AGENT_SCRIPT = r'''
+d=$(mktemp -d /tmp/exec_agent.XXXXXX) || exit 1
+trap 'rm -rf "$d"' EXIT
+execute() {
+    if [ "$limit" -gt 0 ]; then
+        timeout --verbose "$limit" sh -c 'exec sh "$1" 2>"$2"' sh "$d/cmd" "$d/err" </dev/null 2>"$d/expired"
+    else
+        sh "$d/cmd" </dev/null 2>"$d/err"
+    fi
+}
+while read -r id limit mode payload; do
+    printf '%s' "$payload" | base64 -d > "$d/cmd"
+    rm -f "$d/expired"
+    if [ "$mode" = stream ]; then
+        { execute; echo $? >"$d/rc"; } | sed -u "s/^/@@$id+ /"
+        printf '\n'
+        rc=$(cat "$d/rc")
+        : >"$d/out"
+    else
+        execute >"$d/out"
+        rc=$?
+    fi
+    expired=0
+    if [ "$rc" = 124 ] && [ -s "$d/expired" ]; then expired=1; fi
+    printf '@@%s %s %s %s %s\n' "$id" "$rc" "$expired" "$(wc -c <"$d/out")" "$(wc -c <"$d/err")"
+    cat "$d/out" "$d/err"
+done
+'''
+
+WATCHDOG_GRACE = 5.0  # 秒: エージェント自体が応答しない場合に強制終了するまでの猶予
+
+
+class AgentError(RuntimeError):
+    """The agent process died or returned a malformed response"""
+
+
+class StreamedCommand:
+    """Command running through an agent whose stdout is consumed while it runs
+
+    Iterate over it to get stdout lines (str) as they are produced, then call
+    wait() for the CompletedProcess (stdout is not retained; stderr is). The
+    agent serves only this command until wait() or the end of the with block.
+    """
+
+    def __init__(self, agent, args, timeout, release):
+        self.args = args
+        self.timeout = timeout
+        self._agent = agent
+        self._release = release
+        self._command = args if isinstance(args, str) else shlex.join(args)
+        self._header = None
+        self._timer = stage_profiler.start_command(args)
+        try:
+            self._request_id, self._watchdog = agent._send(self._command, timeout, 'stream')
+        except BaseException:
+            self._close()
+            raise
+        self._prefix = f"@@{self._request_id}+ ".encode()
+
+    def __iter__(self):
+        with self._agent._failures(self._command, self.timeout, self._watchdog):
+            while self._header is None:
+                raw = self._agent._read_line()
+                if raw.startswith(self._prefix):
+                    yield raw[len(self._prefix):].decode(errors='replace')
+                elif raw != b'\n':
+                    self._header = raw
+
+    def wait(self, check=False):
+        """Wait for the command to exit and return its CompletedProcess"""
+        try:
+            for _ in self:  # 読み残した行は捨てる
+                pass
+            with self._agent._failures(self._command, self.timeout, self._watchdog):
+                returncode, expired, _, stderr = self._agent._read_result(self._request_id, self._header)
+        finally:
+            self._close()
+        stderr = stderr.decode(errors='replace')
+        if expired:
+            raise subprocess.TimeoutExpired(self.args, self.timeout, stderr=stderr)
+        result = subprocess.CompletedProcess(self.args, returncode, '', stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def _close(self):
+        if self._release is None:
+            return
+        if getattr(self, '_watchdog', None):
+            self._watchdog.cancel()
+        self._timer.stop()
+        release, self._release = self._release, None
+        release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 途中で抜けた場合は応答の途中なのでエージェントごと止める
+        if self._release is not None:
+            self._agent._discard()
+            self._close()
+
+
+class ContainerAgent:
+    """Run commands inside one container through a persistent exec agent
+
+    run() mirrors subprocess.run (returns CompletedProcess, raises
+    CalledProcessError/TimeoutExpired). With use_agent=False every call falls
+    back to a plain `docker exec`, and copy_to_host to `docker cp`.
+    """
+
+    def __init__(self, container, use_agent=True, docker='docker'):
+        # docker: CLI command, e.g. ['docker', '--context', 'pi2'] for a stack on another host
+        self.container = container
+        self.use_agent = use_agent
+        self.docker = [docker] if isinstance(docker, str) else list(docker)
+        self._proc = None
+        self._next_id = 0
+        self._lock = threading.Lock()  # 1 エージェントにつき同時に 1 コマンド
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            self.docker + ['exec', '-i', self.container, 'sh', '-c', AGENT_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _read_exact(self, size):
+        data = self._proc.stdout.read(size) if size else b''
+        if len(data) != size:
+            raise AgentError(f"agent for {self.container} closed its output")
+        return data
+
+    def _read_line(self):
+        line = self._proc.stdout.readline()
+        if not line.endswith(b'\n'):
+            raise AgentError(f"agent for {self.container} closed its output")
+        return line
+
+    def _send(self, command, timeout, mode='run'):
+        """Send one request; returns (request id, watchdog timer or None)"""
+        if self._proc is None or self._proc.poll() is not None:
+            self._start()
+        self._next_id += 1
+        limit = math.ceil(timeout) if timeout else 0
+        payload = base64.b64encode(command.encode()).decode('ascii')
+        watchdog = None
+        if limit:
+            watchdog = threading.Timer(limit + WATCHDOG_GRACE, self._proc.kill)
+            watchdog.start()
+        try:
+            with self._failures(command, timeout, watchdog):
+                self._proc.stdin.write(f"{self._next_id} {limit} {mode} {payload}\n".encode('ascii'))
+                self._proc.stdin.flush()
+        except BaseException:
+            if watchdog:
+                watchdog.cancel()
+            raise
+        return self._next_id, watchdog
+
+    def _read_result(self, request_id, header=None):
+        """Read a framed response: (returncode, expired, stdout, stderr)"""
+        fields = (header if header is not None else self._read_line()).decode('ascii', 'replace').split()
+        if len(fields) != 5 or fields[0] != f"@@{request_id}":
+            raise AgentError(f"unexpected response from {self.container} agent: {fields}")
+        returncode, expired, out_len, err_len = (int(v) for v in fields[1:])
+        return returncode, bool(expired), self._read_exact(out_len), self._read_exact(err_len)
+
+    @contextlib.contextmanager
+    def _failures(self, command, timeout, watchdog):
+        """Drop the agent after a broken exchange; one stopped by the watchdog is a timeout"""
+        try:
+            yield
+        except (OSError, ValueError, AgentError):
+            self._discard()
+            if watchdog and watchdog.finished.is_set():
+                raise subprocess.TimeoutExpired(command, timeout)
+            raise
+
+    def _exchange(self, command, timeout):
+        """Send one command and read its response: (returncode, expired, stdout, stderr)"""
+        request_id, watchdog = self._send(command, timeout)
+        try:
+            with self._failures(command, timeout, watchdog):
+                return self._read_result(request_id)
+        finally:
+            if watchdog:
+                watchdog.cancel()
+
+    def _discard(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def run(self, args, timeout=None, check=False, text=True):
+        """Run a command (argument list or shell string) in the container"""
+        command = args if isinstance(args, str) else shlex.join(args)
+        if not self.use_agent:
+            with stage_profiler.command(args):
+                result = subprocess.run(self.docker + ['exec', self.container, 'sh', '-c', command],
+                                        capture_output=True, text=text, timeout=timeout)
+        else:
+            with self._lock, stage_profiler.command(args):
+                returncode, expired, stdout, stderr = self._exchange(command, timeout)
+            if expired:
+                raise subprocess.TimeoutExpired(command, timeout, output=stdout, stderr=stderr)
+            if text:
+                stdout, stderr = stdout.decode(errors='replace'), stderr.decode(errors='replace')
+            result = subprocess.CompletedProcess(args, returncode, stdout, stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def stream(self, args, timeout=None):
+        """Run a command and deliver its stdout line by line while it runs
+
+        The lines come through the agent's framed channel, so the agent is busy
+        until the StreamedCommand is waited for or closed. With use_agent=False a
+        one-off agent session is started for the command.
+        """
+        if not self.use_agent:
+            agent = ContainerAgent(self.container, docker=self.docker)
+            return StreamedCommand(agent, args, timeout, release=agent.close)
+        self._lock.acquire()
+        return StreamedCommand(self, args, timeout, release=self._lock.release)
+
+    def read_file(self, path):
+        """Return the contents of a file inside the container as bytes"""
+        return self.run(['cat', '--', str(path)], check=True, text=False).stdout
+
+    def copy_to_host(self, path, dest):
+        """Copy a file out of the container (replacement for `docker cp`)"""
+        if not self.use_agent:
+            subprocess.run(self.docker + ['cp', f'{self.container}:{path}', str(dest)], check=True)
+            return
+        with open(dest, 'wb') as f:
+            f.write(self.read_file(path))
+
+    def close(self):
+        """Stop the agent (EOF on its stdin ends the read loop)"""
+        with self._lock:
+            if self._proc is None:
+                return
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._proc.kill()
+                self._proc.wait()
+            self._proc = None
+
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+def get_agent(container, use_agent=True, docker='docker'):
+    """Shared agent per (docker host, container, mode) so every caller reuses one exec session"""
+    with _agents_lock:
+        key = (container, use_agent, docker if isinstance(docker, str) else tuple(docker))
+        if key not in _agents:
+            _agents[key] = ContainerAgent(container, use_agent=use_agent, docker=docker)
+        return _agents[key]
+
+
+@atexit.register
+def close_agents():
+    """Stop all shared agents"""
+    with _agents_lock:
+        for agent in _agents.values():
+            agent.close()
+        _agents.clear()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Structured event log of campaign orchestration
+Every orchestration step (netem apply, h2load run, log copy, CSV write, figure
+render) is written as one JSON line to <log_dir>/events.jsonl with a monotonic
+timestamp `t` (seconds), its `duration`, the thread and step-specific fields.
+A campaign starts with a campaign_start event that also records the wall clock,
+so campaigns appended by --resume can be told apart and aligned.
+
+  event_log.py <log_dir or events.jsonl>   time breakdown and testbed idle fraction per campaign
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+EVENT_FILE = 'events.jsonl'
+# testbed を占有するイベント (これ以外の時間が idle)
+TESTBED_EVENTS = ('netem_apply', 'load_run')
+COOLDOWN_EVENT = 'cooldown'
+
+
+class EventLog:
+    """Append-only JSONL writer shared by the bench and post-processing lanes"""
+
+    def __init__(self, path, append=False):
+        self.path = Path(path)
+        self.campaign = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+
+    def emit(self, event, t=None, **fields):
+        record = {'t': round(time.monotonic() if t is None else t, 6), 'event': event,
+                  'campaign': self.campaign, 'thread': threading.current_thread().name}
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        with self._lock:
+            # 1 行ずつ flush (途中で止まったキャンペーンも解析できるように)
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    @contextmanager
+    def span(self, event, **fields):
+        """Emit one event covering the block; the yielded dict adds fields (e.g. results)"""
+        extra = {}
+        start = time.monotonic()
+        status = 'error'
+        try:
+            yield extra
+            status = 'ok'
+        finally:
+            self.emit(event, t=start, duration=round(time.monotonic() - start, 6), status=status,
+                      **fields, **extra)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_log = None
+
+
+def open_log(path, append=False, **fields):
+    """Start the event log of a campaign (campaign_start carries the wall clock and fields)"""
+    global _log
+    _log = EventLog(path, append=append)
+    _log.emit('campaign_start', wall=time.time(), **fields)
+    return _log
+
+
+def close_log(**fields):
+    """Emit campaign_end and turn the hooks back into no-ops"""
+    global _log
+    log, _log = _log, None
+    if log is not None:
+        log.emit('campaign_end', wall=time.time(), **fields)
+        log.close()
+
+
+def emit(event, **fields):
+    """Emit a point event (no-op unless a log is open)"""
+    if _log is not None:
+        _log.emit(event, **fields)
+
+
+@contextmanager
+def span(event, **fields):
+    """Emit a timed event for the block (no-op unless a log is open)"""
+    if _log is None:
+        yield {}
+        return
+    with _log.span(event, **fields) as extra:
+        yield extra
+
+
+def read_events(path):
+    """Events of an events.jsonl file (or a log directory containing one)"""
+    path = Path(path)
+    if path.is_dir():
+        path = path / EVENT_FILE
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass  # 強制終了時の書きかけの最終行
+    return events
+
+
+def _union_length(intervals):
+    """Total length covered by possibly overlapping (start, end) intervals"""
+    total, current_start, current_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def summarize(events):
+    """Per-campaign time breakdown by event and busy/idle time per testbed"""
+    campaigns = defaultdict(list)
+    for event in events:
+        campaigns[event.get('campaign')].append(event)
+
+    summaries = []
+    for campaign, items in campaigns.items():
+        start = next((e for e in items if e['event'] == 'campaign_start'), None)
+        end = next((e for e in items if e['event'] == 'campaign_end'), None)
+        begin = start['t'] if start else min(e['t'] for e in items)
+        # campaign_end が無い (中断された) 場合は最後のイベントの終わりまで
+        finish = end['t'] if end else max(e['t'] + e.get('duration', 0) for e in items)
+        elapsed = max(finish - begin, 0.0)
+
+        breakdown = defaultdict(lambda: {'count': 0, 'total': 0.0, 'errors': 0})
+        busy = defaultdict(list)
+        cooldown = defaultdict(float)
+        for e in items:
+            if 'duration' not in e:
+                continue
+            entry = breakdown[e['event']]
+            entry['count'] += 1
+            entry['total'] += e['duration']
+            entry['errors'] += e.get('status') == 'error'
+            testbed = e.get('testbed')
+            if testbed is None:
+                continue
+            if e['event'] in TESTBED_EVENTS:
+                busy[testbed].append((e['t'], e['t'] + e['duration']))
+            elif e['event'] == COOLDOWN_EVENT:
+                cooldown[testbed] += e['duration']
+
+        testbeds = {}
+        for testbed in sorted(set(busy) | set(cooldown)):
+            busy_s = _union_length(busy[testbed])
+            testbeds[testbed] = {
+                'busy': busy_s,
+                'cooldown': cooldown[testbed],
+                'idle_fraction': 1 - busy_s / elapsed if elapsed else None,
+            }
+        summaries.append({
+            'campaign': campaign,
+            'started': start.get('wall') if start else None,
+            'complete': end is not None,
+            'elapsed': elapsed,
+            'events': dict(breakdown),
+            'testbeds': testbeds,
+        })
+    return sorted(summaries, key=lambda s: s['started'] or 0)
+
+
+def print_summary(summaries):
+    for summary in summaries:
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['started'])) if summary['started'] else '?'
+        state = '' if summary['complete'] else ' (interrupted)'
+        print(f"Campaign {summary['campaign']} started {started}: {summary['elapsed']:.1f}s{state}")
+        # share: 合計時間 / キャンペーン時間 (レーンが並行するので 100% を超えることがある)
+        print(f"  {'event':<16} {'count':>6} {'total(s)':>10} {'mean(ms)':>10} {'share':>7}")
+        for event, entry in sorted(summary['events'].items(), key=lambda item: -item[1]['total']):
+            mean_ms = entry['total'] / entry['count'] * 1000
+            share = entry['total'] / summary['elapsed'] * 100 if summary['elapsed'] else 0
+            errors = f"  ({entry['errors']} errors)" if entry['errors'] else ''
+            print(f"  {event:<16} {entry['count']:>6} {entry['total']:>10.2f} {mean_ms:>10.1f} {share:>6.1f}%{errors}")
+        for testbed, entry in summary['testbeds'].items():
+            idle = f"{entry['idle_fraction'] * 100:.1f}%" if entry['idle_fraction'] is not None else '?'
+            print(f"  Testbed {testbed}: busy {entry['busy']:.1f}s, cooldown {entry['cooldown']:.1f}s, idle {idle}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize a campaign event log')
+    parser.add_argument('path', help=f'Log directory or {EVENT_FILE} file')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    try:
+        summaries = summarize(read_events(args.path))
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print_summary(summaries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cached Japanese font resolution for the graph scripts
+The first call scans matplotlib's font list for the first available candidate and
+stores the result in a small JSON file; later runs read it back without scanning
+(or spawning fc-list). The entry is invalidated when matplotlib is upgraded, the
+candidate list changes or the font file disappears.
+
+  font_cache.py             show the resolved font and the cache file
+  font_cache.py --refresh   resolve again (after installing fonts)
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+JAPANESE_FONTS = (
+    'Noto Sans CJK JP', 'Noto Serif CJK JP', 'IPAPGothic', 'IPA明朝', 'IPAMincho',
+    'Hiragino Sans', 'Hiragino Kaku Gothic ProN', 'Yu Gothic', 'Meiryo', 'Arial Unicode MS',
+    'Takao', 'IPAexGothic', 'VL PGothic', 'VL Gothic', 'IPAGothic', 'DejaVu Sans',
+)
+FALLBACK_FONT = 'DejaVu Sans'
+CACHE_FILE = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'grpc_over_http3' / 'fonts.json'
+
+
+def _matplotlib_version():
+    # matplotlib 本体は import せずにバージョンだけ取得
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version('matplotlib')
+    except PackageNotFoundError:
+        return None
+
+
+def _read_cache(path, key):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f).get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not entry or (entry.get('path') and not os.path.exists(entry['path'])):
+        return None
+    return entry
+
+
+def _write_cache(path, key, entry):
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+        cache[key] = entry
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # 読み取り専用の HOME でも描画は続ける
+
+
+def _scan(candidates):
+    """(family, font file) of the first candidate known to matplotlib"""
+    import matplotlib.font_manager as fm
+    available = {}
+    for font in fm.fontManager.ttflist:
+        available.setdefault(font.name, font.fname)
+    for family in candidates:
+        if family in available:
+            return family, available[family]
+    return FALLBACK_FONT, None
+
+
+def resolve_japanese_font(candidates=JAPANESE_FONTS, refresh=False, cache_file=CACHE_FILE):
+    """Family name of the first available candidate, from the cache when possible"""
+    key = f"{_matplotlib_version()}|{'|'.join(candidates)}"
+    entry = None if refresh else _read_cache(cache_file, key)
+    if entry is None:
+        family, fname = _scan(candidates)
+        entry = {'family': family, 'path': fname}
+        _write_cache(cache_file, key, entry)
+    return entry['family']
+
+
+def apply_japanese_font(candidates=JAPANESE_FONTS):
+    """Set the resolved font as matplotlib's default family and return it"""
+    import matplotlib
+    family = resolve_japanese_font(candidates)
+    matplotlib.rcParams['font.family'] = [family]
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    return family
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or refresh the cached Japanese font for the graphs')
+    parser.add_argument('--refresh', action='store_true', help='Scan the font list again and update the cache')
+    args = parser.parse_args()
+
+    family = resolve_japanese_font(refresh=args.refresh)
+    print(f"Font: {family}")
+    print(f"Cache: {CACHE_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,38 +9,33 @@ import os
 import sys
 import csv
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib import rcParams
-import seaborn as sns
 from datetime import datetime
 import glob
 import re
-import matplotlib
 import shutil
 import argparse
-matplotlib.rcParams['font.family'] = ['DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
-from matplotlib.font_manager import FontProperties, findSystemFonts
-import matplotlib.font_manager as fm
+import importlib.util
+from render_profiles import add_render_profile_argument
+from render_core import PdfSink, render, subplots
+import stage_profiler
+from font_cache import apply_japanese_font
 
-# --- 日本語フォント自動検出 ---
-def detect_japanese_font():
-    candidates = [
-        'Noto Sans CJK JP', 'Noto Serif CJK JP', 'IPAPGothic', 'IPA明朝', 'IPAMincho',
-        'Hiragino Sans', 'Yu Gothic', 'Meiryo', 'Takao', 'IPAexGothic', 'VL PGothic', 'DejaVu Sans'
-    ]
-    available = [f.name for f in fm.fontManager.ttflist]
-    for font in candidates:
-        if font in available:
-            return font
-    return 'DejaVu Sans'
+# --- matplotlib設定 (日本語フォントは font_cache に解決結果をキャッシュ) ---
+# matplotlib の読み込みとフォント解決は描画の直前に setup_fonts() で行う (--help では読み込まない)
+detected_font = None
+jp_font = None
 
-# --- matplotlib設定 ---
-detected_font = detect_japanese_font()
-jp_font = FontProperties(family=detected_font)
-matplotlib.rcParams['font.family'] = [detected_font]
-matplotlib.rcParams['axes.unicode_minus'] = False
+def setup_fonts():
+    """Load matplotlib and apply the Japanese font once, before the first figure"""
+    global detected_font, jp_font
+    if jp_font is not None:
+        return
+    import matplotlib
+    from matplotlib.font_manager import FontProperties
+    matplotlib.rcParams['font.family'] = ['DejaVu Sans']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    detected_font = apply_japanese_font()
+    jp_font = FontProperties(family=detected_font)
 
 # ベンチマークパラメータ（run_bench.shと合わせる）
 BENCHMARK_PARAMS = [
@@ -53,6 +48,22 @@ BENCHMARK_PARAMS = [
     ('ウォームアップ時間(秒)', '2'),
 ]
 
+# 図の登録表: 名前 -> 生成関数と必要なデータセット
+# data: 条件ごとのH2/H3集計, params: benchmark_params.txt, requests: リクエスト単位のレイテンシ
+FIGURES = {}
+
+
+def register_figure(name, needs=('data',), renders=True, default=True):
+    """Register a figure builder together with the datasets it needs
+
+    The builder is called with each needed dataset as a keyword argument plus
+    output_dir (and profile/sink when it renders a figure).
+    """
+    def decorator(func):
+        FIGURES[name] = {'build': func, 'needs': tuple(needs), 'renders': renders, 'default': default}
+        return func
+    return decorator
+
 def load_extreme_conditions_data(csv_file):
     """Load extreme conditions test data"""
     data = []
@@ -79,7 +90,8 @@ def load_extreme_conditions_data(csv_file):
     
     return data
 
-def create_performance_comparison_graphs(data, output_dir):
+@register_figure('overview')
+def create_performance_comparison_graphs(data, output_dir, profile='publication', sink=None):
     """Create comprehensive performance comparison graphs"""
     
     # Sort data by delay for better visualization
@@ -114,7 +126,7 @@ def create_performance_comparison_graphs(data, output_dir):
         connection_advantage.append(row['Connection Advantage (%)'])
     
     # Create figure with subplots
-    fig, axes = plt.subplots(2, 3, figsize=(18, 12))
+    fig, axes = subplots(2, 3, figsize=(18, 12))
     fig.suptitle('HTTP/3 vs HTTP/2 Performance Comparison', fontsize=16, fontweight='bold', fontproperties=jp_font)
     
     # 1. Throughput comparison
@@ -249,19 +261,15 @@ def create_performance_comparison_graphs(data, output_dir):
         ax6.text(bar.get_x() + bar.get_width()/2., height + (0.1 if height >= 0 else -0.1),
                 f'{height:.1f}%', ha='center', va='bottom' if height >= 0 else 'top', fontsize=8)
     
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.92)
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.92)
     
-    # 保存前にCanvasを明示的に描画してから両方保存
-    fig.canvas.draw()
-    output_file1 = os.path.join(output_dir, 'performance_comparison_overview.png')
-    output_file2 = os.path.join(output_dir, 'test_conditions_and_network_environment.png')
-    plt.savefig(output_file1, dpi=150, bbox_inches='tight')
-    plt.close()
-    shutil.copyfile(output_file1, output_file2)
-    print(f"Performance Comparison Overview Graph Generation Completed: {output_file1} および {output_file2}")
+    output_file = os.path.join(output_dir, 'performance_comparison_overview.png')
+    saved = render(fig, output_file, profile, dpi=150, sink=sink)
+    print(f"Performance Comparison Overview Graph Generation Completed: {saved}")
 
-def create_detailed_analysis_graphs(data, output_dir):
+@register_figure('detailed')
+def create_detailed_analysis_graphs(data, output_dir, profile='publication', sink=None):
     """Create detailed analysis graphs showing the reversal phenomenon"""
     
     # Sort data by delay
@@ -280,7 +288,7 @@ def create_detailed_analysis_graphs(data, output_dir):
         latency_advantage.append(row['Latency Advantage (%)'])
     
     # Create detailed analysis figure
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig, axes = subplots(2, 2, figsize=(16, 12))
     fig.suptitle('HTTP/3 vs HTTP/2 性能逆転現象 詳細分析', fontsize=16, fontweight='bold', fontproperties=jp_font)
     
     # 1. Throughput advantage trend
@@ -318,7 +326,7 @@ def create_detailed_analysis_graphs(data, output_dir):
     ax2.grid(True, alpha=0.3)
     
     # Add colorbar
-    cbar = plt.colorbar(scatter, ax=ax2)
+    cbar = fig.colorbar(scatter, ax=ax2)
     cbar.set_label('遅延 (ms)', fontproperties=jp_font)
     
     # 3. Performance reversal threshold analysis
@@ -383,18 +391,14 @@ def create_detailed_analysis_graphs(data, output_dir):
     ax4.set_title('性能比較マトリクス\n(緑=HTTP/3優位、赤=HTTP/2優位)', fontproperties=jp_font)
     
     # Add colorbar
-    cbar2 = plt.colorbar(im, ax=ax4)
+    cbar2 = fig.colorbar(im, ax=ax4)
     cbar2.set_label('HTTP/3優位性 (%)', fontproperties=jp_font)
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'detailed_performance_analysis.png'), 
-                dpi=150, bbox_inches='tight')
-    plt.close()
-    
-    # Create summary statistics
-    create_summary_statistics(data, output_dir)
+    render(fig, os.path.join(output_dir, 'detailed_performance_analysis.png'), profile, dpi=150, layout=True,
+           sink=sink)
 
-def create_summary_statistics(data, output_dir):
+@register_figure('summary')
+def create_summary_statistics(data, output_dir, profile='publication', sink=None):
     """Create summary statistics and key findings"""
     
     # Calculate summary statistics (高速化のため一度に抽出)
@@ -412,7 +416,7 @@ def create_summary_statistics(data, output_dir):
     h2_advantage_conditions = [i for i, adv in enumerate(throughput_advantages) if adv < 0]
     
     # Create summary figure
-    fig, axes = plt.subplots(1, 2, figsize=(16, 6))
+    fig, axes = subplots(1, 2, figsize=(16, 6))
     fig.suptitle('性能逆転現象の統計分析', fontsize=16, fontweight='bold', fontproperties=jp_font)
     
     # 1. Advantage distribution
@@ -454,14 +458,44 @@ def create_summary_statistics(data, output_dir):
         ax2.text(bar.get_x() + bar.get_width()/2., height + (1 if adv >= 0 else -1),
                 f'{adv:.1f}%', ha='center', va='bottom' if adv >= 0 else 'top', fontweight='bold', fontproperties=jp_font)
     
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, 'performance_summary_statistics.png'), 
-                dpi=150, bbox_inches='tight')
-    plt.close()
+    render(fig, os.path.join(output_dir, 'performance_summary_statistics.png'), profile, dpi=150, layout=True,
+           sink=sink)
+
+@register_figure('cdf', needs=('requests',), default=False)
+def create_latency_cdf_graphs(requests, output_dir, profile='publication', sink=None):
+    """Per-condition response time CDFs of HTTP/2 vs HTTP/3 from per-request logs"""
+    cases = sorted(requests)
+    if not cases:
+        print("No per-request data found for latency CDF graphs")
+        return
     
-    # Generate summary report
-    generate_summary_report(data, output_dir)
+    ncols = min(3, len(cases))
+    nrows = (len(cases) + ncols - 1) // ncols
+    fig, axes = subplots(nrows, ncols, figsize=(6 * ncols, 4.5 * nrows), squeeze=False)
+    fig.suptitle('HTTP/3 vs HTTP/2 レスポンス時間 累積分布', fontsize=16, fontweight='bold', fontproperties=jp_font)
+    colors = {'HTTP/2': '#1f77b4', 'HTTP/3': '#ff7f0e'}
+    
+    for ax, (delay, loss, bw) in zip(axes.flat, cases):
+        for protocol, latencies in sorted(requests[(delay, loss, bw)].items()):
+            sorted_ms = np.sort(latencies)
+            prob = np.arange(1, sorted_ms.size + 1) / sorted_ms.size
+            p50, p95 = np.percentile(sorted_ms, [50, 95])
+            ax.plot(sorted_ms, prob, color=colors[protocol], linewidth=1.5,
+                    label=f'{protocol} (p50 {p50:.1f}ms, p95 {p95:.1f}ms)')
+        ax.set_title(f'{delay}ms / {loss}% / {bw}Mbps', fontweight='bold')
+        ax.set_xlabel('Response Time (ms)')
+        ax.set_ylabel('Cumulative Probability')
+        ax.grid(True, alpha=0.3)
+        ax.legend(fontsize=8, loc='lower right')
+    for ax in list(axes.flat)[len(cases):]:
+        ax.set_visible(False)
+    
+    fig.tight_layout()
+    fig.subplots_adjust(top=1 - 0.7 / (4.5 * nrows))  # タイトル用の余白 (約0.7インチ)
+    saved = render(fig, os.path.join(output_dir, 'latency_cdf.png'), profile, dpi=150, sink=sink)
+    print(f"Latency CDF Graph Generation Completed: {saved}")
 
+@register_figure('report', renders=False)
 def generate_summary_report(data, output_dir):
     """Generate a summary report with key findings"""
     
@@ -548,6 +582,41 @@ def generate_summary_report(data, output_dir):
     
     print(f"Summary Report Generation Completed: {report_file}")
 
+def parse_case_filename(filename):
+    """Extract (delay, loss, bandwidth) from h2_150ms_3pct.csv or h2_150ms_3pct_10mbps.csv"""
+    base = os.path.basename(filename)
+    parts = base.split('_')
+    delay = int(parts[1].replace('ms',''))
+    loss_part = parts[2]
+    if 'mbps' in base:
+        # 帯域指定あり
+        loss = int(loss_part.replace('pct',''))
+        bw = int(parts[3].replace('mbps.csv',''))
+    else:
+        # ファイル名の末尾の.csvを除去してからpctを除去
+        loss = int(loss_part.replace('pct.csv','').replace('pct',''))
+        bw = 0
+    return delay, loss, bw
+
+def load_request_latencies(log_dir):
+    """Load per-request response times (ms) from h2_*.csv / h3_*.csv h2load logs
+
+    Returns {(delay, loss, bandwidth): {'HTTP/2': array, 'HTTP/3': array}}.
+    """
+    latencies = {}
+    for prefix, protocol in (('h2', 'HTTP/2'), ('h3', 'HTTP/3')):
+        for csv_path in sorted(glob.glob(os.path.join(log_dir, f'{prefix}_*.csv'))):
+            try:
+                # h2load --log-file: start_us <TAB> status <TAB> duration_us
+                durations = np.loadtxt(csv_path, delimiter='\t', usecols=2, comments='#', ndmin=1)
+                case = parse_case_filename(csv_path)
+            except (ValueError, IndexError) as e:
+                print(f"Warning: Error reading {csv_path}: {e}")
+                continue
+            if durations.size:
+                latencies.setdefault(case, {})[protocol] = durations / 1000.0
+    return latencies
+
 def load_benchmark_csvs(log_dir):
     print(f"[DEBUG] load_benchmark_csvs received log_dir: {log_dir}")
     
@@ -569,21 +638,6 @@ def load_benchmark_csvs(log_dir):
         print(f"Error: No benchmark CSV data found in {log_dir}")
         sys.exit(1)
     data = []
-    def parse_case(filename):
-        # 例: h2_150ms_3pct.csv または h2_150ms_3pct_10mbps.csv
-        base = os.path.basename(filename)
-        parts = base.split('_')
-        delay = int(parts[1].replace('ms',''))
-        loss_part = parts[2]
-        if 'mbps' in base:
-            # 帯域指定あり
-            loss = int(loss_part.replace('pct',''))
-            bw = int(parts[3].replace('mbps.csv',''))
-        else:
-            # ファイル名の末尾の.csvを除去してからpctを除去
-            loss = int(loss_part.replace('pct.csv','').replace('pct',''))
-            bw = 0
-        return delay, loss, bw
     
     def extract_metrics_from_log(logfile):
         """高速化されたログファイルからのメトリクス抽出"""
@@ -623,8 +677,8 @@ def load_benchmark_csvs(log_dir):
             
         return throughput, latency, connect
 
-    h2_map = {parse_case(f): f for f in h2_csvs}
-    h3_map = {parse_case(f): f for f in h3_csvs}
+    h2_map = {parse_case_filename(f): f for f in h2_csvs}
+    h3_map = {parse_case_filename(f): f for f in h3_csvs}
     all_cases = sorted(set(h2_map.keys()) & set(h3_map.keys()))
     
     for case in all_cases:
@@ -680,16 +734,47 @@ def find_latest_benchmark_dir(base_dir="/logs"):
     sys.stdout.flush()
     return latest_dir
 
-def generate_graphs(log_dir):
-    """指定ディレクトリのベンチマークCSVからグラフを生成する統合関数"""
-    data = load_benchmark_csvs(log_dir)
-    create_performance_comparison_graphs(data, log_dir)
-    create_detailed_analysis_graphs(data, log_dir)
-    create_summary_statistics(data, log_dir)
-    create_network_conditions_info(data, log_dir)
-    generate_summary_report(data, log_dir)
+def select_figures(figures=None):
+    """Validate requested figure names (None: the default figure set)"""
+    if not figures:
+        return [name for name, entry in FIGURES.items() if entry['default']]
+    unknown = [name for name in figures if name not in FIGURES]
+    if unknown:
+        raise ValueError(f"Unknown figure(s): {', '.join(unknown)} (choose from {', '.join(FIGURES)})")
+    return list(dict.fromkeys(figures))
+
+def build_figures(names, load_dataset, output_dir, profile='publication', sink=None):
+    """Build the named figures, loading each dataset once and only if a figure needs it"""
+    setup_fonts()
+    datasets = {}
+    for name in names:
+        entry = FIGURES[name]
+        for dataset in entry['needs']:
+            if dataset not in datasets:
+                with stage_profiler.stage(f"load.{dataset}"):
+                    datasets[dataset] = load_dataset(dataset)
+        inputs = {dataset: datasets[dataset] for dataset in entry['needs']}
+        missing = [dataset for dataset, value in inputs.items() if value is None]
+        if missing:
+            print(f"Skipping figure '{name}': {', '.join(missing)} not available")
+            continue
+        with stage_profiler.stage(f"figure.{name}"):
+            if entry['renders']:
+                entry['build'](output_dir=output_dir, profile=profile, sink=sink, **inputs)
+            else:
+                entry['build'](output_dir=output_dir, **inputs)
+
+def generate_graphs(log_dir, profile='publication', sink=None, figures=None):
+    """指定ディレクトリのベンチマークCSVからグラフを生成する統合関数 (figures: 生成する図の名前、None で既定の全図)"""
+    loaders = {
+        'data': load_benchmark_csvs,
+        'params': load_benchmark_params,
+        'requests': load_request_latencies,
+    }
+    build_figures(select_figures(figures), lambda dataset: loaders[dataset](log_dir), log_dir, profile, sink)
 
-def create_network_conditions_info(data, output_dir):
+@register_figure('conditions', needs=('data', 'params'))
+def create_network_conditions_info(data, output_dir, profile='publication', sink=None, params=None):
     """テスト条件やネットワーク通信環境の情報を表示するグラフを生成"""
     
     # ネットワーク条件の詳細情報を収集（高速化のため一度に処理）
@@ -737,7 +822,7 @@ def create_network_conditions_info(data, output_dir):
         })
     
     # 図の作成
-    fig, axes = plt.subplots(2, 2, figsize=(16, 12))
+    fig, axes = subplots(2, 2, figsize=(16, 12))
     fig.suptitle('テスト条件とネットワーク環境設定', fontsize=18, fontweight='bold', fontproperties=jp_font)
     
     # 1. ネットワーク条件の分布
@@ -861,7 +946,7 @@ def create_network_conditions_info(data, output_dir):
         ['', ''],
         ['ベンチマーク設定', ''],
     ]
-    env_info += load_benchmark_params(output_dir)
+    env_info += load_benchmark_params(output_dir) if params is None else params
     env_info.append(['', ''])
     env_info.append(['ベンチマーク実行スクリプト', 'run_bench.sh'])
 
@@ -881,17 +966,26 @@ def create_network_conditions_info(data, output_dir):
     
     
     # 図の調整
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.92)
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.92)
     
-    # 保存前にCanvasを明示的に描画してから両方保存
-    fig.canvas.draw()
     output_file1 = os.path.join(output_dir, 'network_conditions_info.png')
     output_file2 = os.path.join(output_dir, 'test_conditions_and_network_environment.png')
-    plt.savefig(output_file1, dpi=150, bbox_inches='tight')
-    plt.close()
-    shutil.copyfile(output_file1, output_file2)
-    print(f"Network Conditions Information Graph Generation Completed: {output_file1} および {output_file2}")
+    saved = render(fig, output_file1, profile, dpi=150, sink=sink)
+    if sink is None:
+        # 旧ファイル名は再描画・コピーせずリンクで提供
+        link_alias(output_file1, output_file2)
+        saved = f"{output_file1} および {output_file2}"
+    print(f"Network Conditions Information Graph Generation Completed: {saved}")
+
+def link_alias(target, alias):
+    """Expose target under a second name (relative symlink, copy where symlinks are unavailable)"""
+    try:
+        if os.path.lexists(alias):
+            os.remove(alias)
+        os.symlink(os.path.relpath(target, os.path.dirname(alias)), alias)
+    except OSError:
+        shutil.copyfile(target, alias)
 
 def load_benchmark_params(log_dir):
     params_file = os.path.join(log_dir, 'benchmark_params.txt')
@@ -913,7 +1007,7 @@ def load_benchmark_params(log_dir):
                     params.append((label, v))
     return params
 
-def integrate_multiple_cases(case_dirs, output_dir):
+def integrate_multiple_cases(case_dirs, output_dir, profile='publication', sink=None, figures=None):
     """複数のケースディレクトリからデータを統合"""
     all_data = []
     
@@ -956,11 +1050,9 @@ def integrate_multiple_cases(case_dirs, output_dir):
     # データ形式を変換して統合グラフを生成
     converted_data = convert_data_format(all_data)
     if converted_data:
-        create_performance_comparison_graphs(converted_data, output_dir)
-        create_detailed_analysis_graphs(converted_data, output_dir)
-        create_summary_statistics(converted_data, output_dir)
-        create_network_conditions_info(converted_data, output_dir)
-        generate_summary_report(converted_data, output_dir)
+        # 統合モードではリクエスト単位のデータは無い
+        datasets = {'data': converted_data, 'params': load_benchmark_params(output_dir)}
+        build_figures(select_figures(figures), datasets.get, output_dir, profile, sink)
         
         print(f"Integrated graphs created in: {output_dir}")
     else:
@@ -1033,9 +1125,8 @@ if __name__ == "__main__":
         missing_modules = []
         
         for module in required_modules:
-            try:
-                __import__(module)
-            except ImportError:
+            # 存在確認だけ (seaborn などを読み込むと起動が数秒遅くなる)
+            if importlib.util.find_spec(module) is None:
                 missing_modules.append(module)
         
         if missing_modules:
@@ -1058,45 +1149,60 @@ if __name__ == "__main__":
         
         # コマンドライン引数の解析
         parser = argparse.ArgumentParser(description='Generate performance graphs from benchmark data')
+        parser.add_argument('log_dir_arg', nargs='?', metavar='log_dir', help='Log directory for single case')
         parser.add_argument('--log_dir', help='Log directory for single case')
         parser.add_argument('--integrate_cases', action='store_true', help='Integrate multiple cases')
         parser.add_argument('--case_dirs', nargs='+', help='Case directories for integration')
+        add_render_profile_argument(parser)
+        parser.add_argument('--pdf', help='Write all graphs into this multi-page PDF instead of PNG files')
+        parser.add_argument('--figures', type=lambda v: [f.strip() for f in v.split(',') if f.strip()],
+                            help=f"Comma-separated figures to build (available: {', '.join(FIGURES)}; "
+                                 f"default: {', '.join(select_figures())})")
+        stage_profiler.add_profile_argument(parser)
         
         args = parser.parse_args()
+        try:
+            figures = select_figures(args.figures)
+        except ValueError as e:
+            parser.error(str(e))
+        pdf_sink = PdfSink(args.pdf) if args.pdf else None
+        profile_dir = args.log_dir_arg or args.log_dir or "logs/integrated_results"
         
-        if args.integrate_cases and args.case_dirs:
-            # 統合モード
-            output_dir = args.log_dir if args.log_dir else "logs/integrated_results"
-            os.makedirs(output_dir, exist_ok=True)
-            integrate_multiple_cases(args.case_dirs, output_dir)
-        else:
-            # 単一ケースモード
-            args_list = [a for a in sys.argv[1:] if not a.startswith('--')]
-            if len(args_list) == 0:
-                log_dir = find_latest_benchmark_dir(base_dir='/logs')
-                if log_dir is None:
-                    print("Error: Benchmark directory not found. Please create benchmark_* directory under '/logs'.")
-                    sys.exit(1)
-            elif len(args_list) == 1:
-                log_dir = args_list[0]
-            else:
-                print("Usage: python3 generate_performance_graphs.py <log_dir>")
-                sys.exit(1)
+        try:
+            with stage_profiler.profiling(args.profile, profile_dir, 'generate_performance_graphs',
+                                          memory=args.profile_memory):
+                if args.integrate_cases and args.case_dirs:
+                    # 統合モード
+                    output_dir = args.log_dir if args.log_dir else "logs/integrated_results"
+                    os.makedirs(output_dir, exist_ok=True)
+                    integrate_multiple_cases(args.case_dirs, output_dir, args.render_profile, pdf_sink, figures)
+                else:
+                    # 単一ケースモード
+                    log_dir = args.log_dir_arg or args.log_dir
+                    if log_dir is None:
+                        log_dir = find_latest_benchmark_dir(base_dir='/logs')
+                        if log_dir is None:
+                            print("Error: Benchmark directory not found. "
+                                  "Please create benchmark_* directory under '/logs'.")
+                            sys.exit(1)
             
-            # ログディレクトリの存在確認
-            if not os.path.exists(log_dir):
-                print(f"Error: Log directory '{log_dir}' does not exist.")
-                sys.exit(1)
+                    # ログディレクトリの存在確認
+                    if not os.path.exists(log_dir):
+                        print(f"Error: Log directory '{log_dir}' does not exist.")
+                        sys.exit(1)
             
-            # 必要なファイルの存在確認
-            csv_files = [f for f in os.listdir(log_dir) if f.endswith('.csv')]
-            if not csv_files:
-                print(f"Error: No CSV files found in '{log_dir}'")
-                sys.exit(1)
+                    # 必要なファイルの存在確認
+                    csv_files = [f for f in os.listdir(log_dir) if f.endswith('.csv')]
+                    if not csv_files:
+                        print(f"Error: No CSV files found in '{log_dir}'")
+                        sys.exit(1)
             
-            print(f"[DEBUG] load_benchmark_csvs received log_dir: {log_dir}")
-            generate_graphs(log_dir)
-            print("Graph generation completed! Output directory:", log_dir)
+                    print(f"[DEBUG] load_benchmark_csvs received log_dir: {log_dir}")
+                    generate_graphs(log_dir, args.render_profile, pdf_sink, figures)
+                    print("Graph generation completed! Output directory:", log_dir)
+        finally:
+            if pdf_sink:
+                pdf_sink.close()
         
     except ImportError as e:
         print(f"Error: Required module not found: {e}")
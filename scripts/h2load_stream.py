@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Streaming parser for h2load per-request logs
+h2load's --log-file writes one tab-separated record per request
+(start time [us since epoch], HTTP status, duration [us]). With
+--log-file=/dev/stdout those records are interleaved with the normal summary,
+so the parser separates the two line by line while the benchmark is running.
+"""
+
+import re
+import subprocess
+import uuid
+from array import array
+
+import event_log
+import metrics_exporter
+
+REQUEST_RECORD = re.compile(r'^(\d+)\t(-?\d+)\t(\d+)$')
+STREAM_LOG_FILE = '/dev/stdout'
+
+LOG_TRANSPORTS = ('stream', 'file')
+DEFAULT_LOG_TRANSPORT = 'stream'
+
+
+class RequestLogParser:
+    """Incremental demultiplexer for h2load output with embedded request records
+
+    feed() takes one line at a time: request records are appended to compact
+    arrays (and optionally to a raw log file), everything else is kept as the
+    summary text that parse_throughput/parse_latency expect.
+    """
+
+    def __init__(self, raw_log=None, observer=None):
+        self.start_us = array('q')
+        self.status = array('l')
+        self.duration_us = array('q')
+        self.summary_lines = []
+        self._raw_log = raw_log
+        self._observer = observer  # observe(status, duration_us) per record (live metrics)
+
+    def __len__(self):
+        return len(self.duration_us)
+
+    def feed(self, line):
+        """Consume one output line; return True if it was a request record"""
+        match = REQUEST_RECORD.match(line.rstrip('\r\n'))
+        if not match:
+            self.summary_lines.append(line)
+            return False
+        status, duration = int(match.group(2)), int(match.group(3))
+        self.start_us.append(int(match.group(1)))
+        self.status.append(status)
+        self.duration_us.append(duration)
+        if self._observer is not None:
+            self._observer(status, duration)
+        if self._raw_log is not None:
+            self._raw_log.write(line if line.endswith('\n') else line + '\n')
+        return True
+
+    def feed_file(self, path):
+        """Parse an h2load log file that was written to disk"""
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                self.feed(line)
+        return self
+
+    @property
+    def summary(self):
+        return ''.join(self.summary_lines)
+
+    def write_detailed_csv(self, csv_file, protocol, delay, loss, request_size=200):
+        """Write completed requests in the ultra_final detailed CSV format; return the row count"""
+        rows = 0
+        with open(csv_file, 'w') as f:
+            f.write(f"# Protocol: {protocol}\n")
+            f.write(f"# Delay: {delay}ms\n")
+            f.write(f"# Loss: {loss}%\n")
+            f.write("# Timestamp(ns)\tRequestSize(bytes)\tResponseTime(us)\n")
+            for start, duration in zip(self.start_us, self.duration_us):
+                if duration > 0:
+                    f.write(f"{start * 1000}\t{request_size}\t{duration}\n")
+                    rows += 1
+        return rows
+
+
+SUMMARY_PATTERNS = {
+    'throughput': re.compile(r'finished in \S+, ([\d.]+) req/s'),
+    'succeeded': re.compile(r'requests:.* (\d+) succeeded'),
+    'failed': re.compile(r'requests:.* (\d+) failed'),
+    'mean_latency_ms': re.compile(r'time for request:\s+\S+\s+\S+\s+([\d.]+)ms'),
+}
+
+
+def parse_summary(text):
+    """Key figures from an h2load summary (the last one wins when a log holds several runs)"""
+    summary = {}
+    for name, pattern in SUMMARY_PATTERNS.items():
+        matches = pattern.findall(text)
+        if matches:
+            summary[name] = float(matches[-1])
+    return summary
+
+
+def unique_log_path(directory='/tmp'):
+    """Per-run log path inside the container so concurrent runs never share a file"""
+    return f"{directory}/h2load_{uuid.uuid4().hex}.log"
+
+
+def run_h2load(agent, cmd, raw_log_path, transport=DEFAULT_LOG_TRANSPORT, timeout=60):
+    """Run h2load in a container and parse its per-request log
+
+    cmd: h2load arguments without --log-file
+    raw_log_path: host path that receives the raw per-request log
+    transport: 'stream' pipes the log through stdout and parses it while h2load
+        runs; 'file' writes it to a unique path in the container and copies it out
+        (the metrics observer then only sees the requests after the copy).
+    Returns (CompletedProcess with the summary as stdout, RequestLogParser).
+    """
+    if transport not in LOG_TRANSPORTS:
+        raise ValueError(f"unknown log transport: {transport}")
+
+    if transport == 'stream':
+        with open(raw_log_path, 'w') as raw_log, \
+                agent.stream(cmd + [f'--log-file={STREAM_LOG_FILE}'], timeout=timeout) as proc:
+            parser = RequestLogParser(raw_log, observer=metrics_exporter.request_observer())
+            for line in proc:
+                parser.feed(line)
+            result = proc.wait()
+    else:
+        container_log = unique_log_path()
+        try:
+            result = agent.run(cmd + [f'--log-file={container_log}'], timeout=timeout)
+            parser = RequestLogParser(observer=metrics_exporter.request_observer())
+            if result.returncode == 0:
+                with event_log.span('log_copy', container=getattr(agent, 'container', None), path=str(raw_log_path)):
+                    agent.copy_to_host(container_log, raw_log_path)
+                parser.feed_file(raw_log_path)
+        finally:
+            agent.run(['rm', '-f', container_log])
+        for line in result.stdout.splitlines(keepends=True):
+            parser.feed(line)
+
+    return subprocess.CompletedProcess(result.args, result.returncode, parser.summary, result.stderr), parser
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+Self-contained interactive HTML report for benchmark campaigns
+Per-request CSVs are pre-aggregated (quantile CDFs, bucketed time series, H2 vs H3
+deltas) and embedded as base64 Float32Array data; charts are drawn client-side.
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import numpy as np
+
+import stage_profiler
+
+# run_bench.sh 形式: h2_150ms_3pct.csv (h2load --log-file: start_us, status, duration_us)
+H2LOAD_LOG_PATTERN = re.compile(r'^(h2|h3)_(\d+)ms_(\d+(?:\.\d+)?)pct\.csv$')
+# ultra_final_analysis.py 形式: http2_150ms_3pct_0mbps[_averaged].csv (timestamp_ns, size, response_us)
+ULTRA_FINAL_PATTERN = re.compile(r'^(http2|http3)_(\d+)ms_(\d+(?:\.\d+)?)pct_(\d+)mbps(?:_averaged)?\.csv$')
+
+PROTOCOL_NAMES = {'h2': 'http2', 'h3': 'http3'}
+DEFAULT_CDF_POINTS = 200
+DEFAULT_MAX_POINTS = 1000
+
+
+def find_request_csvs(log_dir):
+    """Find per-request CSV files and the conditions encoded in their names"""
+    found = []
+    for root, dirs, files in os.walk(log_dir):
+        dirs.sort()
+        for name in sorted(files):
+            m = H2LOAD_LOG_PATTERN.match(name)
+            if m:
+                protocol, delay, loss = PROTOCOL_NAMES[m.group(1)], int(m.group(2)), float(m.group(3))
+                bandwidth, time_unit = 0, 1e6
+            else:
+                m = ULTRA_FINAL_PATTERN.match(name)
+                if not m:
+                    continue
+                protocol, delay, loss = m.group(1), int(m.group(2)), float(m.group(3))
+                bandwidth, time_unit = int(m.group(4)), 1e9
+            found.append({
+                'path': os.path.join(root, name),
+                'group': os.path.relpath(root, log_dir),
+                'protocol': protocol,
+                'delay': delay,
+                'loss': loss,
+                'bandwidth': bandwidth,
+                'time_unit': time_unit,
+            })
+    return found
+
+
+def load_requests(path, time_unit):
+    """Load start times (s, relative) and response times (ms) from a per-request CSV"""
+    import pandas as pd  # 読み込み時だけ (ultra_final_analysis --help を遅くしない)
+    try:
+        df = pd.read_csv(path, sep='\t', comment='#', header=None, usecols=[0, 2],
+                         names=['start', 'response_us'], dtype='int64')
+    except (ValueError, pd.errors.EmptyDataError) as e:
+        print(f"Warning: skipping {path}: {e}")
+        return None, None
+    if df.empty:
+        return None, None
+    df = df.sort_values('start', kind='stable')
+    start = df['start'].to_numpy()
+    start_s = (start - start[0]) / time_unit
+    latency_ms = df['response_us'].to_numpy() / 1000.0
+    return start_s, latency_ms
+
+
+def encode_array(values):
+    """Encode an array as base64 little-endian float32 (decoded into a Float32Array)"""
+    return base64.b64encode(np.asarray(values, dtype='<f4').tobytes()).decode('ascii')
+
+
+def downsample_series(start_s, latency_ms, max_points):
+    """Bucket a time series to at most max_points (bucket start, mean and max latency)"""
+    n = len(latency_ms)
+    buckets = min(n, max_points)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    counts = np.diff(np.append(edges, n))
+    return start_s[edges], np.add.reduceat(latency_ms, edges) / counts, np.maximum.reduceat(latency_ms, edges)
+
+
+def summarize_series(entry, start_s, latency_ms, cdf_points, max_points):
+    """Pre-aggregate one request series for embedding"""
+    t, mean_ms, max_ms = downsample_series(start_s, latency_ms, max_points)
+    p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+    return {
+        'protocol': entry['protocol'],
+        'delay': entry['delay'],
+        'loss': entry['loss'],
+        'bandwidth': entry['bandwidth'],
+        'file': os.path.basename(entry['path']),
+        'stats': {
+            'count': int(len(latency_ms)),
+            'mean': float(latency_ms.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(latency_ms.max()),
+        },
+        'cdf': encode_array(np.quantile(latency_ms, np.linspace(0.0, 1.0, cdf_points))),
+        't': encode_array(t),
+        'mean': encode_array(mean_ms),
+        'peak': encode_array(max_ms),
+    }
+
+
+def compute_deltas(series_list):
+    """HTTP/3 - HTTP/2 differences per condition (negative means HTTP/3 is faster)"""
+    by_condition = {}
+    for s in series_list:
+        key = (s['delay'], s['loss'], s['bandwidth'])
+        by_condition.setdefault(key, {}).setdefault(s['protocol'], []).append(s['stats'])
+
+    deltas = []
+    for (delay, loss, bandwidth), protocols in sorted(by_condition.items()):
+        if 'http2' not in protocols or 'http3' not in protocols:
+            continue
+        row = {'delay': delay, 'loss': loss, 'bandwidth': bandwidth}
+        for metric in ('mean', 'p50', 'p95', 'p99'):
+            # 同一条件に複数ファイルがある場合はその平均で比較
+            h2 = float(np.mean([st[metric] for st in protocols['http2']]))
+            h3 = float(np.mean([st[metric] for st in protocols['http3']]))
+            row[metric] = h3 - h2
+            row[f'{metric}_pct'] = (h3 - h2) / h2 * 100 if h2 > 0 else 0.0
+        deltas.append(row)
+    return deltas
+
+
+def build_report_data(log_dir, cdf_points=DEFAULT_CDF_POINTS, max_points=DEFAULT_MAX_POINTS):
+    """Aggregate every per-request CSV under log_dir into the embedded report payload"""
+    groups = {}
+    for entry in find_request_csvs(log_dir):
+        start_s, latency_ms = load_requests(entry['path'], entry['time_unit'])
+        if latency_ms is None:
+            continue
+        groups.setdefault(entry['group'], []).append(
+            summarize_series(entry, start_s, latency_ms, cdf_points, max_points))
+
+    for series_list in groups.values():
+        series_list.sort(key=lambda s: (s['delay'], s['loss'], s['bandwidth'], s['protocol'], s['file']))
+
+    return {
+        'title': f"HTTP/2 vs HTTP/3 Benchmark Report - {os.path.basename(os.path.abspath(log_dir))}",
+        'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'cdf_points': cdf_points,
+        'groups': {group: {'series': series_list, 'deltas': compute_deltas(series_list)}
+                   for group, series_list in sorted(groups.items())},
+    }
+
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 20px; color: #222; }
+h1 { font-size: 20px; }
+h2 { font-size: 16px; margin-top: 24px; }
+.controls { margin: 10px 0; }
+.controls label { margin-right: 16px; }
+canvas { border: 1px solid #ccc; display: block; margin: 8px 0; }
+table { border-collapse: collapse; font-size: 13px; }
+th, td { border: 1px solid #ccc; padding: 3px 8px; text-align: right; }
+th { background: #f0f0f0; }
+.faster { color: #2a7d2a; }
+.slower { color: #c0392b; }
+.meta { color: #666; font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<div class="meta">Generated: <span id="generated"></span></div>
+<div class="controls">
+  <label>Directory <select id="group"></select></label>
+  <label>Condition <select id="condition"></select></label>
+  <label><input type="checkbox" id="logx"> log-scale latency</label>
+</div>
+<h2>Latency CDF</h2>
+<canvas id="cdf" width="1000" height="380"></canvas>
+<h2>Latency time series (bucket mean, dashed: bucket max)</h2>
+<canvas id="series" width="1000" height="380"></canvas>
+<h2>HTTP/3 - HTTP/2 delta per condition (negative: HTTP/3 faster)</h2>
+<canvas id="delta" width="1000" height="320"></canvas>
+<table id="summary"></table>
+<script id="report-data" type="application/json">__DATA__</script>
+<script>
+(function () {
+  'use strict';
+  var data = JSON.parse(document.getElementById('report-data').textContent);
+  var COLORS = { http2: '#1f77b4', http3: '#ff7f0e' };
+  var PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f'];
+  var decoded = {};
+
+  function decode(b64) {
+    if (!decoded[b64]) {
+      var bin = atob(b64);
+      var bytes = new Uint8Array(bin.length);
+      for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+      decoded[b64] = new Float32Array(bytes.buffer);
+    }
+    return decoded[b64];
+  }
+
+  function conditionKey(s) { return s.delay + 'ms / ' + s.loss + '% / ' + s.bandwidth + 'Mbps'; }
+
+  function niceTicks(lo, hi, n) {
+    var span = hi - lo || 1;
+    var step = Math.pow(10, Math.floor(Math.log10(span / n)));
+    var err = span / n / step;
+    step *= err >= 7.5 ? 10 : err >= 3.5 ? 5 : err >= 1.5 ? 2 : 1;
+    var ticks = [];
+    for (var v = Math.ceil(lo / step) * step; v <= hi + step * 1e-9; v += step) ticks.push(v);
+    return ticks;
+  }
+
+  function fmt(v) {
+    var a = Math.abs(v);
+    return a >= 1000 ? v.toFixed(0) : a >= 10 ? v.toFixed(1) : v.toFixed(2);
+  }
+
+  // 軸付きの描画領域を用意し、データ座標 -> ピクセル座標の変換関数を返す
+  function axes(canvas, xr, yr, opts) {
+    var ctx = canvas.getContext('2d');
+    var m = { l: 70, r: 20, t: 20, b: 45 };
+    var w = canvas.width - m.l - m.r, h = canvas.height - m.t - m.b;
+    var logx = !!opts.logx;
+    var fx = function (v) { return logx ? Math.log10(Math.max(v, 1e-3)) : v; };
+    var x0 = fx(xr[0]), x1 = fx(xr[1]);
+    if (x1 === x0) x1 = x0 + 1;
+    var y0 = yr[0], y1 = yr[1] === yr[0] ? yr[0] + 1 : yr[1];
+    var px = function (v) { return m.l + (fx(v) - x0) / (x1 - x0) * w; };
+    var py = function (v) { return m.t + h - (v - y0) / (y1 - y0) * h; };
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.font = '11px sans-serif';
+    ctx.strokeStyle = '#e5e5e5';
+    ctx.fillStyle = '#444';
+    ctx.lineWidth = 1;
+    niceTicks(y0, y1, 6).forEach(function (v) {
+      ctx.beginPath(); ctx.moveTo(m.l, py(v)); ctx.lineTo(m.l + w, py(v)); ctx.stroke();
+      ctx.textAlign = 'right'; ctx.fillText(fmt(v), m.l - 6, py(v) + 4);
+    });
+    var xticks = logx ? niceTicks(x0, x1, 6).map(function (v) { return Math.pow(10, v); }) : niceTicks(x0, x1, 8);
+    xticks.forEach(function (v) {
+      ctx.beginPath(); ctx.moveTo(px(v), m.t); ctx.lineTo(px(v), m.t + h); ctx.stroke();
+      ctx.textAlign = 'center'; ctx.fillText(fmt(v), px(v), m.t + h + 16);
+    });
+    ctx.strokeStyle = '#888';
+    ctx.strokeRect(m.l, m.t, w, h);
+    ctx.textAlign = 'center';
+    ctx.fillText(opts.xlabel, m.l + w / 2, canvas.height - 6);
+    ctx.save(); ctx.translate(14, m.t + h / 2); ctx.rotate(-Math.PI / 2);
+    ctx.fillText(opts.ylabel, 0, 0); ctx.restore();
+    return { ctx: ctx, px: px, py: py, m: m, w: w, h: h };
+  }
+
+  function polyline(a, xs, ys, color, dashed) {
+    var ctx = a.ctx;
+    ctx.strokeStyle = color;
+    ctx.lineWidth = 1.5;
+    ctx.setLineDash(dashed ? [4, 3] : []);
+    ctx.beginPath();
+    for (var i = 0; i < ys.length; i++) {
+      var x = a.px(xs[i]), y = a.py(ys[i]);
+      if (i === 0) ctx.moveTo(x, y); else ctx.lineTo(x, y);
+    }
+    ctx.stroke();
+    ctx.setLineDash([]);
+  }
+
+  function legend(a, items) {
+    var ctx = a.ctx;
+    items.forEach(function (it, i) {
+      var y = a.m.t + 14 + i * 16;
+      ctx.fillStyle = it.color;
+      ctx.fillRect(a.m.l + a.w - 220, y - 8, 12, 3);
+      ctx.fillStyle = '#222';
+      ctx.textAlign = 'left';
+      ctx.fillText(it.label, a.m.l + a.w - 202, y - 3);
+    });
+  }
+
+  function range(arrays) {
+    var lo = Infinity, hi = -Infinity;
+    arrays.forEach(function (arr) {
+      for (var i = 0; i < arr.length; i++) { if (arr[i] < lo) lo = arr[i]; if (arr[i] > hi) hi = arr[i]; }
+    });
+    return lo === Infinity ? [0, 1] : [lo, hi];
+  }
+
+  function selectedSeries() {
+    var group = data.groups[document.getElementById('group').value];
+    var cond = document.getElementById('condition').value;
+    return group.series.filter(function (s) { return cond === '*' || conditionKey(s) === cond; });
+  }
+
+  function seriesColor(s, i, all) {
+    var conds = {};
+    all.forEach(function (x) { conds[conditionKey(x)] = true; });
+    return Object.keys(conds).length > 1 ? PALETTE[i % PALETTE.length] : COLORS[s.protocol];
+  }
+
+  function seriesLabel(s) { return s.protocol.toUpperCase() + ' ' + conditionKey(s) + ' (' + s.file + ')'; }
+
+  function drawCdf() {
+    var list = selectedSeries();
+    var canvas = document.getElementById('cdf');
+    var logx = document.getElementById('logx').checked;
+    var xs = list.map(function (s) { return decode(s.cdf); });
+    var probs = new Float32Array(data.cdf_points);
+    for (var i = 0; i < probs.length; i++) probs[i] = i / (probs.length - 1);
+    var a = axes(canvas, range(xs), [0, 1],
+                 { xlabel: 'Response time (ms)', ylabel: 'Cumulative probability', logx: logx });
+    list.forEach(function (s, i) { polyline(a, xs[i], probs, seriesColor(s, i, list), false); });
+    legend(a, list.slice(0, 12).map(function (s, i) {
+      return { label: seriesLabel(s), color: seriesColor(s, i, list) };
+    }));
+  }
+
+  function drawSeries() {
+    var list = selectedSeries();
+    var canvas = document.getElementById('series');
+    var ts = list.map(function (s) { return decode(s.t); });
+    var peaks = list.map(function (s) { return decode(s.peak); });
+    var yr = range(peaks.concat(list.map(function (s) { return decode(s.mean); })));
+    var a = axes(canvas, range(ts), [0, yr[1]], { xlabel: 'Elapsed time (s)', ylabel: 'Response time (ms)' });
+    list.forEach(function (s, i) {
+      var color = seriesColor(s, i, list);
+      polyline(a, ts[i], decode(s.mean), color, false);
+      polyline(a, ts[i], peaks[i], color, true);
+    });
+    legend(a, list.slice(0, 12).map(function (s, i) {
+      return { label: seriesLabel(s), color: seriesColor(s, i, list) };
+    }));
+  }
+
+  function drawDelta() {
+    var deltas = data.groups[document.getElementById('group').value].deltas;
+    var canvas = document.getElementById('delta');
+    var metrics = ['mean', 'p50', 'p95', 'p99'];
+    var vals = [0];
+    deltas.forEach(function (d) { metrics.forEach(function (k) { vals.push(d[k + '_pct']); }); });
+    var lo = Math.min.apply(null, vals), hi = Math.max.apply(null, vals);
+    var a = axes(canvas, [0, Math.max(deltas.length, 1)], [lo, hi],
+                 { xlabel: 'Condition', ylabel: 'HTTP/3 - HTTP/2 (%)' });
+    var ctx = a.ctx;
+    var slot = a.w / Math.max(deltas.length, 1), bw = slot * 0.8 / metrics.length;
+    deltas.forEach(function (d, i) {
+      metrics.forEach(function (k, j) {
+        var x = a.m.l + i * slot + slot * 0.1 + j * bw;
+        var y0 = a.py(0), y1 = a.py(d[k + '_pct']);
+        ctx.fillStyle = PALETTE[j + 2];
+        ctx.fillRect(x, Math.min(y0, y1), bw - 1, Math.abs(y1 - y0));
+      });
+      ctx.fillStyle = '#222';
+      ctx.textAlign = 'center';
+      ctx.fillText(d.delay + 'ms/' + d.loss + '%', a.m.l + (i + 0.5) * slot, a.m.t + a.h + 30);
+    });
+    legend(a, metrics.map(function (k, j) { return { label: k, color: PALETTE[j + 2] }; }));
+    drawTable(deltas, metrics);
+  }
+
+  function drawTable(deltas, metrics) {
+    var html = '<tr><th>Delay</th><th>Loss</th><th>Bandwidth</th>';
+    metrics.forEach(function (k) { html += '<th>' + k + ' delta (ms)</th><th>' + k + ' delta (%)</th>'; });
+    html += '</tr>';
+    deltas.forEach(function (d) {
+      html += '<tr><td>' + d.delay + 'ms</td><td>' + d.loss + '%</td><td>' + d.bandwidth + 'Mbps</td>';
+      metrics.forEach(function (k) {
+        var cls = d[k] < 0 ? 'faster' : 'slower';
+        html += '<td class="' + cls + '">' + fmt(d[k]) + '</td>' +
+                '<td class="' + cls + '">' + d[k + '_pct'].toFixed(1) + '</td>';
+      });
+      html += '</tr>';
+    });
+    document.getElementById('summary').innerHTML =
+      deltas.length ? html : '<tr><td>No HTTP/2 + HTTP/3 pairs in this directory</td></tr>';
+  }
+
+  function fillConditions() {
+    var group = data.groups[document.getElementById('group').value];
+    var select = document.getElementById('condition');
+    var seen = {};
+    select.innerHTML = '<option value="*">all</option>';
+    group.series.forEach(function (s) {
+      var key = conditionKey(s);
+      if (!seen[key]) { seen[key] = true; select.add(new Option(key, key)); }
+    });
+    if (select.options.length > 1) select.selectedIndex = 1;
+  }
+
+  function redraw() { drawCdf(); drawSeries(); drawDelta(); }
+
+  document.getElementById('generated').textContent = data.generated;
+  var groupSelect = document.getElementById('group');
+  var names = Object.keys(data.groups);
+  if (!names.length) { document.body.insertAdjacentHTML('beforeend', '<p>No per-request data found.</p>'); return; }
+  names.forEach(function (g) { groupSelect.add(new Option(g, g)); });
+  groupSelect.addEventListener('change', function () { fillConditions(); redraw(); });
+  document.getElementById('condition').addEventListener('change', redraw);
+  document.getElementById('logx').addEventListener('change', redraw);
+  fillConditions();
+  redraw();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def render_html(report_data):
+    """Render the report payload into a single self-contained HTML document"""
+    # </script> を含むと埋め込み JSON が途中で閉じるためエスケープ
+    payload = json.dumps(report_data, separators=(',', ':')).replace('</', '<\\/')
+    title = report_data['title'].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return HTML_TEMPLATE.replace('__TITLE__', title).replace('__DATA__', payload)
+
+
+def generate_html_report(log_dir, output_file=None, cdf_points=DEFAULT_CDF_POINTS, max_points=DEFAULT_MAX_POINTS):
+    """Write the interactive HTML report for log_dir and return its path"""
+    output_file = output_file or os.path.join(log_dir, 'benchmark_report.html')
+    report_data = build_report_data(log_dir, cdf_points, max_points)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(render_html(report_data))
+    series_count = sum(len(g['series']) for g in report_data['groups'].values())
+    print(f"HTML report generated: {output_file} ({series_count} series in {len(report_data['groups'])} directories)")
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a self-contained interactive HTML benchmark report')
+    parser.add_argument('log_dir', help='Benchmark log directory (run_bench.sh or ultra_final_analysis.py layout)')
+    parser.add_argument('--output', help='Output HTML file (default: <log_dir>/benchmark_report.html)')
+    parser.add_argument('--cdf_points', type=int, default=DEFAULT_CDF_POINTS,
+                        help=f'Quantile points per CDF (default: {DEFAULT_CDF_POINTS})')
+    parser.add_argument('--max_points', type=int, default=DEFAULT_MAX_POINTS,
+                        help=f'Maximum time series points per file (default: {DEFAULT_MAX_POINTS})')
+    stage_profiler.add_profile_argument(parser)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.log_dir):
+        print(f"Error: {args.log_dir} is not a directory")
+        sys.exit(1)
+    with stage_profiler.profiling(args.profile, args.log_dir, 'html_report', memory=args.profile_memory):
+        generate_html_report(args.log_dir, args.output, args.cdf_points, args.max_points)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Load-generator backends with a common result schema
+Measurements come from three load generators with incompatible outputs:
+  h2load               summary text + --log-file records (scripts/)
+  go                   latency_results.json / run_N_results.json, ns latencies (go-impl/)
+  protocol_comparison  benchmark_results.csv with time_total / speed_kbps (protocol_comparison/)
+Every backend turns its output into BackendRun: per-request records in the
+h2load log format (RequestLogParser arrays) plus one summary dict, so CSVs,
+the analysis pipeline, its cache and the graphs work the same for all of them.
+
+Import existing results into a campaign directory for ultra_final_analysis.py:
+  load_backends.py go go-impl/logs/summary_* --log_dir logs/go_import --loss 3
+  ultra_final_analysis.py --log_dir logs/go_import --analyze_only
+"""
+
+import abc
+import argparse
+import csv
+import json
+from pathlib import Path
+
+from h2load_stream import DEFAULT_LOG_TRANSPORT, RequestLogParser, parse_summary, run_h2load
+from campaign_state import STATE_FILE, CampaignState, unit_key
+
+DEFAULT_BACKEND = 'h2load'
+FAILED_STATUS = -1
+
+
+def normalize_protocol(name):
+    """'HTTP/2', 'h2', 'http2' -> 'http2' (same for HTTP/3)"""
+    key = name.lower().replace('/', '').replace('http', 'h')
+    if key in ('h2', 'h3'):
+        return 'http' + key[1]
+    raise ValueError(f"unknown protocol: {name}")
+
+
+def summarize(records, failed=0, elapsed_s=None):
+    """Common summary of a run from its request records
+
+    failed: failed requests that have no record (counted on top of failed records)
+    throughput: req/s (succeeded / elapsed_s, default: first start to last completion)
+    latency: mean request latency (ms) of succeeded requests
+    """
+    succeeded = [(start, duration) for start, status, duration
+                 in zip(records.start_us, records.status, records.duration_us) if status != FAILED_STATUS]
+    summary = {'succeeded': len(succeeded), 'failed': len(records) - len(succeeded) + failed}
+    if succeeded:
+        summary['latency'] = sum(duration for _, duration in succeeded) / len(succeeded) / 1000.0
+        if elapsed_s is None:
+            elapsed_s = (max(start + duration for start, duration in succeeded)
+                         - min(start for start, _ in succeeded)) / 1e6
+        if elapsed_s > 0:
+            summary['throughput'] = len(succeeded) / elapsed_s
+    return summary
+
+
+class BackendRun:
+    """One run of a load generator: per-request records plus the common summary
+
+    summary always carries throughput (req/s), latency (mean, ms), succeeded and
+    failed when the run produced them; backends may add their own extra fields.
+    """
+
+    def __init__(self, protocol, records, summary, condition=None, source=None):
+        self.protocol = normalize_protocol(protocol)
+        self.records = records  # RequestLogParser
+        self.summary = summary
+        self.condition = condition  # (delay, loss, bandwidth) when the output states it
+        self.source = source
+
+    @property
+    def ok(self):
+        return bool(self.summary.get('throughput') and self.summary.get('latency'))
+
+    def write_log(self, path):
+        """Write the records in h2load --log-file format (the raw log every consumer reads)"""
+        with open(path, 'w') as f:
+            for start, status, duration in zip(self.records.start_us, self.records.status, self.records.duration_us):
+                f.write(f"{start}\t{status}\t{duration}\n")
+        return Path(path)
+
+    def to_result(self, log_file):
+        """Result dict in the shape the ultra_final campaign passes to post-processing"""
+        return dict(self.summary, log_file=str(log_file), requests=self.records)
+
+    def __repr__(self):
+        return f"BackendRun({self.protocol}, {self.condition}, {len(self.records)} requests, {self.source})"
+
+
+class LoadBackend(abc.ABC):
+    """Base class: load() imports existing output, run() drives the generator where can_run is set"""
+
+    name = None
+    can_run = False  # True if run() can drive the generator in a campaign
+
+    def run(self, agent, protocol, url, raw_log_path, transport=DEFAULT_LOG_TRANSPORT, timeout=60):
+        """Run one benchmark in a container; returns (CompletedProcess, BackendRun)"""
+        raise RuntimeError(f"the {self.name} backend only imports existing results; "
+                           f"use load_backends.py {self.name} <results> --log_dir <dir> and analyze that directory")
+
+    @abc.abstractmethod
+    def load(self, path, **condition):
+        """Runs contained in an output file (or a directory of them)"""
+
+
+class H2loadBackend(LoadBackend):
+    name = 'h2load'
+    can_run = True
+
+    def __init__(self, requests=1000, connections=5, threads=2, streams=None):
+        self.requests = requests
+        self.connections = connections
+        self.threads = threads
+        self.streams = streams  # -m (h2load default: 1 stream per connection)
+
+    def command(self, protocol, url):
+        alpn = '--alpn-list=h2,http/1.1' if normalize_protocol(protocol) == 'http2' else '--alpn-list=h3,h2,http/1.1'
+        cmd = ['h2load', alpn, '-n', str(self.requests), '-c', str(self.connections), '-t', str(self.threads)]
+        if self.streams:
+            cmd += ['-m', str(self.streams)]
+        return cmd + [url]
+
+    def _run_from(self, protocol, records, summary_text, condition=None, source=None):
+        summary = summarize(records)
+        # h2load のサマリーがあればスループットと平均レイテンシはそちらを優先
+        reported = parse_summary(summary_text)
+        if 'throughput' in reported:
+            summary['throughput'] = reported['throughput']
+        if 'mean_latency_ms' in reported:
+            summary['latency'] = reported['mean_latency_ms']
+        return BackendRun(protocol, records, summary, condition, source)
+
+    def run(self, agent, protocol, url, raw_log_path, transport=DEFAULT_LOG_TRANSPORT, timeout=60):
+        result, records = run_h2load(agent, self.command(protocol, url), raw_log_path, transport, timeout=timeout)
+        return result, self._run_from(protocol, records, result.stdout, source=str(raw_log_path))
+
+    def load(self, path, protocol='http2', summary_file=None, **condition):
+        records = RequestLogParser().feed_file(path)
+        summary_text = records.summary
+        if summary_file:
+            with open(summary_file, 'r', errors='replace') as f:
+                summary_text += f.read()
+        return [self._run_from(protocol, records, summary_text, _condition(**condition), str(path))]
+
+
+class GoJsonBackend(LoadBackend):
+    """go-impl latency_benchmark results (sequential requests, latencies in ns)"""
+
+    name = 'go'
+    RESULT_GLOBS = ('run_*_results.json', 'latency_results.json')
+
+    def load(self, path, **condition):
+        path = Path(path)
+        files = [path]
+        if path.is_dir():
+            files = next((sorted(path.glob(pattern)) for pattern in self.RESULT_GLOBS if list(path.glob(pattern))), [])
+        runs = []
+        for json_file in files:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                for entry in json.load(f):
+                    runs.append(self._run_from(entry, json_file, condition))
+        return runs
+
+    def _run_from(self, entry, source, condition):
+        records = RequestLogParser()
+        # リクエストは逐次実行なので開始時刻は直前までのレイテンシの累積 (実行開始からの相対値)
+        start_ns = 0
+        for latency_ns in entry.get('latencies_ns') or []:
+            records.start_us.append(start_ns // 1000)
+            records.status.append(200)
+            records.duration_us.append(max(1, latency_ns // 1000))
+            start_ns += latency_ns
+        # 失敗したリクエストはレイテンシがないので件数のみ (0 の記録はパーセンタイルを歪める)
+        failures = entry.get('failures', entry.get('requests', 0) - entry.get('successes', len(records)))
+        summary = summarize(records, failed=max(0, failures), elapsed_s=start_ns / 1e9 if start_ns else None)
+        if not len(records.duration_us) and entry.get('avg_latency_ns'):
+            # レイテンシ列のない結果 (analyze_multiple_results の出力など) は集計値のみ
+            summary['latency'] = entry['avg_latency_ns'] / 1e6
+            summary['throughput'] = 1e9 / entry['avg_latency_ns']
+            summary['succeeded'] = entry.get('successes', 0)
+        for q in (95, 99):
+            if entry.get(f'p{q}_latency_ns'):
+                summary[f'latency_p{q}_ms'] = entry[f'p{q}_latency_ns'] / 1e6
+        return BackendRun(entry['protocol'], records, summary,
+                          _condition(**dict(condition, delay=entry.get('delay_ms', condition.get('delay', 0)))),
+                          str(source))
+
+
+class ProtocolComparisonBackend(LoadBackend):
+    """protocol_comparison benchmark_results.csv (one 1MB download per row, time_total in s)"""
+
+    name = 'protocol_comparison'
+
+    def load(self, path, **condition):
+        groups = {}
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                delay = int(row['latency'].replace('ms', '') or 0)
+                groups.setdefault((row['protocol'], delay), []).append(row)
+        runs = []
+        for (protocol, delay), rows in sorted(groups.items()):
+            records = RequestLogParser()
+            busy_s = 0.0
+            failed = 0
+            speeds = []
+            for row in rows:
+                if row['success'] != '1' or not row['time_total']:
+                    failed += 1
+                    continue
+                duration_s = float(row['time_total'])
+                records.start_us.append(int(row['timestamp']) * 1_000_000)
+                records.status.append(200)
+                records.duration_us.append(int(duration_s * 1e6))
+                busy_s += duration_s
+                if row['speed_kbps']:
+                    speeds.append(float(row['speed_kbps']))
+            # 各反復は逐次なのでスループットは転送時間の合計で割る (反復間の待ち時間は含めない)
+            summary = summarize(records, failed=failed, elapsed_s=busy_s or None)
+            if speeds:
+                summary['speed_kbps'] = sum(speeds) / len(speeds)
+            runs.append(BackendRun(protocol, records, summary, _condition(**dict(condition, delay=delay)), str(path)))
+        return runs
+
+
+BACKENDS = {backend.name: backend for backend in (H2loadBackend, GoJsonBackend, ProtocolComparisonBackend)}
+
+
+def get_backend(name=DEFAULT_BACKEND, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"unknown load backend: {name} (choices: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
+
+
+def _condition(delay=0, loss=0, bandwidth=0):
+    return int(delay), int(loss), int(bandwidth)
+
+
+def import_runs(runs, log_dir, backend_name):
+    """Write each run's records as a raw log and record it as a campaign unit in log_dir"""
+    log_dir = Path(log_dir)
+    raw_dir = log_dir / 'imported' / backend_name
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    state = CampaignState(log_dir / STATE_FILE, resume=True)
+    counts = {}
+    imported = 0
+    for run in runs:
+        if not run.ok:
+            print(f"  Skipped (no successful requests): {run}")
+            continue
+        condition = ':'.join(str(v) for v in run.condition)
+        score = counts[condition, run.protocol] = counts.get((condition, run.protocol), 0) + 1
+        unit = unit_key(condition, run.protocol, 'measurement_1', f'score_{score}')
+        log_file = raw_dir / f"{run.protocol}_{condition.replace(':', '_')}_{score}.log"
+        run.write_log(log_file)
+        state.record(unit, {'log_file': log_file}, dict(run.summary), backend=backend_name, source=run.source)
+        imported += 1
+        print(f"  {unit}: {run.summary['throughput']:.1f} req/s, {run.summary['latency']:.2f}ms "
+              f"({len(run.records)} requests)")
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import load-generator results into a campaign directory')
+    parser.add_argument('backend', choices=list(BACKENDS))
+    parser.add_argument('paths', nargs='+', help='Result files (or go-impl summary directories)')
+    parser.add_argument('--log_dir', required=True, help='Campaign directory (analyze with ultra_final_analysis.py)')
+    parser.add_argument('--protocol', default='http2', help='Protocol of h2load logs')
+    parser.add_argument('--summary_log', help='h2load console output holding the summary of an h2load log')
+    parser.add_argument('--delay', type=int, default=0, help='Delay (ms) when the results do not state it')
+    parser.add_argument('--loss', type=int, default=0, help='Loss (%%) of the imported runs')
+    parser.add_argument('--bandwidth', type=int, default=0, help='Bandwidth limit (Mbps) of the imported runs')
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    condition = {'delay': args.delay, 'loss': args.loss, 'bandwidth': args.bandwidth}
+    runs = []
+    for path in args.paths:
+        if args.backend == 'h2load':
+            runs += backend.load(path, protocol=args.protocol, summary_file=args.summary_log, **condition)
+        else:
+            runs += backend.load(path, **condition)
+    print(f"Importing {len(runs)} {args.backend} runs into {args.log_dir}")
+    imported = import_runs(runs, args.log_dir, args.backend)
+    print(f"Imported {imported} units -> {Path(args.log_dir) / STATE_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+OpenMetrics endpoint for live campaign progress
+While a campaign runs, GET /metrics on the given port returns per-(condition,
+protocol) request and error counters, a request duration histogram fed by the
+streaming h2load log parser, the h2load-reported throughput of the last run and
+the campaign's progress and ETA. Prometheus computes live throughput, error rate
+and latency percentiles from these with rate() and histogram_quantile().
+
+Hooks are no-ops until serve() is called, like event_log and stage_profiler.
+The condition/protocol of the requests parsed on a thread are set with labels().
+
+  metrics_exporter.py --port 9464 --demo     serve a synthetic campaign (scrape config check)
+"""
+
+import argparse
+import bisect
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 9464
+PREFIX = 'h2bench'
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+# リクエスト時間のバケット上限 (秒): 0.5ms〜10s
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_BUCKET_BOUNDS_US = tuple(int(b * 1e6) for b in DURATION_BUCKETS)
+
+
+class Progress:
+    """Completed units of a campaign with an ETA from the units run in this process
+
+    Units skipped on --resume count as done but not towards the rate, so the ETA
+    is not skewed by units that took no time.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.run = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def advance(self, skipped=False):
+        with self._lock:
+            self.done += 1
+            self.run += not skipped
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    @property
+    def eta(self):
+        """Seconds until every unit is done, or None before the first unit finished"""
+        with self._lock:
+            if not self.run:
+                return None
+            return self.elapsed / self.run * max(self.total - self.done, 0)
+
+    def describe(self):
+        eta = self.eta
+        return (f"{self.done}/{self.total} units, elapsed {self.elapsed:.1f}s, "
+                f"remaining {'?' if eta is None else f'{eta:.1f}s'}")
+
+
+class _Series:
+    """Counters and duration histogram of one (condition, protocol)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.buckets = [0] * (len(_BUCKET_BOUNDS_US) + 1)  # 最後は +Inf
+        self.duration_sum_us = 0
+        self.runs = {'ok': 0, 'failed': 0}
+        self.throughput = None
+
+    def observe(self, status, duration_us):
+        with self.lock:
+            self.requests += 1
+            if not 200 <= status < 400 or duration_us <= 0:
+                self.errors += 1
+                return
+            self.buckets[bisect.bisect_left(_BUCKET_BOUNDS_US, duration_us)] += 1
+            self.duration_sum_us += duration_us
+
+
+class CampaignMetrics:
+    """Thread-safe metric store rendered in the OpenMetrics text format"""
+
+    def __init__(self):
+        self.series = {}
+        self.progress = None
+        self._lock = threading.Lock()
+
+    def get(self, condition, protocol):
+        key = (str(condition), str(protocol))
+        with self._lock:
+            if key not in self.series:
+                self.series[key] = _Series()
+            return self.series[key]
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text, unit=None):
+            lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+            if unit:
+                lines.append(f"# UNIT {PREFIX}_{name} {unit}")
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+
+        with self._lock:
+            series = sorted(self.series.items())
+        snapshot = []
+        for (condition, protocol), s in series:
+            with s.lock:
+                snapshot.append((f'condition="{condition}",protocol="{protocol}"', s.requests, s.errors,
+                                 list(s.buckets), s.duration_sum_us, dict(s.runs), s.throughput))
+
+        family('requests', 'counter', 'Requests parsed from the h2load per-request logs')
+        for labels, requests, *_ in snapshot:
+            lines.append(f"{PREFIX}_requests_total{{{labels}}} {requests}")
+        family('request_errors', 'counter', 'Requests that failed (non 2xx/3xx status or no duration)')
+        for labels, _, errors, *_ in snapshot:
+            lines.append(f"{PREFIX}_request_errors_total{{{labels}}} {errors}")
+        family('request_duration_seconds', 'histogram', 'Duration of successful requests', unit='seconds')
+        for labels, _, _, buckets, duration_sum_us, *_ in snapshot:
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + (None,), buckets):
+                cumulative += count
+                le = '+Inf' if bound is None else repr(bound)
+                lines.append(f'{PREFIX}_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{PREFIX}_request_duration_seconds_count{{{labels}}} {cumulative}")
+            lines.append(f"{PREFIX}_request_duration_seconds_sum{{{labels}}} {duration_sum_us / 1e6}")
+        family('runs', 'counter', 'Completed load-generator runs by result')
+        for labels, *_, runs, _ in snapshot:
+            for result, count in sorted(runs.items()):
+                lines.append(f'{PREFIX}_runs_total{{{labels},result="{result}"}} {count}')
+        family('run_throughput', 'gauge', 'Throughput reported by the load generator for the last run (req/s)')
+        for labels, *_, throughput in snapshot:
+            if throughput is not None:
+                lines.append(f"{PREFIX}_run_throughput{{{labels}}} {throughput}")
+
+        progress = self.progress
+        if progress is not None:
+            family('campaign_units', 'gauge', 'Units (condition, protocol, repetition) planned in the campaign')
+            lines.append(f"{PREFIX}_campaign_units {progress.total}")
+            family('campaign_units_completed', 'counter', 'Units completed (including units resumed from a checkpoint)')
+            lines.append(f"{PREFIX}_campaign_units_completed_total {progress.done}")
+            family('campaign_elapsed_seconds', 'gauge', 'Time since the campaign started', unit='seconds')
+            lines.append(f"{PREFIX}_campaign_elapsed_seconds {progress.elapsed:.3f}")
+            eta = progress.eta
+            if eta is not None:
+                family('campaign_eta_seconds', 'gauge', 'Estimated time until the campaign completes', unit='seconds')
+                lines.append(f"{PREFIX}_campaign_eta_seconds {eta:.3f}")
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # スクレイプごとのアクセスログは出さない
+
+
+_metrics = None
+_server = None
+_local = threading.local()
+
+
+def serve(port=DEFAULT_PORT, host='0.0.0.0'):
+    """Start the /metrics endpoint on a daemon thread and enable the hooks"""
+    global _metrics, _server
+    _metrics = CampaignMetrics()
+    handler = type('Handler', (_Handler,), {'metrics': _metrics})
+    _server = ThreadingHTTPServer((host, port), handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name='metrics-exporter', daemon=True).start()
+    print(f"Metrics endpoint: http://{host}:{_server.server_address[1]}/metrics")
+    return _metrics
+
+
+def shutdown():
+    """Stop the endpoint and turn the hooks back into no-ops"""
+    global _metrics, _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+    _metrics, _server = None, None
+
+
+def track_progress(total):
+    """Progress of a campaign of `total` units (exposed when the endpoint is running)"""
+    progress = Progress(total)
+    if _metrics is not None:
+        _metrics.progress = progress
+    return progress
+
+
+@contextmanager
+def labels(condition, protocol):
+    """Attribute the requests parsed on this thread to (condition, protocol)"""
+    previous = getattr(_local, 'labels', None)
+    _local.labels = (condition, protocol)
+    try:
+        yield
+    finally:
+        _local.labels = previous
+
+
+def request_observer():
+    """observe(status, duration_us) for the current thread's labels, or None when disabled"""
+    current = getattr(_local, 'labels', None)
+    if _metrics is None or current is None:
+        return None
+    return _metrics.get(*current).observe
+
+
+def record_run(condition, protocol, throughput=None, ok=True):
+    """Count a finished load-generator run and keep its reported throughput"""
+    if _metrics is None:
+        return
+    series = _metrics.get(condition, protocol)
+    with series.lock:
+        series.runs['ok' if ok else 'failed'] += 1
+        if ok and throughput is not None:
+            series.throughput = throughput
+
+
+def add_metrics_argument(parser):
+    parser.add_argument('--metrics_port', type=int, nargs='?', const=DEFAULT_PORT, metavar='PORT',
+                        help=f'Serve live OpenMetrics progress on this port (default {DEFAULT_PORT}) at /metrics')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic campaign to check the scrape configuration')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port of the /metrics endpoint')
+    parser.add_argument('--demo', action='store_true', help='Feed synthetic requests until interrupted')
+    args = parser.parse_args()
+
+    serve(args.port)
+    rng = random.Random(0)
+    progress = track_progress(20)
+    try:
+        while True:
+            if args.demo and progress.done < progress.total:
+                for protocol in ('http2', 'http3'):
+                    with labels('50:1:0', protocol):
+                        observe = request_observer()
+                        for _ in range(1000):
+                            observe(200 if rng.random() > 0.01 else 0, int(rng.lognormvariate(10.8, 0.5)))
+                    record_run('50:1:0', protocol, throughput=rng.uniform(1500, 2500))
+                    progress.advance()
+                print(progress.describe())
+            time.sleep(1)
+    except KeyboardInterrupt:
+        shutdown()
+
+
+if __name__ == '__main__':
+    main()
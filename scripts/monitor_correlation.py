@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Time-aligned correlation of monitoring samples with per-request latency
+Each monitor sample opens a window that lasts until the next sample. Requests are
+assigned to the window containing their start time (np.searchsorted on the
+sorted window starts), summarized per window and protocol, and correlated with
+the sample's metrics, also at lags of a few samples in both directions.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MIN_REQUESTS = 5  # これより少ないウィンドウは相関から除外
+MAX_LAG = 3  # 監視サンプル数
+
+
+def to_epoch_seconds(values):
+    """Epoch seconds of a timestamp column (epoch s/ms/us/ns numbers or date strings)"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().all():
+        seconds = numeric.to_numpy(dtype=np.float64)
+        magnitude = np.nanmax(np.abs(seconds)) if seconds.size else 0
+        for limit, scale in ((1e17, 1e9), (1e14, 1e6), (1e11, 1e3)):
+            if magnitude >= limit:
+                return seconds / scale
+        return seconds
+    parsed = pd.to_datetime(values, errors='coerce')
+    if parsed.dt.tz is None:
+        # タイムゾーンなしの文字列は監視スクリプトを実行したマシンのローカル時刻とみなす
+        parsed = parsed.dt.tz_localize(datetime.now().astimezone().tzinfo)
+    return (parsed - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy()
+
+
+def load_requests(files):
+    """h2load --log-file records of [(path, protocol)] as one frame (time s, protocol, status, latency ms)"""
+    frames = []
+    for path, protocol in files:
+        df = pd.read_csv(path, sep='\t', header=None, names=['start_us', 'status', 'duration_us'],
+                         dtype={'start_us': np.int64, 'status': np.int64, 'duration_us': np.int64},
+                         comment='#')
+        frames.append(pd.DataFrame({'time': df['start_us'].to_numpy() / 1e6, 'protocol': protocol,
+                                    'status': df['status'].to_numpy(),
+                                    'response_time_ms': df['duration_us'].to_numpy() / 1000}))
+    if not frames:
+        return None
+    # ループ内で concat を繰り返さず一度に結合
+    return pd.concat(frames, ignore_index=True)
+
+
+def assign_windows(sample_times, request_times):
+    """Index of the monitor window of each request (-1 outside the monitored period)
+
+    sample_times must be sorted; the last window is as long as the median interval.
+    """
+    if len(sample_times) < 2:
+        return np.full(len(request_times), -1, dtype=np.int64)
+    end = sample_times[-1] + np.median(np.diff(sample_times))
+    index = np.searchsorted(sample_times, request_times, side='right') - 1
+    index[(request_times < sample_times[0]) | (request_times >= end)] = -1
+    return index
+
+
+def window_latency(system, requests, min_requests=MIN_REQUESTS):
+    """Monitor samples joined with per-window latency statistics of each protocol
+
+    Returns the system frame sorted by time with columns <protocol>_requests,
+    <protocol>_mean_ms, <protocol>_p95_ms (NaN for windows under min_requests).
+    """
+    system = system.assign(time=to_epoch_seconds(system['timestamp'])).sort_values('time', kind='stable')
+    system = system.reset_index(drop=True)
+    ok = requests[(requests['status'] >= 200) & (requests['status'] < 400) & (requests['response_time_ms'] > 0)]
+    window = assign_windows(system['time'].to_numpy(), ok['time'].to_numpy())
+    ok = ok.assign(window=window)[window >= 0]
+    for protocol, group in ok.groupby('protocol', sort=True):
+        by_window = group.groupby('window')['response_time_ms']
+        stats = by_window.agg(requests='size', mean_ms='mean').assign(p95_ms=by_window.quantile(0.95))
+        stats = stats.reindex(range(len(system)))
+        stats.loc[stats['requests'].fillna(0) < min_requests, ['mean_ms', 'p95_ms']] = np.nan
+        key = protocol.lower().replace('/', '')
+        system[f'{key}_requests'] = stats['requests'].fillna(0).astype(np.int64).to_numpy()
+        system[f'{key}_mean_ms'] = stats['mean_ms'].to_numpy()
+        system[f'{key}_p95_ms'] = stats['p95_ms'].to_numpy()
+    return system
+
+
+def window_means(joined, frame, columns, prefix=''):
+    """Mean of frame's columns (with a time column) in each monitor window of joined"""
+    window = assign_windows(joined['time'].to_numpy(), frame['time'].to_numpy())
+    means = frame.loc[window >= 0, columns].groupby(window[window >= 0]).mean()
+    means = means.reindex(range(len(joined)))
+    return joined.assign(**{f'{prefix}{c}': means[c].to_numpy() for c in columns})
+
+
+def lagged_correlation(metric, latency, lag):
+    """Pearson r of metric[t] and latency[t + lag] over windows where both are defined"""
+    metric, latency = np.asarray(metric, dtype=np.float64), np.asarray(latency, dtype=np.float64)
+    if lag > 0:
+        metric, latency = metric[:-lag], latency[lag:]
+    elif lag < 0:
+        metric, latency = metric[-lag:], latency[:lag]
+    valid = ~(np.isnan(metric) | np.isnan(latency))
+    if valid.sum() < 3 or np.std(metric[valid]) == 0 or np.std(latency[valid]) == 0:
+        return None
+    return float(np.corrcoef(metric[valid], latency[valid])[0, 1])
+
+
+def correlate(joined, metrics, protocols, max_lag=MAX_LAG):
+    """{protocol: {metric: {pearson, spearman, windows, lags, best_lag}}} on the mean latency per window"""
+    results = {}
+    for protocol in protocols:
+        key = protocol.lower().replace('/', '')
+        column = f'{key}_mean_ms'
+        if column not in joined:
+            continue
+        latency = joined[column]
+        results[protocol] = {}
+        for metric in metrics:
+            valid = joined[metric].notna() & latency.notna()
+            lags = {lag: lagged_correlation(joined[metric], latency, lag) for lag in range(-max_lag, max_lag + 1)}
+            defined = {lag: r for lag, r in lags.items() if r is not None}
+            spearman = None
+            if lags[0] is not None:
+                spearman = float(joined.loc[valid, metric].rank().corr(latency[valid].rank()))
+            results[protocol][metric] = {
+                'pearson': lags[0], 'spearman': spearman, 'windows': int(valid.sum()), 'lags': lags,
+                'best_lag': max(defined, key=lambda lag: abs(defined[lag])) if defined else None,
+            }
+    return results
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+netem controller for the router container
+Tracks the qdisc installed on the router interface so that repeated requests
+for the same network conditions are no-ops, updates parameters in place with
+`tc qdisc change`, and verifies the result with a single `tc -j qdisc show`
+instead of sleeping for a fixed stabilization time.
+"""
+
+import json
+
+
+class NetemError(RuntimeError):
+    """tc failed or the installed qdisc does not match the requested conditions"""
+
+
+class NetemSettings:
+    """Delay (ms), loss (%) and rate limit (Mbps, 0 = unlimited) of a netem root qdisc"""
+
+    def __init__(self, delay=0, loss=0, bandwidth=0):
+        # tc の表示は丸められるので比較用に丸めて保持
+        self.delay = round(float(delay), 3)
+        self.loss = round(float(loss), 3)
+        self.bandwidth = round(float(bandwidth), 1)
+
+    @property
+    def is_empty(self):
+        return not (self.delay or self.loss or self.bandwidth)
+
+    def tc_args(self):
+        args = ['netem', 'delay', f'{self.delay:g}ms', 'loss', f'{self.loss:g}%']
+        if self.bandwidth:
+            args += ['rate', f'{self.bandwidth:g}mbit']
+        return args
+
+    def __eq__(self, other):
+        if not isinstance(other, NetemSettings):
+            return NotImplemented
+        return (self.delay, self.loss, self.bandwidth) == (other.delay, other.loss, other.bandwidth)
+
+    def __repr__(self):
+        return f"{self.delay:g}ms, {self.loss:g}%, {self.bandwidth:g}Mbps"
+
+
+def _value(option, key):
+    """tc -j prints some netem options as plain numbers and others as objects"""
+    if isinstance(option, dict):
+        return option.get(key, 0)
+    return option or 0
+
+
+def parse_qdisc_json(output):
+    """Settings of the netem root qdisc in `tc -j qdisc show` output (None: no netem root)"""
+    for qdisc in json.loads(output or '[]'):
+        if not qdisc.get('root'):
+            continue
+        if qdisc.get('kind') != 'netem':
+            return None
+        options = qdisc.get('options', {})
+        delay_s = _value(options.get('delay'), 'delay')
+        loss = _value(options.get('loss-random'), 'loss')
+        rate_bytes = _value(options.get('rate'), 'rate')
+        return NetemSettings(delay_s * 1000, loss * 100, rate_bytes * 8 / 1e6)
+    return None
+
+
+class NetemController:
+    """Applies netem settings on one router interface through a ContainerAgent"""
+
+    def __init__(self, agent, dev='eth0'):
+        self.agent = agent
+        self.dev = dev
+        self.applied = None  # NetemSettings, or None when no netem root is installed
+        self._known = False  # applied is only trusted after it has been read or verified once
+
+    def _tc(self, *args):
+        result = self.agent.run(['tc'] + list(args))
+        if result.returncode != 0:
+            raise NetemError(f"tc {' '.join(args)} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def read_state(self):
+        """Query the installed root qdisc with one tc call"""
+        self.applied = parse_qdisc_json(self._tc('-j', 'qdisc', 'show', 'dev', self.dev))
+        self._known = True
+        return self.applied
+
+    def apply(self, delay, loss, bandwidth=0):
+        """Install the requested conditions; returns False if they were already in place"""
+        target = NetemSettings(delay, loss, bandwidth)
+        current = self.applied if self._known else self.read_state()
+        if current == target or (target.is_empty and (current is None or current.is_empty)):
+            return False
+
+        try:
+            if target.is_empty:
+                self._tc('qdisc', 'del', 'dev', self.dev, 'root')
+            elif current is not None:
+                # 既存の netem はパラメータだけ差し替え (qdisc を作り直さない)
+                self._tc('qdisc', 'change', 'dev', self.dev, 'root', *target.tc_args())
+            else:
+                self._tc('qdisc', 'replace', 'dev', self.dev, 'root', *target.tc_args())
+        except Exception:
+            # 途中で失敗した場合は次回に状態を読み直す
+            self._known = False
+            raise
+
+        # 反映結果を1回の問い合わせで確認 (固定時間の待機はしない)
+        installed = self.read_state()
+        if target.is_empty and installed is None:
+            return True
+        if installed != target:
+            raise NetemError(f"netem on {self.dev} is {installed}, expected {target}")
+        return True
+
+    def clear(self):
+        """Remove the netem root qdisc"""
+        return self.apply(0, 0, 0)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Per-interval rates of the interface counters in network_stats.csv
+The counters are the cumulative values of /proc/net/dev, so they are turned into
+per-interval deltas per interface (one groupby, no per-interface filtering) and
+divided by the actual time between samples. A counter that goes down either
+wrapped (32-bit counters near 2**32) or was reset (interface recreated, container
+restarted); after a reset the new value is the increase, as in Prometheus'
+rate(). Files that already hold per-interval values are detected (or stated by
+the caller) and divided by the interval only.
+
+  network_rates.py logs/campaign/network_stats.csv    per-interface summary
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from monitor_correlation import to_epoch_seconds
+
+# network_stats.csv の列 (ドロップ・エラー・再送は記録されている場合のみ)
+COUNTERS = ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets', 'rx_drop', 'tx_drop',
+            'rx_errors', 'tx_errors', 'retransmits')
+WRAP_32 = 2 ** 32
+# 減少の割合がこれを超える列は累積値ではなく区間ごとの値とみなす
+CUMULATIVE_MAX_DECREASES = 0.1
+# 判定に使う区間がこれより少なければ累積値とみなす (短い系列では折り返し・リセット 1 回で割合を超える)
+CUMULATIVE_MIN_INTERVALS = 20
+
+
+def counter_deltas(values, previous):
+    """Increase of a cumulative counter between two samples, with wrap and reset handling"""
+    delta = values - previous
+    decreased = delta < 0
+    # 32 ビットカウンタが上限付近から折り返した場合は 2**32 を足す、それ以外の減少はリセット
+    wrapped = decreased & (previous >= WRAP_32 // 2) & (previous < WRAP_32) & (values < WRAP_32)
+    delta = np.where(wrapped, delta + WRAP_32, delta)
+    return np.where(decreased & ~wrapped, values, delta)
+
+
+def counter_rates(df, counters=COUNTERS, cumulative=None):
+    """Rates per interface and interval: time, interface, interval_s, <counter>_per_s
+
+    time is the epoch second at the end of the interval, so the rates can be
+    overlaid on the latency time series; the first sample of each interface only
+    opens an interval. cumulative: True/False when the source states whether the
+    counters are cumulative, None to detect it per column.
+    """
+    counters = [c for c in counters if c in df.columns]
+    data = df.assign(time=to_epoch_seconds(df['timestamp']))
+    data = data.sort_values(['interface', 'time'], kind='stable').reset_index(drop=True)
+    grouped = data.groupby('interface', sort=False)
+    first = (grouped.cumcount() == 0).to_numpy()
+    interval = grouped['time'].diff().to_numpy(dtype=np.float64, copy=True)
+    interval[interval <= 0] = np.nan  # 同時刻・逆順のサンプルは率を出さない
+
+    rates = pd.DataFrame({'time': data['time'], 'interface': data['interface'], 'interval_s': interval})
+    for counter in counters:
+        values = data[counter].to_numpy(dtype=np.float64)
+        previous = grouped[counter].shift().to_numpy(dtype=np.float64)
+        if is_cumulative(values, previous) if cumulative is None else cumulative:
+            increase = counter_deltas(values, previous)
+        else:
+            increase = values
+        rates[f'{counter}_per_s'] = increase / interval
+    return rates[~first].reset_index(drop=True)
+
+
+def is_cumulative(values, previous):
+    """True unless the column goes down too often to be a counter (per-interval values)"""
+    valid = ~(np.isnan(values) | np.isnan(previous))
+    if valid.sum() < CUMULATIVE_MIN_INTERVALS:
+        return True
+    return np.mean(values[valid] < previous[valid]) <= CUMULATIVE_MAX_DECREASES
+
+
+def total_rates(rates, exclude=('lo',)):
+    """Rates summed over the interfaces (except loopback) per sample time"""
+    columns = [c for c in rates.columns if c.endswith('_per_s')]
+    kept = rates[~rates['interface'].isin(exclude)]
+    return kept.groupby('time', sort=True)[columns].sum(min_count=1).reset_index()
+
+
+def summarize(rates):
+    """{interface: {<counter>_total, mean/peak <counter>_per_s, drop_ratio, error_ratio}}"""
+    columns = [c for c in rates.columns if c.endswith('_per_s')]
+    increase = rates[columns].mul(rates['interval_s'], axis=0)
+    increase.columns = [c[:-len('_per_s')] + '_total' for c in columns]
+    increase['interface'] = rates['interface']
+    totals = increase.groupby('interface').sum()
+    means = rates.groupby('interface')[columns].mean()
+    peaks = rates.groupby('interface')[columns].max()
+
+    summary = {}
+    for interface in totals.index:
+        entry = {k: float(v) for k, v in totals.loc[interface].items()}
+        entry.update({f'mean_{k}': float(v) for k, v in means.loc[interface].items()})
+        entry.update({f'peak_{k}': float(v) for k, v in peaks.loc[interface].items()})
+        packets = entry.get('rx_packets_total', 0) + entry.get('tx_packets_total', 0)
+        for name, parts in (('drop_ratio', ('rx_drop', 'tx_drop')), ('error_ratio', ('rx_errors', 'tx_errors'))):
+            if any(f'{p}_total' in entry for p in parts) and packets > 0:
+                entry[name] = sum(entry.get(f'{p}_total', 0) for p in parts) / packets
+        if 'retransmits_total' in entry and entry.get('tx_packets_total', 0) > 0:
+            entry['retransmit_ratio'] = entry['retransmits_total'] / entry['tx_packets_total']
+        summary[interface] = entry
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-interface rates of a network_stats.csv')
+    parser.add_argument('file', help='network_stats.csv (timestamp, interface, cumulative counters)')
+    parser.add_argument('--output', help='Write the per-interval rates to this CSV')
+    parser.add_argument('--counters', choices=('auto', 'cumulative', 'interval'), default='auto',
+                        help='Whether the columns are cumulative counters or per-interval values (default: detect)')
+    args = parser.parse_args()
+
+    cumulative = {'auto': None, 'cumulative': True, 'interval': False}[args.counters]
+    rates = counter_rates(pd.read_csv(args.file), cumulative=cumulative)
+    for interface, entry in summarize(rates).items():
+        print(f"{interface}: rx {entry['mean_rx_bytes_per_s'] / 1e6:.3f} MB/s (peak "
+              f"{entry['peak_rx_bytes_per_s'] / 1e6:.3f}), tx {entry['mean_tx_bytes_per_s'] / 1e6:.3f} MB/s "
+              f"(peak {entry['peak_tx_bytes_per_s'] / 1e6:.3f}), "
+              f"{entry['mean_rx_packets_per_s']:.0f}/{entry['mean_tx_packets_per_s']:.0f} pkt/s rx/tx")
+    if args.output:
+        rates.to_csv(args.output, index=False)
+        print(f"Rates: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
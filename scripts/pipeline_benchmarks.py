@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the analysis tooling on synthetic campaigns
+Each case times one public entry point on generated h2load logs and TSVs of a
+given total request count, in a fresh child process so the peak RSS belongs to
+that case alone. Results are appended to a JSONL history with the git commit,
+so runtime and memory can be compared across commits.
+
+  pipeline_benchmarks.py                                   # 10^3 and 10^5 requests, every case
+  pipeline_benchmarks.py --sizes 10000000 --cases parse_csv_data load_benchmark_data
+  pipeline_benchmarks.py --compare                         # latest two commits in the history
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_SIZES = (1000, 100000)  # 10^7 は --sizes で明示 (生成だけで数 GB)
+DEFAULT_OUTPUT = 'logs/pipeline_benchmarks'
+RESULTS_FILE = 'results.jsonl'
+CONDITIONS = ((0, 0), (150, 3))  # (delay ms, loss %)
+PROTOCOLS = ('h2', 'h3')
+CHUNK = 1_000_000  # 生成時の 1 回の書き込み行数
+DATA_VERSION = 2  # 生成形式を変えたら上げる (古いキャッシュを作り直す)
+MONITOR_INTERVAL = 0.01  # 監視サンプル間隔 (s): リクエストの時間範囲を覆うように
+
+
+# --- synthetic data -------------------------------------------------------------------------
+
+def write_records(path, count, rng):
+    """h2load --log-file records (start_us, status, duration_us), written in chunks"""
+    import numpy as np
+    start = 1_700_000_000_000_000
+    with open(path, 'w') as f:
+        for offset in range(0, count, CHUNK):
+            n = min(CHUNK, count - offset)
+            durations = rng.lognormal(np.log(20000), 0.5, n).astype(np.int64)
+            starts = start + np.cumsum(rng.integers(50, 500, n))
+            start = int(starts[-1])
+            status = np.where(rng.random(n) < 0.001, 0, 200)
+            rows = zip(starts.tolist(), status.tolist(), durations.tolist())
+            f.write(''.join(f"{s}\t{c}\t{d}\n" for s, c, d in rows))
+    return path
+
+
+def write_detailed_tsv(path, count, rng):
+    """ultra_final detailed CSV (timestamp_ns, request size, response time us)"""
+    import numpy as np
+    with open(path, 'w') as f:
+        f.write("# Protocol: http2\n# Delay: 0ms\n# Loss: 0%\n# Timestamp(ns)\tRequestSize(bytes)\tResponseTime(us)\n")
+        for offset in range(0, count, CHUNK):
+            n = min(CHUNK, count - offset)
+            timestamps = 1_700_000_000_000_000_000 + (offset + np.arange(n)) * 1_000_000
+            durations = rng.lognormal(np.log(20000), 0.5, n).astype(np.int64)
+            f.write(''.join(f"{t}\t200\t{d}\n" for t, d in zip(timestamps.tolist(), durations.tolist())))
+    return path
+
+
+def summary_text(protocol, count, rng):
+    import numpy as np
+    from simulated_testbed import h2load_summary
+    durations = rng.lognormal(np.log(20000), 0.5, min(count, 10000))
+    return h2load_summary('http2' if protocol == 'h2' else 'http3', count, 5, 2, max(count / 800, 0.01),
+                          durations, 0.001)
+
+
+def generate_dataset(root, size, seed=0):
+    """Synthetic inputs for `size` requests (reused while the marker file exists)
+
+    requests.csv      size records (h2load --log-file)
+    stream.log        the same records followed by the h2load summary (stream transport output)
+    scores/*.csv      4 ultra_final detailed CSVs of size/4 requests (input of averaging)
+    campaign/         run_bench.sh layout: h2_/h3_ CSV + summary log per condition (size/4 each),
+                      benchmark_params.txt and monitoring CSVs
+    """
+    root = Path(root) / f"size_{size}"
+    marker = root / f'.complete_v{DATA_VERSION}'
+    if marker.exists():
+        return root
+    print(f"Generating synthetic data for {size} requests in {root}")
+    import numpy as np  # --compare だけなら読み込まない
+    rng = np.random.default_rng(seed)
+    campaign = root / 'campaign'
+    (root / 'scores').mkdir(parents=True, exist_ok=True)
+    campaign.mkdir(exist_ok=True)
+
+    write_records(root / 'requests.csv', size, rng)
+    shutil.copyfile(root / 'requests.csv', root / 'stream.log')
+    with open(root / 'stream.log', 'a') as f:
+        f.write(summary_text('h2', size, rng))
+    for i in range(4):
+        write_detailed_tsv(root / 'scores' / f"score_{i}.csv", max(size // 4, 1), rng)
+
+    per_file = max(size // (len(CONDITIONS) * len(PROTOCOLS)), 1)
+    for delay, loss in CONDITIONS:
+        for protocol in PROTOCOLS:
+            name = f"{protocol}_{delay}ms_{loss}pct"
+            write_records(campaign / f"{name}.csv", per_file, rng)
+            (campaign / f"{name}.log").write_text(summary_text(protocol, per_file, rng))
+    (campaign / 'benchmark_params.txt').write_text(f"REQUESTS={per_file}\nCONNECTIONS=5\nTHREADS=2\n")
+
+    # 監視データ (100 リクエストにつき 1 サンプル、リクエストと同じ時刻範囲の epoch 秒)
+    samples = max(size // 100, 10)
+    t = [f"{1_700_000_000 + i * MONITOR_INTERVAL:.2f}" for i in range(samples)]
+    with open(campaign / 'system_monitor_20250101_000000.csv', 'w') as f:
+        f.write("timestamp,cpu_usage,memory_usage,docker_containers\n")
+        cpu = np.clip(rng.normal(40, 15, samples), 0, 100)
+        memory = np.clip(rng.normal(60, 5, samples), 0, 100)
+        f.write(''.join(f"{ts},{c:.1f},{m:.1f},3\n" for ts, c, m in zip(t, cpu.tolist(), memory.tolist())))
+    with open(campaign / 'network_stats.csv', 'w') as f:
+        f.write("timestamp,interface,rx_bytes,tx_bytes,rx_packets,tx_packets\n")
+        for interface in ('eth0', 'lo'):
+            rx = np.cumsum(rng.integers(1000, 100000, samples))
+            tx = np.cumsum(rng.integers(1000, 100000, samples))
+            f.write(''.join(f"{ts},{interface},{r},{x},{r // 1200},{x // 1200}\n"
+                            for ts, r, x in zip(t, rx.tolist(), tx.tolist())))
+    marker.touch()
+    return root
+
+
+def scratch_copy(campaign, workdir):
+    """Campaign directory of symlinks, so outputs of a case never land in the shared dataset"""
+    target = Path(workdir) / 'campaign'
+    target.mkdir()
+    for path in Path(campaign).iterdir():
+        (target / path.name).symlink_to(path.resolve())
+    return target
+
+
+# --- cases ----------------------------------------------------------------------------------
+# 各ケースは (data, workdir) を受け取り、計測対象の呼び出しを返す (準備は計測に含めない)
+
+def case_extract_metrics_from_log(data, workdir):
+    from average_benchmark_results import extract_metrics_from_log
+    return lambda: extract_metrics_from_log(str(data / 'stream.log'))
+
+
+def case_generate_detailed_csv(data, workdir):
+    from h2load_stream import RequestLogParser
+    from ultra_final_analysis import UltraFinalAnalyzer
+    requests = RequestLogParser().feed_file(data / 'stream.log')
+    analyzer = UltraFinalAnalyzer(workdir)
+    return lambda: analyzer.generate_detailed_csv(requests, workdir / 'detailed.csv', 'http2', 0, 0)
+
+
+def case_generate_averaged_csv(data, workdir):
+    from ultra_final_analysis import UltraFinalAnalyzer
+    analyzer = UltraFinalAnalyzer(workdir)
+    csv_files = sorted(str(path) for path in (data / 'scores').glob('*.csv'))
+    return lambda: analyzer.generate_averaged_csv(csv_files, 'http2', 0, 0, 0, workdir)
+
+
+def case_parse_csv_data(data, workdir):
+    from simple_graph_generator import parse_csv_data
+    return lambda: parse_csv_data(str(data / 'requests.csv'))
+
+
+def case_load_benchmark_data(data, workdir):
+    from average_benchmark_results import load_benchmark_data
+    campaign = scratch_copy(data / 'campaign', workdir)
+    return lambda: load_benchmark_data(str(campaign))
+
+
+def case_generate_graphs(data, workdir):
+    from generate_performance_graphs import generate_graphs
+    campaign = scratch_copy(data / 'campaign', workdir)
+    return lambda: generate_graphs(str(campaign))
+
+
+def case_simple_generate_graphs(data, workdir):
+    from simple_graph_generator import generate_graphs
+    campaign = scratch_copy(data / 'campaign', workdir)
+    return lambda: generate_graphs(str(campaign), debug=False, dpi=100)
+
+
+def case_monitoring_run_analysis(data, workdir):
+    from analyze_monitoring_data import MonitoringDataAnalyzer
+    campaign = scratch_copy(data / 'campaign', workdir)
+    return lambda: MonitoringDataAnalyzer(campaign).run_analysis()
+
+
+CASES = {
+    'extract_metrics_from_log': case_extract_metrics_from_log,
+    'generate_detailed_csv': case_generate_detailed_csv,
+    'generate_averaged_csv': case_generate_averaged_csv,
+    'parse_csv_data': case_parse_csv_data,
+    'load_benchmark_data': case_load_benchmark_data,
+    'generate_graphs': case_generate_graphs,
+    'simple_graph_generator.generate_graphs': case_simple_generate_graphs,
+    'MonitoringDataAnalyzer.run_analysis': case_monitoring_run_analysis,
+}
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KiB
+
+
+def run_case(case, data, repeat, result_file):
+    """Child process: time one case and write {times, rss} to result_file"""
+    sys.path.insert(0, str(SCRIPT_DIR))
+    with tempfile.TemporaryDirectory(prefix='pipeline_bench_') as workdir, open(os.devnull, 'w') as devnull:
+        with redirect_stdout(devnull):
+            call = CASES[case](Path(data), Path(workdir))
+        baseline = max_rss_mb()
+        times = []
+        for _ in range(repeat):
+            with redirect_stdout(devnull):
+                start = time.perf_counter()
+                call()
+                times.append(time.perf_counter() - start)
+    peak = max_rss_mb()
+    with open(result_file, 'w') as f:
+        json.dump({'times': times, 'baseline_rss_mb': baseline, 'peak_rss_mb': peak}, f)
+
+
+def run_in_child(case, data, repeat, timeout=None):
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+        result_file = tmp.name
+    try:
+        proc = subprocess.run([sys.executable, __file__, '--child', case, str(data), str(repeat), result_file],
+                              capture_output=True, text=True, timeout=timeout)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1:] or ['exit code %d' % proc.returncode]
+        with open(result_file, 'r', encoding='utf-8') as f:
+            return json.load(f), None
+    except subprocess.TimeoutExpired:
+        return None, [f"timed out after {timeout}s"]
+    finally:
+        os.unlink(result_file)
+
+
+# --- history --------------------------------------------------------------------------------
+
+def git_revision():
+    """(commit, dirty) of the working tree, or (None, None) outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short=12', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPT_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def read_history(path):
+    if not Path(path).exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(history, revisions=None):
+    """Print runtime and peak RSS of two commits side by side (default: the latest two)"""
+    commits = list(dict.fromkeys(record['commit'] for record in history))
+    if revisions:
+        commits = [c for c in commits if any(c.startswith(r) or r.startswith(c) for r in revisions)]
+    if len(commits) < 2:
+        print("Need results of at least two commits to compare")
+        return
+    old, new = commits[-2], commits[-1]
+    latest = {}
+    for record in history:
+        latest[(record['commit'], record['case'], record['size'])] = record
+    print(f"{'case':<40} {'size':>10} {old:>14} {new:>14} {'ratio':>7}   peak RSS MB old/new")
+    for case in CASES:
+        for size in sorted({r['size'] for r in history if r['case'] == case}):
+            a, b = latest.get((old, case, size)), latest.get((new, case, size))
+            if not a or not b:
+                continue
+            ratio = b['min_s'] / a['min_s'] if a['min_s'] else float('nan')
+            print(f"{case:<40} {size:>10} {a['min_s']:>13.4f}s {b['min_s']:>13.4f}s {ratio:>6.2f}x"
+                  f"   {a['peak_rss_mb']:.0f}/{b['peak_rss_mb']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analysis scripts on synthetic campaigns')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='Total request counts of the synthetic campaigns (e.g. 1000 100000 10000000)')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), help='Cases to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed calls per case (the minimum is reported)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f'Directory for the synthetic data cache and {RESULTS_FILE}')
+    parser.add_argument('--timeout', type=float, help='Give up on a case after this many seconds')
+    parser.add_argument('--no_record', action='store_true', help='Do not append the results to the history')
+    parser.add_argument('--compare', nargs='*', metavar='COMMIT',
+                        help='Compare two commits of the history instead of running (default: the latest two)')
+    parser.add_argument('--child', nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        case, data, repeat, result_file = args.child
+        run_case(case, data, int(repeat), result_file)
+        return
+
+    output = Path(args.output)
+    results_path = output / RESULTS_FILE
+    if args.compare is not None:
+        compare(read_history(results_path), args.compare)
+        return
+
+    commit, dirty = git_revision()
+    print(f"Commit: {commit}{' (dirty)' if dirty else ''}, Python {platform.python_version()}, {platform.machine()}")
+    print(f"{'case':<40} {'size':>10} {'min(s)':>10} {'median(s)':>10} {'peak RSS MB':>12} {'+RSS MB':>8}")
+    records = []
+    for size in args.sizes:
+        data = generate_dataset(output / 'data', size)
+        for case in args.cases or CASES:
+            result, error = run_in_child(case, data, args.repeat, args.timeout)
+            if result is None:
+                print(f"{case:<40} {size:>10}  failed: {' '.join(error)}")
+                continue
+            record = {
+                'commit': commit, 'dirty': dirty, 'date': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(), 'machine': platform.machine(),
+                'case': case, 'size': size, 'repeat': args.repeat,
+                'min_s': min(result['times']), 'median_s': statistics.median(result['times']),
+                'peak_rss_mb': result['peak_rss_mb'],
+                'delta_rss_mb': max(result['peak_rss_mb'] - result['baseline_rss_mb'], 0.0),
+            }
+            records.append(record)
+            print(f"{case:<40} {size:>10} {record['min_s']:>10.4f} {record['median_s']:>10.4f} "
+                  f"{record['peak_rss_mb']:>12.1f} {record['delta_rss_mb']:>8.1f}")
+
+    if records and not args.no_record:
+        output.mkdir(parents=True, exist_ok=True)
+        with open(results_path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        print(f"Results appended to {results_path}")
+
+
+if __name__ == '__main__':
+    main()
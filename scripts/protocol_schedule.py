@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Protocol run scheduling for benchmark campaigns
+Running every HTTP/2 repetition before every HTTP/3 repetition turns slow
+drift (thermal throttling on the Pi, background load) into a systematic bias
+between the protocols. The schedules here put repetition k of each protocol
+next to each other as one block, alternating (ABBA) or shuffling (seeded) the
+order inside the blocks, so each block is a matched pair and the analysis can
+work on paired differences instead of two independent samples.
+"""
+
+import json
+import math
+import random
+import time
+import uuid
+from pathlib import Path
+
+SCHEDULES = ('sequential', 'abba', 'random')
+DEFAULT_SCHEDULE = 'abba'
+SCHEDULE_FILE = 'protocol_schedule.json'
+
+
+def build_schedule(conditions, protocols, repetitions, mode=DEFAULT_SCHEDULE, seed=None):
+    """Blocks of units in execution order
+
+    conditions: condition labels in campaign order
+    repetitions: repetition labels per protocol, e.g. [(1, 1), (1, 2), (2, 1), (2, 2)]
+    Returns [[(condition, protocol, repetition), ...], ...]; the units of one
+    block are meant to run back to back on the same testbed.
+      sequential: every repetition of a protocol, then the next protocol (one unit per block)
+      abba:       one block per repetition, protocol order reversed on every other block
+      random:     one block per repetition, protocol order and block order shuffled with seed
+    """
+    if mode not in SCHEDULES:
+        raise ValueError(f"unknown schedule: {mode}")
+    protocols = list(protocols)
+
+    if mode == 'sequential':
+        return [[(condition, protocol, repetition)]
+                for condition in conditions for protocol in protocols for repetition in repetitions]
+
+    rng = random.Random(seed)
+    blocks = []
+    for condition in conditions:
+        for repetition in repetitions:
+            if mode == 'abba':
+                # A B | B A | A B | ... (条件をまたいでも交互に続ける)
+                order = protocols if len(blocks) % 2 == 0 else protocols[::-1]
+            else:
+                order = rng.sample(protocols, len(protocols))
+            blocks.append([(condition, protocol, repetition) for protocol in order])
+    if mode == 'random':
+        # 条件の順序もランダム化 (netem の切り替えは差分更新なので安い)
+        rng.shuffle(blocks)
+    return blocks
+
+
+def new_schedule_id():
+    """Id of one built schedule; block numbers only pair units recorded under the same id"""
+    return uuid.uuid4().hex[:12]
+
+
+def write_schedule(path, blocks, mode, seed, schedule_id=None, append=False):
+    """Record the execution order next to the campaign logs
+
+    The file holds one entry per schedule id ({'schedules': {id: {...}}}); with
+    append=True (--resume) the schedules of the previous runs are kept.
+    """
+    runs = []
+    for block_index, block in enumerate(blocks):
+        for condition, protocol, repetition in block:
+            runs.append({'order': len(runs), 'block': block_index, 'condition': condition,
+                         'protocol': protocol, 'repetition': list(repetition)})
+    path = Path(path)
+    schedules = {}
+    if append and path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        # 旧形式 (スケジュール1つだけ) のファイルも引き継ぐ
+        schedules = previous.get('schedules') or {previous.get('id'): {k: v for k, v in previous.items() if k != 'id'}}
+    schedules[schedule_id] = {'mode': mode, 'seed': seed,
+                              'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'runs': runs}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'schedules': schedules}, f, indent=2)
+    return path
+
+
+def paired_differences(pairs, confidence_level=0.95):
+    """Mean of a - b over matched pairs with a Student-t confidence interval
+
+    pairs: [(a, b)] measured in the same block. Returns None without pairs; the
+    interval is None with fewer than two pairs.
+    """
+    if not pairs:
+        return None
+    diffs = [a - b for a, b in pairs]
+    n = len(diffs)
+    mean_diff = sum(diffs) / n
+    mean_b = sum(b for _, b in pairs) / n
+    result = {
+        'pairs': n,
+        'mean_diff': mean_diff,
+        'std_diff': None,
+        'ci_low': None,
+        'ci_high': None,
+        'mean_diff_pct': mean_diff / mean_b * 100 if mean_b else None,
+    }
+    if n >= 2:
+        from scipy import stats  # 区間推定のときだけ読み込む (import に 0.5 秒以上かかる)
+        std_diff = math.sqrt(sum((d - mean_diff) ** 2 for d in diffs) / (n - 1))
+        half_width = float(stats.t.ppf(0.5 + confidence_level / 2, n - 1)) * std_diff / math.sqrt(n)
+        result.update(std_diff=std_diff, ci_low=mean_diff - half_width, ci_high=mean_diff + half_width)
+    return result
+
+
+def is_significant_paired(result):
+    """The paired confidence interval excludes zero"""
+    return bool(result and result['ci_low'] is not None and (result['ci_low'] > 0 or result['ci_high'] < 0))
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Baseline registry and automatic latency regression check
+A campaign is marked as the baseline of its stack version for every condition it
+measured; the per-request latencies are copied into the registry so the
+baseline survives the campaign's logs. New campaigns are compared condition by
+condition with a two-sided Mann-Whitney U test, and a regression is flagged only
+when it is significant and its effect size (Cliff's delta, new slower than
+baseline) reaches --min_effect, so millions of requests cannot turn a negligible
+shift into a failure.
+
+The stack version defaults to a digest of the server/router/client build files
+(e.g. server/nginx.conf), so changing worker_connections creates a new stack
+that is checked against the last marked baseline of each condition.
+
+  regression_baseline.py mark  <log_dir> [--stack LABEL]
+  regression_baseline.py check <log_dir> [--against LABEL]   exit status 3 on regressions
+  regression_baseline.py list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from campaign_state import STATE_FILE
+from h2load_stream import RequestLogParser
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPO_DIR = SCRIPT_DIR.parent
+DEFAULT_REGISTRY = 'logs/baselines'
+REGISTRY_FILE = 'registry.json'
+# スタックのバージョンを決めるビルド・設定ファイル (リポジトリ相対)
+STACK_FILES = ('server/nginx.conf', 'server/Dockerfile', 'router/Dockerfile', 'client/Dockerfile',
+               'Dockerfile', 'docker-compose.yml')
+DEFAULT_MIN_EFFECT = 0.147  # |Cliff's delta| < 0.147 は negligible (Romano et al.)
+DEFAULT_ALPHA = 0.01
+REGRESSION_EXIT = 3
+PROTOCOLS = {'h2': 'http2', 'h3': 'http3'}
+
+
+def stack_version(simulated=False):
+    """Digest of the stack build files ('sim-' prefix for the simulated testbed)"""
+    digest = hashlib.sha256()
+    for name in STACK_FILES:
+        path = REPO_DIR / name
+        if path.exists():
+            digest.update(name.encode())
+            digest.update(path.read_bytes())
+    return f"{'sim-' if simulated else ''}{digest.hexdigest()[:12]}"
+
+
+def _condition_key(text):
+    """'150:3:0' (ultra_final) or '150ms_3pct' (run_bench.sh) -> '150:3:0'"""
+    if ':' in text:
+        values = text.split(':')
+    else:
+        values = [part.rstrip('mspctbw') for part in text.split('_')]
+    values = [f"{float(v):g}" for v in values] + ['0'] * (3 - len(values))
+    return ':'.join(values[:3])
+
+
+def _durations(log_file):
+    """Per-request durations (us) of an h2load log, or of its .csv --log-file beside it"""
+    requests = RequestLogParser().feed_file(log_file)
+    if not len(requests):
+        records = Path(log_file).with_suffix('.csv')
+        if records.exists():
+            requests = RequestLogParser().feed_file(records)
+    starts = np.asarray(requests.start_us, dtype=np.int64)
+    durations = np.asarray(requests.duration_us, dtype=np.int64)
+    return starts, durations
+
+
+def group_durations(units, warmup_fraction=0.0):
+    """{(condition, protocol): durations_us} from [(condition, protocol, start_us, duration_us)]
+
+    The first warmup_fraction of each run (by start time) is dropped like the
+    trim stage of the analysis pipeline; failed requests (duration 0) are ignored.
+    """
+    groups = {}
+    for condition, protocol, starts, durations in units:
+        order = np.argsort(starts, kind='stable')
+        kept = durations[order[int(len(order) * warmup_fraction):]]
+        groups.setdefault((condition, protocol), []).append(kept[kept > 0])
+    return {key: np.concatenate(parts) for key, parts in sorted(groups.items())}
+
+
+def load_campaign(log_dir, warmup_fraction=0.0):
+    """Grouped per-request durations of the units recorded in <log_dir>/campaign_state.json"""
+    with open(Path(log_dir) / STATE_FILE, 'r', encoding='utf-8') as f:
+        recorded = json.load(f)['units']
+    units = []
+    for unit, entry in sorted(recorded.items()):
+        log_file = entry.get('artifacts', {}).get('log_file')
+        if not log_file or not Path(log_file).exists():
+            continue
+        condition, protocol = unit.split('/')[:2]
+        starts, durations = _durations(log_file)
+        units.append((_condition_key(condition), PROTOCOLS.get(protocol, protocol), starts, durations))
+    return group_durations(units, warmup_fraction)
+
+
+class BaselineRegistry:
+    """registry.json plus one .npy of per-request durations per (stack, condition, protocol)"""
+
+    def __init__(self, root=DEFAULT_REGISTRY):
+        self.root = Path(root)
+        self.path = self.root / REGISTRY_FILE
+        self.entries = []
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)['baselines']
+
+    def digest(self):
+        """Content digest of the registry (cache key of the regression stage)"""
+        if not self.path.exists():
+            return None
+        return hashlib.sha256(self.path.read_bytes()).hexdigest()
+
+    def mark(self, groups, stack, campaign):
+        """Register every (condition, protocol) of a campaign as the baseline of `stack`"""
+        marked = datetime.now().isoformat(timespec='seconds')
+        for (condition, protocol), durations in groups.items():
+            if not durations.size:
+                continue
+            data_file = Path(stack) / f"{condition.replace(':', '_')}_{protocol}.npy"
+            (self.root / stack).mkdir(parents=True, exist_ok=True)
+            np.save(self.root / data_file, durations)
+            self.entries = [e for e in self.entries
+                            if (e['stack'], e['condition'], e['protocol']) != (stack, condition, protocol)]
+            self.entries.append({
+                'stack': stack, 'condition': condition, 'protocol': protocol, 'campaign': str(campaign),
+                'marked': marked, 'requests': int(durations.size),
+                'median_ms': float(np.median(durations)) / 1000, 'file': str(data_file),
+            })
+        self._save()
+
+    def _save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'baselines': self.entries}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def find(self, condition, protocol, stack=None):
+        """Baseline entry of a condition: of `stack`, or the most recently marked one"""
+        candidates = [e for e in self.entries if e['condition'] == condition and e['protocol'] == protocol
+                      and (stack is None or e['stack'] == stack)]
+        return max(candidates, key=lambda e: e['marked']) if candidates else None
+
+    def durations(self, entry):
+        return np.load(self.root / entry['file'])
+
+
+def compare_distributions(new, base, min_effect=DEFAULT_MIN_EFFECT, alpha=DEFAULT_ALPHA):
+    """Mann-Whitney U test of new vs baseline latencies with Cliff's delta as effect size
+
+    delta > 0: new requests tend to be slower. verdict is 'regression' or
+    'improvement' when p < alpha and |delta| >= min_effect, otherwise 'same'.
+    """
+    from scipy import stats  # scipy の読み込みは 0.5 秒以上かかるので検定時だけ
+    u, p_value = stats.mannwhitneyu(new, base, alternative='two-sided')
+    delta = 2 * float(u) / (new.size * base.size) - 1
+    base_median, new_median = float(np.median(base)), float(np.median(new))
+    verdict = 'same'
+    if p_value < alpha and abs(delta) >= min_effect:
+        verdict = 'regression' if delta > 0 else 'improvement'
+    return {
+        'requests': int(new.size), 'baseline_requests': int(base.size),
+        'median_ms': new_median / 1000, 'baseline_median_ms': base_median / 1000,
+        'median_change_pct': (new_median - base_median) / base_median * 100 if base_median else None,
+        'p_value': float(p_value), 'cliffs_delta': delta, 'verdict': verdict,
+    }
+
+
+def check_campaign(groups, registry, campaign=None, against=None, min_effect=DEFAULT_MIN_EFFECT,
+                   alpha=DEFAULT_ALPHA):
+    """Compare each (condition, protocol) of a campaign with its baseline; [result dict]"""
+    results = []
+    for (condition, protocol), durations in groups.items():
+        entry = registry.find(condition, protocol, against)
+        result = {'condition': condition, 'protocol': protocol, 'baseline': entry and entry['stack']}
+        if entry is None or not durations.size:
+            result['verdict'] = 'no baseline' if entry is None else 'no data'
+        elif campaign is not None and Path(entry['campaign']).resolve() == Path(campaign).resolve():
+            result['verdict'] = 'is baseline'
+        else:
+            result.update(compare_distributions(durations, registry.durations(entry), min_effect, alpha))
+        results.append(result)
+    return results
+
+
+def has_regressions(results):
+    return any(result['verdict'] == 'regression' for result in results)
+
+
+def print_results(results, min_effect=DEFAULT_MIN_EFFECT, alpha=DEFAULT_ALPHA):
+    print(f"\nRegression check (Mann-Whitney U, alpha={alpha}, |Cliff's delta| >= {min_effect})")
+    print(f"  {'condition':<12} {'protocol':<8} {'baseline':<18} {'median ms':>20} {'change':>8} "
+          f"{'delta':>7} {'p':>9}  verdict")
+    for r in results:
+        if 'p_value' not in r:
+            print(f"  {r['condition']:<12} {r['protocol']:<8} {r['baseline'] or '-':<18} {'':>20} {'':>8} "
+                  f"{'':>7} {'':>9}  {r['verdict']}")
+            continue
+        medians = f"{r['baseline_median_ms']:.2f} -> {r['median_ms']:.2f}"
+        change = f"{r['median_change_pct']:+.1f}%" if r['median_change_pct'] is not None else '?'
+        flag = '  <<<' if r['verdict'] == 'regression' else ''
+        print(f"  {r['condition']:<12} {r['protocol']:<8} {r['baseline']:<18} {medians:>20} {change:>8} "
+              f"{r['cliffs_delta']:>+7.3f} {r['p_value']:>9.2g}  {r['verdict']}{flag}")
+    regressions = sum(r['verdict'] == 'regression' for r in results)
+    print(f"  {regressions} regression(s)" if regressions else "  No regressions")
+
+
+def add_regression_arguments(parser):
+    """Options shared by this script and ultra_final_analysis.py"""
+    parser.add_argument('--stack', help='Stack version label (default: digest of the server/router/client build files)')
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY, help='Baseline registry directory')
+    parser.add_argument('--against', metavar='STACK',
+                        help='Baseline stack to compare with (default: latest baseline of each condition)')
+    parser.add_argument('--min_effect', type=float, default=DEFAULT_MIN_EFFECT,
+                        help="Smallest Cliff's delta reported as a regression")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='Significance level of the U test')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mark baseline campaigns and check new ones for latency regressions')
+    parser.add_argument('command', choices=['mark', 'check', 'list'])
+    parser.add_argument('log_dir', nargs='?', help='Campaign log directory (with campaign_state.json)')
+    parser.add_argument('--warmup_fraction', type=float, default=0.0,
+                        help='Fraction of each run\'s requests (by start time) excluded')
+    parser.add_argument('--simulated', action='store_true', help='The campaign ran on the simulated testbed')
+    add_regression_arguments(parser)
+    args = parser.parse_args()
+
+    registry = BaselineRegistry(args.registry)
+    if args.command == 'list':
+        for e in sorted(registry.entries, key=lambda e: (e['stack'], e['condition'], e['protocol'])):
+            print(f"{e['stack']:<18} {e['condition']:<12} {e['protocol']:<8} {e['requests']:>9} req  "
+                  f"median {e['median_ms']:.2f} ms  {e['marked']}  {e['campaign']}")
+        return
+    if args.log_dir is None:
+        parser.error(f"{args.command} needs a log_dir")
+
+    try:
+        groups = load_campaign(args.log_dir, args.warmup_fraction)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.command == 'mark':
+        stack = args.stack or stack_version(args.simulated)
+        registry.mark(groups, stack, args.log_dir)
+        print(f"Marked {len(groups)} condition/protocol baselines of {args.log_dir} as stack {stack}")
+        return
+
+    results = check_campaign(groups, registry, args.log_dir, args.against, args.min_effect, args.alpha)
+    print_results(results, args.min_effect, args.alpha)
+    if has_regressions(results):
+        sys.exit(REGRESSION_EXIT)
+
+
+if __name__ == '__main__':
+    main()
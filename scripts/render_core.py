@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Object-oriented rendering core for benchmark graphs
+Figures are built on matplotlib.figure.Figure + FigureCanvasAgg without pyplot,
+so each figure owns its state and can be rendered from a worker thread.
+matplotlib is imported by the first figure or PDF, not at import time, so the
+scripts built on this module answer --help without loading it.
+"""
+
+import os
+import threading
+
+import event_log
+import stage_profiler
+from render_profiles import DEFAULT_PROFILE, savefig_options
+
+# seaborn-v0_8 相当の軸スタイル (rcParams を書き換えないよう軸ごとに適用)
+SEABORN_AXES_STYLE = {
+    'facecolor': '#EAEAF2',
+    'grid_color': 'white',
+}
+
+
+def new_figure(figsize=None):
+    """Create a standalone figure attached to its own Agg canvas"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def subplots(nrows=1, ncols=1, figsize=None, **kwargs):
+    """Object-oriented replacement for plt.subplots"""
+    fig = new_figure(figsize)
+    axes = fig.subplots(nrows, ncols, **kwargs)
+    return fig, axes
+
+
+def apply_seaborn_style(ax):
+    """Apply the seaborn-v0_8 look to one axes without touching global rcParams"""
+    ax.set_facecolor(SEABORN_AXES_STYLE['facecolor'])
+    ax.set_axisbelow(True)
+    ax.grid(True, color=SEABORN_AXES_STYLE['grid_color'], linewidth=1.0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+
+class PdfSink:
+    """Multi-page PDF that figures are streamed into one page at a time
+
+    Each page is written to the file as soon as it is added and the figure is
+    released by render(), so memory stays bounded regardless of page count.
+    A page index (page number -> figure name) is written next to the PDF on close.
+    """
+
+    def __init__(self, path):
+        from matplotlib.backends.backend_pdf import PdfPages
+        self.path = str(path)
+        self.index = []
+        self._lock = threading.Lock()  # render() may be called from worker threads
+        self._pdf = PdfPages(self.path)
+
+    def add(self, fig, name, **savefig_kwargs):
+        """Append a figure as the next page and return its page number"""
+        with self._lock:
+            self._pdf.savefig(fig, **savefig_kwargs)
+            self.index.append(name)
+            return len(self.index)
+
+    def close(self):
+        with self._lock:
+            if self._pdf is None:
+                return
+            self._pdf.close()
+            self._pdf = None
+            with open(os.path.splitext(self.path)[0] + '_index.txt', 'w', encoding='utf-8') as f:
+                for page, name in enumerate(self.index, 1):
+                    f.write(f"{page}\t{name}\n")
+        print(f"PDF saved: {self.path} ({len(self.index)} pages)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def render(fig, path, profile=DEFAULT_PROFILE, dpi=300, tight=True, layout=None, sink=None):
+    """Lay out and save a figure, then release its artists
+
+    layout: None, or keyword arguments for fig.tight_layout (True for defaults)
+    sink: PdfSink to append the figure to instead of writing an image file at path
+    Returns where the figure went (the path, or the PDF page).
+    """
+    try:
+        with stage_profiler.stage('render.savefig'), event_log.span('figure_render', path=str(path)):
+            if layout is not None:
+                fig.tight_layout(**({} if layout is True else layout))
+            options = savefig_options(profile, dpi, tight)
+            if sink is not None:
+                page = sink.add(fig, str(path), **options)
+                return f"{sink.path} (page {page})"
+            fig.savefig(path, **options)
+            return str(path)
+    finally:
+        fig.clear()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Named render profiles for benchmark graphs
+preview: low dpi, no tight bbox, essential panels only (intermediate directories)
+publication: full quality (all_ave and summary figures)
+"""
+
+import event_log
+import stage_profiler
+
+RENDER_PROFILES = {
+    'preview': {
+        'max_dpi': 72,          # Cap resolution for figures nobody reads closely
+        'tight_bbox': False,    # Skip the extra layout pass of bbox_inches='tight'
+        'full_panels': False,   # Skip non-essential panels
+    },
+    'publication': {
+        'max_dpi': None,
+        'tight_bbox': True,
+        'full_panels': True,
+    },
+}
+
+DEFAULT_PROFILE = 'publication'
+
+
+def get_render_profile(name):
+    """Return the options of a render profile"""
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name} (choose from {', '.join(RENDER_PROFILES)})")
+    return RENDER_PROFILES[name]
+
+
+def full_panels(profile):
+    """Whether non-essential panels should be rendered under this profile"""
+    return get_render_profile(profile)['full_panels']
+
+
+def savefig_options(profile=DEFAULT_PROFILE, dpi=300, tight=True):
+    """savefig keyword arguments for a figure under a render profile
+
+    dpi and tight are the figure's publication settings; the preview profile
+    caps the dpi and drops the tight bounding box.
+    """
+    options = get_render_profile(profile)
+    if options['max_dpi'] is not None:
+        dpi = min(dpi, options['max_dpi'])
+    return {'dpi': dpi, 'bbox_inches': 'tight' if tight and options['tight_bbox'] else None}
+
+
+def save_figure(fig, path, profile=DEFAULT_PROFILE, dpi=300, tight=True):
+    """Save a figure according to a render profile"""
+    with stage_profiler.stage('render.savefig'), event_log.span('figure_render', path=str(path)):
+        fig.savefig(path, **savefig_options(profile, dpi, tight))
+
+
+def add_render_profile_argument(parser, default=DEFAULT_PROFILE, extra_choices=()):
+    """Add the shared --render_profile option to an argparse parser"""
+    choices = list(extra_choices) + list(RENDER_PROFILES)
+    parser.add_argument('--render_profile', '--render-profile', dest='render_profile',
+                        choices=choices, default=default,
+                        help=f"Render profile for saved figures (default: {default})")
@@ -10,10 +10,21 @@ echo "ベンチマーク開始: $(date)"
 echo "================================================"
 
 # Create timestamped log directory
-NOW=$(date +"%Y%m%d_%H%M%S")
-LOG_DIR="logs/benchmark_${NOW}"
+# 中断したキャンペーンの再開: ./scripts/run_bench.sh --resume logs/benchmark_YYYYMMDD_HHMMSS
+RESUME=0
+if [ "$1" = "--resume" ] && [ -n "$2" ]; then
+    RESUME=1
+    LOG_DIR="$2"
+    echo "[INFO] 完了済みの条件をスキップして再開: $LOG_DIR"
+else
+    NOW=$(date +"%Y%m%d_%H%M%S")
+    LOG_DIR="logs/benchmark_${NOW}"
+fi
 mkdir -p $LOG_DIR
 
+# 完了した (条件, プロトコル) をログと集計値ごと記録するチェックポイント
+STATE_FILE="$LOG_DIR/campaign_state.json"
+
 echo "[INFO] ログディレクトリ: $LOG_DIR"
 
 SERVER_IP="172.30.0.2"
@@ -72,6 +83,17 @@ MEASUREMENT_REQUESTS=$MEASUREMENT_REQUESTS
 CONNECTION_WARMUP_TIME=$CONNECTION_WARMUP_TIME
 EOF
 
+# Returns success if a unit was completed in the run being resumed
+unit_done() {
+    [ "$RESUME" = 1 ] && python3 scripts/campaign_state.py done "$STATE_FILE" "$1"
+}
+
+# Record a completed unit with its h2load log (parsed summary is stored in the state file)
+record_unit() {
+    python3 scripts/campaign_state.py record "$STATE_FILE" "$1" --log "$2" \
+        || echo "Warning: failed to record $1 in $STATE_FILE"
+}
+
 # Function to stabilize system before benchmark
 stabilize_system() {
     local delay=$1
@@ -163,10 +185,17 @@ run_http2_bench() {
         --data '$temp_data_file' \
         --log-file '/logs/$(basename $csv_file)' \
         https://$SERVER_IP/echo" >> $log_file 2>&1
+    # 計測フェーズの h2load (docker exec) の終了コードを返す (失敗した実行は記録しない)
+    local status=$?
     
     # Clean up temporary file
     docker exec grpc-client bash -c "rm '$temp_data_file'"
     
+    if [ $status -ne 0 ]; then
+        echo "h2load HTTP/2 failed (exit status $status)"
+        return $status
+    fi
+    
     # Add summary at the end
     echo "" >> $log_file
     echo "=== BENCHMARK SUMMARY ===" >> $log_file
@@ -226,12 +255,13 @@ run_http3_bench() {
         --alpn-list=h3,h2 \
         --log-file '/logs/$(basename $csv_file)' \
         https://$SERVER_IP/echo" >> $log_file 2>&1
+    local status=$?
     
     # Clean up temporary file
     docker exec grpc-client bash -c "rm '$temp_data_file'"
     
     # Check if h2load succeeded and analyze protocol usage
-    if grep -q "succeeded, 0 failed" $log_file; then
+    if [ $status -eq 0 ] && grep -q "succeeded, 0 failed" $log_file; then
         # Check if HTTP/3 was actually used by looking for QUIC indicators
         if grep -q "Application protocol: h3" $log_file; then
             echo "✓ h2load HTTP/3 benchmark completed successfully (confirmed HTTP/3)"
@@ -258,8 +288,8 @@ run_http3_bench() {
         echo "HTTP/3 CSV data saved to $csv_file"
         return 0
     else
-        echo "h2load HTTP/3 failed"
-        return 1
+        echo "h2load HTTP/3 failed (exit status $status)"
+        return $(( status ? status : 1 ))
     fi
 }
 
@@ -280,8 +310,24 @@ verify_http3() {
 }
 
 # Main benchmark loop
+CASE_INDEX=0
 for test_case in "${TEST_CASES[@]}"; do
     read -r delay loss <<< "$test_case"
+    # プロトコル順を条件ごとに交互にする (h2,h3 | h3,h2 | ...) ことでドリフトの偏りを打ち消す
+    # (再開時も同じ順序になるようスキップ判定の前に決める)
+    if [ $((CASE_INDEX % 2)) -eq 0 ]; then
+        PROTOCOL_ORDER="h2 h3"
+    else
+        PROTOCOL_ORDER="h3 h2"
+    fi
+    CASE_INDEX=$((CASE_INDEX + 1))
+    h2_unit="${delay}ms_${loss}pct/h2"
+    h3_unit="${delay}ms_${loss}pct/h3"
+    
+    if unit_done "$h2_unit" && unit_done "$h3_unit"; then
+        echo "Skipping completed test case: ${delay}ms delay, ${loss}% loss"
+        continue
+    fi
     
     echo ""
     echo "================================================"
@@ -305,14 +351,29 @@ for test_case in "${TEST_CASES[@]}"; do
     fi
     
     # Run benchmarks sequentially to avoid interference
-    echo "Running benchmarks..."
-    run_http2_bench $delay $loss
-    
-    echo "Waiting 30 seconds between protocols..."
-    sleep 30
-    
-    # Run HTTP/3 benchmark with h2load
-    run_http3_bench $delay $loss
+    echo "Running benchmarks (order: $PROTOCOL_ORDER)..."
+    # 再開時は記録済みの条件の行を重ねて書かない
+    if ! grep -q "^${delay}ms_${loss}pct " "$LOG_DIR/protocol_order.txt" 2>/dev/null; then
+        echo "${delay}ms_${loss}pct $PROTOCOL_ORDER" >> "$LOG_DIR/protocol_order.txt"
+    fi
+    first=1
+    for proto in $PROTOCOL_ORDER; do
+        unit="${delay}ms_${loss}pct/${proto}"
+        if unit_done "$unit"; then
+            echo "Skipping completed ${proto} benchmark (${delay}ms delay, ${loss}% loss)"
+            continue
+        fi
+        if [ "$first" = 0 ]; then
+            echo "Waiting 30 seconds between protocols..."
+            sleep 30
+        fi
+        first=0
+        if [ "$proto" = "h2" ]; then
+            run_http2_bench $delay $loss && record_unit "$unit" "$LOG_DIR/h2_${delay}ms_${loss}pct.log"
+        else
+            run_http3_bench $delay $loss && record_unit "$unit" "$LOG_DIR/h3_${delay}ms_${loss}pct.log"
+        fi
+    done
     
     echo "Completed test case: ${delay}ms delay, ${loss}% loss"
     echo ""
@@ -360,7 +421,8 @@ echo "ベンチマーク完了: $(date)"
 echo "================================================"
 
 # ホスト側で最新のベンチマークディレクトリを取得してグラフ生成
-LATEST_LOG_DIR=$(ls -1td logs/benchmark_* | head -n1)
+# (再開時は最新ではなく再開したディレクトリを使う)
+LATEST_LOG_DIR="$LOG_DIR"
 echo "[ホスト] グラフ自動生成: python3 scripts/simple_graph_generator.py $LATEST_LOG_DIR"
 
 # グラフ生成の実行（エラーハンドリング付き）
@@ -377,6 +439,13 @@ else
     echo "source venv/bin/activate && python3 scripts/simple_graph_generator.py $LATEST_LOG_DIR"
 fi
 
+# 対話型HTMLレポート（全条件のCDF・時系列・H2/H3差分を1ファイルに集約）
+if python3 scripts/html_report.py "$LATEST_LOG_DIR"; then
+    echo "✅ HTMLレポート: $LATEST_LOG_DIR/benchmark_report.html"
+else
+    echo "❌ HTMLレポート生成でエラーが発生しました"
+fi
+
 echo "================================================"
 echo "完全自動化完了: $(date)"
 echo "ベンチマーク + グラフ生成が正常に完了しました"
@@ -10,12 +10,11 @@ import csv
 import statistics
 import argparse
 from pathlib import Path
+from render_profiles import add_render_profile_argument, full_panels
+import stage_profiler
 
 try:
-    import matplotlib
-    matplotlib.use('Agg')  # Non-interactive backend
-    import matplotlib.pyplot as plt
-    import matplotlib.patches as mpatches
+    from render_core import PdfSink, new_figure, render, subplots  # Agg canvas, no pyplot
     MATPLOTLIB_AVAILABLE = True
 except ImportError:
     MATPLOTLIB_AVAILABLE = False
@@ -68,8 +67,9 @@ def calculate_statistics(response_times):
     
     return stats
 
-def generate_graphs(benchmark_dir, debug: bool, dpi: int, only_conditions: list[str] | None = None, annotate: bool = True):
-    """Generate performance comparison graphs"""
+def generate_graphs(benchmark_dir, debug: bool, dpi: int, only_conditions: list[str] | None = None,
+                    annotate: bool = True, profile: str = 'publication', sink=None):
+    """Generate performance comparison graphs (sink: optional PdfSink instead of PNG files)"""
     if not MATPLOTLIB_AVAILABLE:
         print("Skipping graph generation - matplotlib not available")
         return
@@ -151,67 +151,67 @@ def generate_graphs(benchmark_dir, debug: bool, dpi: int, only_conditions: list[
         print(f"Debug: condition_labels: {condition_labels}")
     
     # Create the graph
-    plt.figure(figsize=(12, 8))
+    fig = new_figure(figsize=(12, 8))
+    ax = fig.add_subplot()
     
     x = range(len(conditions))
     width = 0.35
     
     # Create bars without error bars
-    bars1 = plt.bar([i - width/2 for i in x], h2_means, width, 
-                    label='HTTP/2', color='#1f77b4', alpha=0.8)
-    bars2 = plt.bar([i + width/2 for i in x], h3_means, width, 
-                    label='HTTP/3', color='#ff7f0e', alpha=0.8)
+    bars1 = ax.bar([i - width/2 for i in x], h2_means, width, 
+                   label='HTTP/2', color='#1f77b4', alpha=0.8)
+    bars2 = ax.bar([i + width/2 for i in x], h3_means, width, 
+                   label='HTTP/3', color='#ff7f0e', alpha=0.8)
     
     # Customize the graph
-    plt.xlabel('Network Conditions', fontsize=12)
-    plt.ylabel('Mean Response Time (ms)', fontsize=12)
-    plt.title('HTTP/2 vs HTTP/3 Performance Comparison\nResponse Time by Network Conditions', fontsize=14, fontweight='bold')
-    plt.xticks(x, condition_labels, rotation=45, ha='right')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
+    ax.set_xlabel('Network Conditions', fontsize=12)
+    ax.set_ylabel('Mean Response Time (ms)', fontsize=12)
+    ax.set_title('HTTP/2 vs HTTP/3 Performance Comparison\nResponse Time by Network Conditions', fontsize=14, fontweight='bold')
+    ax.set_xticks(x)
+    ax.set_xticklabels(condition_labels, rotation=45, ha='right')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
     
     # Add value labels on bars
     for i, (h2_mean, h3_mean) in enumerate(zip(h2_means, h3_means)):
-        plt.text(i - width/2, h2_mean + 50, f'{h2_mean:.0f}', 
-                ha='center', va='bottom', fontsize=10)
-        plt.text(i + width/2, h3_mean + 50, f'{h3_mean:.0f}', 
-                ha='center', va='bottom', fontsize=10)
+        ax.text(i - width/2, h2_mean + 50, f'{h2_mean:.0f}', 
+               ha='center', va='bottom', fontsize=10)
+        ax.text(i + width/2, h3_mean + 50, f'{h3_mean:.0f}', 
+               ha='center', va='bottom', fontsize=10)
     
-    # Add performance improvement annotations
-    if annotate:
+    # Add performance improvement annotations (non-essential, skipped in preview)
+    if annotate and full_panels(profile):
         for i, (h2_mean, h3_mean) in enumerate(zip(h2_means, h3_means)):
             if h3_mean > 0:
                 improvement = ((h2_mean - h3_mean) / h2_mean) * 100
                 if abs(improvement) > 5:  # Only show significant differences
                     if improvement > 0:
-                        plt.annotate(f'HTTP/3\n+{improvement:.1f}%', 
-                                    xy=(i + width/2, h3_mean), xytext=(i + width/2, h3_mean + max(h3_means) * 0.1),
-                                    ha='center', va='bottom', fontsize=9, fontweight='bold',
-                                    arrowprops=dict(arrowstyle='->', color='green', lw=1.5))
+                        ax.annotate(f'HTTP/3\n+{improvement:.1f}%', 
+                                   xy=(i + width/2, h3_mean), xytext=(i + width/2, h3_mean + max(h3_means) * 0.1),
+                                   ha='center', va='bottom', fontsize=9, fontweight='bold',
+                                   arrowprops=dict(arrowstyle='->', color='green', lw=1.5))
                     else:
-                        plt.annotate(f'HTTP/2\n+{abs(improvement):.1f}%', 
-                                    xy=(i - width/2, h2_mean), xytext=(i - width/2, h2_mean + max(h2_means) * 0.1),
-                                    ha='center', va='bottom', fontsize=9, fontweight='bold',
-                                    arrowprops=dict(arrowstyle='->', color='blue', lw=1.5))
-    
-    plt.tight_layout()
+                        ax.annotate(f'HTTP/2\n+{abs(improvement):.1f}%', 
+                                   xy=(i - width/2, h2_mean), xytext=(i - width/2, h2_mean + max(h2_means) * 0.1),
+                                   ha='center', va='bottom', fontsize=9, fontweight='bold',
+                                   arrowprops=dict(arrowstyle='->', color='blue', lw=1.5))
     
     # Save the graph
     graph_file = os.path.join(benchmark_dir, 'performance_comparison_graph.png')
-    plt.savefig(graph_file, dpi=dpi, bbox_inches='tight')
-    plt.close()
+    graph_file = render(fig, graph_file, profile, dpi=dpi, layout=True, sink=sink)
     
     print(f"Performance graph generated: {graph_file}")
     
     # Generate summary statistics graph
-    generate_summary_graph(benchmark_dir, conditions, h2_means, h3_means, h2_stds, h3_stds, dpi)
+    generate_summary_graph(benchmark_dir, conditions, h2_means, h3_means, h2_stds, h3_stds, dpi, profile, sink)
 
-def generate_summary_graph(benchmark_dir, conditions, h2_means, h3_means, h2_stds, h3_stds, dpi: int):
+def generate_summary_graph(benchmark_dir, conditions, h2_means, h3_means, h2_stds, h3_stds, dpi: int,
+                           profile: str = 'publication', sink=None):
     """Generate a summary statistics graph with 2-panel layout"""
     if not MATPLOTLIB_AVAILABLE:
         return
     
-    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
+    fig, (ax1, ax2) = subplots(2, 1, figsize=(12, 10))
     
     x = range(len(conditions))
     width = 0.35
@@ -272,12 +272,9 @@ def generate_summary_graph(benchmark_dir, conditions, h2_means, h3_means, h2_std
     ax2.set_xticks(x)
     ax2.set_xticklabels(condition_labels, rotation=0)
     
-    plt.tight_layout()
-    
     # Save the summary graph
     summary_graph_file = os.path.join(benchmark_dir, 'performance_summary_graph.png')
-    plt.savefig(summary_graph_file, dpi=dpi, bbox_inches='tight')
-    plt.close()
+    summary_graph_file = render(fig, summary_graph_file, profile, dpi=dpi, layout=True, sink=sink)
     
     print(f"Summary graph generated: {summary_graph_file}")
 
@@ -397,6 +394,9 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     parser.add_argument("--no-annotations", action="store_true", help="Disable improvement arrow annotations on figures")
     parser.add_argument("--only", help="Comma-separated condition keys to include (e.g., '0ms_3pct,75ms_3pct')")
+    add_render_profile_argument(parser)
+    parser.add_argument("--pdf", help="Write graphs into this multi-page PDF instead of PNG files")
+    stage_profiler.add_profile_argument(parser)
     args = parser.parse_args()
 
     benchmark_dir = args.benchmark_directory
@@ -405,18 +405,25 @@ def main():
         print(f"Directory not found: {benchmark_dir}")
         sys.exit(1)
 
-    print(f"Generating performance report and graphs for: {benchmark_dir}")
+    with stage_profiler.profiling(args.profile, benchmark_dir, 'simple_graph_generator', memory=args.profile_memory):
+        print(f"Generating performance report and graphs for: {benchmark_dir}")
 
-    # Generate text report and optional CSV
-    generate_text_report(benchmark_dir, summary_csv_path=args.summary_csv)
+        # Generate text report and optional CSV
+        generate_text_report(benchmark_dir, summary_csv_path=args.summary_csv)
 
-    # Generate graphs with options
-    only = None
-    if args.only:
-        only = [c.strip() for c in args.only.split(',') if c.strip()]
-    generate_graphs(benchmark_dir, debug=args.debug, dpi=args.dpi, only_conditions=only, annotate=(not args.no_annotations))
+        # Generate graphs with options
+        only = None
+        if args.only:
+            only = [c.strip() for c in args.only.split(',') if c.strip()]
+        pdf_sink = PdfSink(args.pdf) if args.pdf and MATPLOTLIB_AVAILABLE else None
+        try:
+            generate_graphs(benchmark_dir, debug=args.debug, dpi=args.dpi, only_conditions=only,
+                            annotate=(not args.no_annotations), profile=args.render_profile, sink=pdf_sink)
+        finally:
+            if pdf_sink:
+                pdf_sink.close()
 
-    print("Report and graph generation completed!")
+        print("Report and graph generation completed!")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Simulated testbed (no containers)
+Stands in for `docker exec grpc-client h2load ...` and `docker exec grpc-router tc ...`
+so the whole campaign (netem control, h2load log transport, lanes, state,
+analysis pipeline, graphs) runs on any Linux box. h2load output and per-request
+logs are generated from a simple latency/loss model:
+  HTTP/2 (TCP)   a lost packet stalls every stream of its connection (head-of-line blocking)
+  HTTP/3 (QUIC)  a lost packet only delays the stream it belongs to, at a higher per-request CPU cost
+With a seed the generated logs are reproducible run for run (virtual clock, per-run seeds).
+
+  ultra_final_analysis.py --simulate --sim_seed 1 --requests 20000 --clients 20 --streams 10
+"""
+
+import hashlib
+import io
+import json
+import math
+import shlex
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+import stage_profiler
+
+VIRTUAL_EPOCH_US = 1_700_000_000_000_000  # 固定シード時の仮想時計の起点
+NOT_SIMULATED_EXIT_CODE = 127
+
+
+class LinkModel:
+    """Latency/loss model of client → router (netem) → server for one h2load run"""
+
+    def __init__(self, base_rtt_ms=0.4, service_us=250, service_sigma=0.35, packets_per_request=2,
+                 response_bytes=600, tcp_rto_min_ms=200.0, quic_pto_extra_ms=25.0, h3_cpu_factor=1.2,
+                 handshake_rtts=None):
+        self.base_rtt_ms = base_rtt_ms
+        self.service_us = service_us  # サーバー処理時間の中央値
+        self.service_sigma = service_sigma  # 処理時間の対数正規ばらつき
+        self.packets_per_request = packets_per_request
+        self.response_bytes = response_bytes
+        self.tcp_rto_min_ms = tcp_rto_min_ms
+        self.quic_pto_extra_ms = quic_pto_extra_ms
+        self.h3_cpu_factor = h3_cpu_factor  # ユーザー空間 QUIC の処理コスト
+        self.handshake_rtts = handshake_rtts or {'http2': 2, 'http3': 1}  # TCP+TLS1.3 / QUIC
+
+    def recovery_ms(self, protocol, rtt_ms):
+        """Extra latency of a request hit by a loss"""
+        if protocol == 'http2':
+            # 末尾ロスは RTO 待ち、それ以外は高速再送 (1 RTT) の中間として扱う
+            return max(self.tcp_rto_min_ms, 2 * rtt_ms) / 2 + rtt_ms
+        return 1.5 * rtt_ms + self.quic_pto_extra_ms
+
+    def simulate(self, protocol, requests, clients, streams, delay_ms, loss_pct, bandwidth_mbps, rng):
+        """Per-request (offset_us, duration_us) and the run's elapsed time in seconds
+
+        Every client connection runs its share of the requests in waves of up to
+        `streams` concurrent requests; a wave ends when its slowest request ends.
+        """
+        clients = max(1, min(clients, requests))
+        streams = max(1, streams)
+        per_client = math.ceil(requests / clients)
+        waves = math.ceil(per_client / streams)
+        shape = (clients, waves, streams)
+        valid = (np.arange(waves * streams).reshape(1, waves, streams)
+                 < np.clip(requests - np.arange(clients) * per_client, 0, per_client).reshape(clients, 1, 1))
+
+        rtt_ms = self.base_rtt_ms + delay_ms
+        cpu = self.h3_cpu_factor if protocol == 'http3' else 1.0
+        latency_ms = rtt_ms + self.service_us * cpu / 1000.0 * rng.lognormal(0.0, self.service_sigma, shape)
+        if bandwidth_mbps:
+            # 同時に転送中のレスポンスが帯域を分け合う
+            latency_ms += clients * streams * self.response_bytes * 8 / (bandwidth_mbps * 1e6) * 1000.0
+
+        if loss_pct:
+            hit = rng.random(shape) < 1 - (1 - loss_pct / 100.0) ** self.packets_per_request
+            hit &= valid
+            if protocol == 'http2':
+                # HOL: 同じ接続で同時に流れている全ストリームが待たされる
+                hit = np.broadcast_to(hit.any(axis=2, keepdims=True), shape)
+            latency_ms = latency_ms + hit * self.recovery_ms(protocol, rtt_ms)
+
+        latency_ms = np.where(valid, latency_ms, 0.0)
+        wave_ms = latency_ms.max(axis=2)
+        handshake_ms = self.handshake_rtts.get(protocol, 1) * rtt_ms
+        wave_start_ms = handshake_ms + np.cumsum(wave_ms, axis=1) - wave_ms
+        # ストリームの送出は数十 µs ずつずれる
+        offset_ms = wave_start_ms[:, :, None] + rng.uniform(0.0, 0.05, shape)
+        elapsed_s = float((handshake_ms + wave_ms.sum(axis=1)).max()) / 1000.0
+        return ((offset_ms[valid] * 1000).astype(np.int64), np.maximum(1, (latency_ms[valid] * 1000)).astype(np.int64),
+                elapsed_s)
+
+
+def format_duration(seconds):
+    """Duration the way h2load prints it (us / ms / s)"""
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 0.001:
+        return f"{seconds * 1000:.2f}ms"
+    return f"{int(seconds * 1e6)}us"
+
+
+def _format_size(size):
+    for unit, scale in (('GB', 1 << 30), ('MB', 1 << 20), ('KB', 1 << 10)):
+        if size >= scale:
+            return f"{size / scale:.2f}{unit}"
+    return f"{size}B"
+
+
+def _stats_row(label, values):
+    """`time for request:  min  max  mean  sd  +/- sd` row of the h2load summary"""
+    values = np.asarray(values, dtype=float)
+    mean, sd = values.mean(), values.std()
+    within = np.mean(np.abs(values - mean) <= sd) * 100
+    cells = [format_duration(v) for v in (values.min(), values.max(), mean, sd)]
+    return f"{label}{cells[0]:>10}  {cells[1]:>10}  {cells[2]:>10}  {cells[3]:>10}  {within:>8.2f}%\n"
+
+
+def h2load_summary(protocol, requests, clients, threads, elapsed_s, durations_us, rtt_s, request_bytes=200,
+                   response_bytes=600):
+    """h2load console output for a simulated run (what parse_summary / parse_throughput read)"""
+    done = len(durations_us)
+    traffic = done * (response_bytes + 40)
+    lines = ["starting benchmark...\n"]
+    per_thread = math.ceil(clients / threads)
+    for thread in range(threads):
+        lines.append(f"spawning thread #{thread}: {min(per_thread, clients - thread * per_thread)} total client(s). "
+                     f"{requests // threads} total requests\n")
+    lines.append("TLS Protocol: TLSv1.3\nCipher: TLS_AES_128_GCM_SHA256\nServer Temp Key: X25519 253 bits\n")
+    lines.append(f"Application protocol: {'h2' if protocol == 'http2' else 'h3'}\n")
+    for percent in range(10, 101, 10):
+        lines.append(f"progress: {percent}% done\n")
+    lines.append("\n")
+    lines.append(f"finished in {format_duration(elapsed_s)}, {done / elapsed_s:.2f} req/s, "
+                 f"{_format_size(int(traffic / elapsed_s))}/s\n")
+    lines.append(f"requests: {requests} total, {requests} started, {done} done, {done} succeeded, "
+                 f"{requests - done} failed, {requests - done} errored, 0 timeout\n")
+    lines.append(f"status codes: {done} 2xx, 0 3xx, 0 4xx, 0 5xx\n")
+    lines.append(f"traffic: {_format_size(traffic)} ({traffic}) total, {_format_size(done * 40)} ({done * 40}) headers "
+                 f"(space savings 80.00%), {_format_size(done * response_bytes)} ({done * response_bytes}) data\n")
+    lines.append("                     min         max         mean         sd        +/- sd\n")
+    durations_s = np.asarray(durations_us) / 1e6
+    lines.append(_stats_row("time for request:  ", durations_s))
+    handshake = np.full(clients, rtt_s * (2 if protocol == 'http2' else 1))
+    lines.append(_stats_row("time for connect:  ", handshake))
+    lines.append(_stats_row("time to 1st byte:  ", handshake + durations_s[:clients]))
+    per_client = np.full(clients, done / clients / elapsed_s)
+    lines.append(f"req/s           : {per_client.min():>10.2f}  {per_client.max():>10.2f}  "
+                 f"{per_client.mean():>10.2f}  {per_client.std():>10.2f}  {100.0:>8.2f}%\n")
+    return ''.join(lines)
+
+
+class SimulatedNetwork:
+    """One simulated client/router/server stack: router qdisc state, client files and the model"""
+
+    def __init__(self, name='default', model=None, seed=None, time_scale=0.0):
+        self.name = name
+        self.model = model or LinkModel()
+        self.seed = seed
+        self.time_scale = time_scale  # >0: 実行時間 × time_scale だけ実際に待つ (レーンの重なりの確認用)
+        self.qdiscs = {}  # dev -> {'delay': ms, 'loss': %, 'rate': Mbps}
+        self.files = {}  # client container path -> bytes
+        self._runs = {}  # (protocol, qdisc) -> 実行回数 (実行ごとのシード)
+        self._clock_us = VIRTUAL_EPOCH_US
+        self._lock = threading.Lock()
+
+    # --- tc -------------------------------------------------------------------------------
+
+    def tc(self, args):
+        """Emulate `tc qdisc {show|add|replace|change|del} dev DEV root [netem ...]`"""
+        json_output = args[:1] == ['-j']
+        args = args[1:] if json_output else args
+        if len(args) < 4 or args[0] != 'qdisc' or args[2] != 'dev':
+            return 1, '', f"simulated tc: unsupported arguments {args}\n"
+        action, dev = args[1], args[3]
+        with self._lock:
+            current = self.qdiscs.get(dev)
+            if action == 'show':
+                return 0, self._show(dev, current, json_output), ''
+            if action == 'del':
+                if current is None:
+                    return 2, '', "Error: Cannot delete qdisc with handle of zero.\n"
+                del self.qdiscs[dev]
+                return 0, '', ''
+            if action == 'change' and current is None:
+                return 2, '', "Error: Qdisc not found. To create specify NLM_F_CREATE flag.\n"
+            if action == 'add' and current is not None:
+                return 2, '', "Error: Exclusivity flag on, cannot modify.\n"
+            if action not in ('add', 'replace', 'change'):
+                return 1, '', f"simulated tc: unsupported action {action}\n"
+            try:
+                self.qdiscs[dev] = self._parse_netem(args[4:])
+            except ValueError as e:
+                return 1, '', f"simulated tc: {e}\n"
+            return 0, '', ''
+
+    @staticmethod
+    def _parse_netem(args):
+        if args[:2] != ['root', 'netem']:
+            raise ValueError(f"only root netem qdiscs are simulated: {args}")
+        settings = {'delay': 0.0, 'loss': 0.0, 'rate': 0.0}
+        options = iter(args[2:])
+        for option in options:
+            value = next(options, '')
+            if option == 'delay':
+                settings['delay'] = float(value.removesuffix('ms'))
+            elif option == 'loss':
+                settings['loss'] = float(value.removesuffix('%'))
+            elif option == 'rate':
+                settings['rate'] = float(value.removesuffix('mbit'))
+            else:
+                raise ValueError(f"unsupported netem option {option}")
+        return settings
+
+    @staticmethod
+    def _show(dev, qdisc, json_output):
+        if qdisc is None:
+            if json_output:
+                return json.dumps([{'kind': 'noqueue', 'handle': '0:', 'root': True, 'refcnt': 2, 'options': {}}])
+            return "qdisc noqueue 0: root refcnt 2\n"
+        if json_output:
+            options = {'limit': 1000, 'delay': {'delay': qdisc['delay'] / 1000, 'jitter': 0, 'correlation': 0},
+                       'loss-random': {'loss': qdisc['loss'] / 100, 'correlation': 0}, 'ecn': False, 'gap': 0}
+            if qdisc['rate']:
+                options['rate'] = {'rate': int(qdisc['rate'] * 1e6 / 8), 'packetoverhead': 0, 'cellsize': 0,
+                                   'celloverhead': 0}
+            return json.dumps([{'kind': 'netem', 'handle': '8001:', 'root': True, 'refcnt': 2, 'options': options}])
+        text = (f"qdisc netem 8001: dev {dev} root refcnt 2 limit 1000 "
+                f"delay {qdisc['delay']:g}ms loss {qdisc['loss']:g}%")
+        if qdisc['rate']:
+            text += f" rate {qdisc['rate']:g}Mbit"
+        return text + "\n"
+
+    # --- h2load ---------------------------------------------------------------------------
+
+    def h2load(self, args):
+        """Emulate one h2load run; returns (returncode, records text, summary text, log-file path)"""
+        options = {'-n': '1', '-c': '1', '-t': '1', '-m': '1'}
+        log_file = None
+        protocol = 'http2'
+        url = None
+        items = iter(args)
+        for arg in items:
+            if arg in options:
+                options[arg] = next(items, '1')
+            elif arg.startswith('--log-file='):
+                log_file = arg.split('=', 1)[1]
+            elif arg.startswith('--alpn-list='):
+                protocol = 'http3' if arg.split('=', 1)[1].startswith('h3') else 'http2'
+            elif not arg.startswith('-'):
+                url = arg
+        if url is None:
+            return 1, '', "simulated h2load: no URI given\n", None
+        requests, clients, threads, streams = (int(options[k]) for k in ('-n', '-c', '-t', '-m'))
+        clients = max(1, min(clients, requests))
+        threads = max(1, min(threads, clients))
+
+        with self._lock:
+            # ルーターの netem (既定 eth0) を経由する前提
+            qdisc = dict(self.qdiscs.get('eth0') or {'delay': 0.0, 'loss': 0.0, 'rate': 0.0})
+            key = (protocol, tuple(sorted(qdisc.items())), requests, clients, streams)
+            index = self._runs[key] = self._runs.get(key, 0) + 1
+            start_us = self._clock_us if self.seed is not None else int(time.time() * 1e6)
+        rng = np.random.default_rng(self._run_seed(key, index))
+        offsets, durations, elapsed_s = self.model.simulate(protocol, requests, clients, streams, qdisc['delay'],
+                                                            qdisc['loss'], qdisc['rate'], rng)
+        with self._lock:
+            self._clock_us += int(elapsed_s * 1e6) + 1_000_000
+        if self.time_scale:
+            time.sleep(elapsed_s * self.time_scale)
+
+        order = np.argsort(offsets, kind='stable')
+        records = io.StringIO()
+        for offset, duration in zip(offsets[order], durations[order]):
+            records.write(f"{start_us + int(offset)}\t200\t{int(duration)}\n")
+        rtt_s = (self.model.base_rtt_ms + qdisc['delay']) / 1000.0
+        summary = h2load_summary(protocol, requests, clients, threads, elapsed_s, durations, rtt_s,
+                                 response_bytes=self.model.response_bytes)
+        return 0, records.getvalue(), summary, log_file
+
+    def _run_seed(self, key, index):
+        if self.seed is None:
+            return None
+        material = json.dumps([self.seed, self.name, key, index], default=str).encode()
+        return int.from_bytes(hashlib.sha256(material).digest()[:8], 'little')
+
+
+class SimulatedStream:
+    """Same interface as container_agent.StreamedCommand for a generated output"""
+
+    def __init__(self, args, lines, returncode, stderr=''):
+        self.args = args
+        self._lines = lines
+        self._returncode = returncode
+        self._stderr = stderr
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    def wait(self, check=False):
+        result = subprocess.CompletedProcess(self.args, self._returncode, '', self._stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class SimulatedAgent:
+    """Same interface as container_agent.ContainerAgent, backed by a SimulatedNetwork"""
+
+    def __init__(self, network, container):
+        self.network = network
+        self.container = container
+
+    def _execute(self, args):
+        """(returncode, stdout, stderr) of a command; h2load log records go to stdout with /dev/stdout"""
+        with stage_profiler.command(args):
+            return self._simulate(args)
+
+    def _simulate(self, args):
+        argv = shlex.split(args) if isinstance(args, str) else [str(a) for a in args]
+        command = argv[0] if argv else ''
+        if command == 'tc':
+            return self.network.tc(argv[1:])
+        if command == 'h2load':
+            returncode, records, summary, log_file = self.network.h2load(argv[1:])
+            if log_file in (None, '/dev/stdout'):
+                # 実物と同様に記録行はサマリーの前に出力される
+                split = summary.index('\nfinished in') + 1 if '\nfinished in' in summary else 0
+                return returncode, summary[:split] + (records if log_file else '') + summary[split:], ''
+            self.network.files[log_file] = records.encode()
+            return returncode, summary, ''
+        if command == 'rm':
+            for path in argv[1:]:
+                self.network.files.pop(path, None)
+            return 0, '', ''
+        if command == 'cat':
+            paths = [p for p in argv[1:] if p != '--']
+            if not all(p in self.network.files for p in paths):
+                return 1, '', f"cat: {paths[0]}: No such file or directory\n"
+            return 0, b''.join(self.network.files[p] for p in paths), ''
+        if command in ('true', 'sync', 'ip', 'sleep'):
+            return 0, '', ''
+        return NOT_SIMULATED_EXIT_CODE, '', f"{command}: not simulated\n"
+
+    def run(self, args, timeout=None, check=False, text=True):
+        returncode, stdout, stderr = self._execute(args)
+        if isinstance(stdout, str) and not text:
+            stdout = stdout.encode()
+        elif isinstance(stdout, bytes) and text:
+            stdout = stdout.decode(errors='replace')
+        result = subprocess.CompletedProcess(args, returncode, stdout, stderr if text else stderr.encode())
+        if check:
+            result.check_returncode()
+        return result
+
+    def stream(self, args, timeout=None):
+        returncode, stdout, stderr = self._execute(args)
+        return SimulatedStream(args, stdout.splitlines(keepends=True), returncode, stderr)
+
+    def read_file(self, path):
+        return self.run(['cat', '--', str(path)], check=True, text=False).stdout
+
+    def copy_to_host(self, path, dest):
+        with open(dest, 'wb') as f:
+            f.write(self.read_file(path))
+
+    def close(self):
+        pass
+
+
+_networks = {}
+_networks_lock = threading.Lock()
+_settings = {'seed': None, 'time_scale': 0.0}
+
+
+def configure(seed=None, time_scale=0.0):
+    """Seed and pacing of simulated networks created from now on"""
+    _settings.update(seed=seed, time_scale=time_scale)
+
+
+def get_network(name):
+    """Shared simulated stack per testbed name"""
+    with _networks_lock:
+        if name not in _networks:
+            _networks[name] = SimulatedNetwork(name, seed=_settings['seed'], time_scale=_settings['time_scale'])
+        return _networks[name]
+
+
+def get_simulated_agent(testbed_name, container):
+    return SimulatedAgent(get_network(testbed_name), container)
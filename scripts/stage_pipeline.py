@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Content-addressed stage pipeline for benchmark analysis
+Each stage declares its inputs (upstream stages), parameters and the code it
+depends on. A stage's cache key is a hash of those, so changing a parameter or
+a function only recomputes that stage and everything downstream of it; cached
+stages are loaded lazily and only when a stage that has to run needs them.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+import stage_profiler
+
+CACHE_DIR = '.pipeline_cache'
+
+
+def hash_files(paths, chunk_size=1 << 20):
+    """Content digest of a list of files (order-sensitive)"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(str(path).encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _code_digest(funcs):
+    digest = hashlib.sha256()
+    for func in funcs:
+        try:
+            digest.update(inspect.getsource(func).encode())
+        except (OSError, TypeError):
+            digest.update(getattr(func, '__qualname__', repr(func)).encode())
+    return digest.hexdigest()
+
+
+class Stage:
+    """One pipeline step: func(**inputs, **params) -> picklable value"""
+
+    def __init__(self, name, func, inputs, params, code, fingerprint, outputs):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = dict(params or {})
+        self.code = (func,) + tuple(code)
+        self.fingerprint = fingerprint  # callable returning a digest of external inputs (raw files)
+        self.outputs = outputs  # True: value is a list of files that must be unchanged on a cache hit
+
+
+class Pipeline:
+    """Stages registered in dependency order, evaluated on demand with an on-disk cache"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.stages = {}
+        self.keys = {}
+        self.values = {}
+
+    def stage(self, name, inputs=(), params=None, code=(), fingerprint=None, outputs=False):
+        """Decorator registering a stage; inputs must name stages registered before it"""
+        def register(func):
+            unknown = [i for i in inputs if i not in self.stages]
+            if unknown:
+                raise ValueError(f"stage {name}: unknown inputs {unknown}")
+            self.stages[name] = Stage(name, func, inputs, params, code, fingerprint, outputs)
+            return func
+        return register
+
+    def _compute_keys(self):
+        self.keys = {}
+        for name, stage in self.stages.items():
+            material = {
+                'stage': name,
+                'code': _code_digest(stage.code),
+                'params': stage.params,
+                'inputs': [self.keys[i] for i in stage.inputs],
+                'fingerprint': stage.fingerprint() if stage.fingerprint else None,
+            }
+            self.keys[name] = hashlib.sha256(
+                json.dumps(material, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _cache_file(self, name):
+        return self.cache_dir / f"{name}-{self.keys[name][:16]}.pkl"
+
+    def _load_cached(self, stage):
+        cache_file = self._cache_file(stage.name)
+        if not cache_file.exists():
+            return False, None
+        with open(cache_file, 'rb') as f:
+            value = pickle.load(f)
+        if stage.outputs:
+            # 出力ファイルは別のキーの実行で上書きされ得るので内容も照合する
+            files, digest = value
+            if digest is None or not all(Path(p).exists() for p in files) or hash_files(files) != digest:
+                return False, None
+            value = files
+        return True, value
+
+    def _store(self, stage, value):
+        # 一時ファイル経由で書き込み (中断時に壊れたキャッシュを残さない)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if stage.outputs:
+            # ファイル以外 (PDF のページなど) を返した場合は毎回再実行
+            value = (value, hash_files(value) if all(Path(p).is_file() for p in value) else None)
+        fd, tmp_path = tempfile.mkstemp(prefix=stage.name, suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._cache_file(stage.name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def value(self, name):
+        """Value of a stage, from cache when its key is unchanged"""
+        if name in self.values:
+            return self.values[name]
+        stage = self.stages[name]
+        hit, value = self._load_cached(stage)
+        if hit:
+            print(f"  [{name}] cached ({self.keys[name][:12]})")
+        else:
+            inputs = {i: self.value(i) for i in stage.inputs}
+            start = time.perf_counter()
+            with stage_profiler.stage(f"pipeline.{name}"):
+                value = stage.func(**inputs, **stage.params)
+            print(f"  [{name}] computed in {time.perf_counter() - start:.2f}s ({self.keys[name][:12]})")
+            self._store(stage, value)
+        self.values[name] = value
+        return value
+
+    def run(self, targets=None):
+        """Evaluate the target stages (default: the final ones) and return {name: value}"""
+        self._compute_keys()
+        self.values = {}
+        if targets is None:
+            targets = [name for name in self.stages
+                       if not any(name in stage.inputs for stage in self.stages.values())]
+        return {name: self.value(name) for name in targets}
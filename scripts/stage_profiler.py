@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Stage profiler for the analysis and orchestration scripts
+With --profile every instrumented stage (pipeline stages, bench/post lanes,
+figure rendering) gets its own cProfile, and wall/CPU time is recorded per
+stage and per external command (docker exec, h2load, tc). A sampling thread
+also records the Python stacks of the threads inside a stage, written as
+collapsed stacks for flamegraph.pl / speedscope. Results go to <output>/profile/:
+  <name>.pstats            cProfile of all stages (python -m pstats)
+  <name>.<stage>.pstats    cProfile of one stage (time spent in nested stages excluded)
+  <name>.collapsed         "stage;frame;frame count" lines
+  <name>_timings.tsv       wall / CPU per stage and per external command
+With --profile_memory tracemalloc and the process peak RSS are tracked per stage
+instead (or as well), and the top allocating call sites of each stage go to
+  <name>_memory.txt        traced peak, RSS and call sites per stage
+Without either option the hooks are no-ops.
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import re
+import resource
+import shlex
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+PROFILE_DIR = 'profile'
+SAMPLE_INTERVAL = 0.005  # 5ms
+SCRIPT_DIR = str(Path(__file__).resolve().parent)
+TRACE_FRAMES = 1  # 既定のトレースバックの深さ (深いほど pandas 内部の割り当ても呼び出し元まで辿れるが遅い)
+PEAK_SNAPSHOT_INTERVAL = 2.0  # ピーク時スナップショットの最短間隔 (秒)
+PEAK_GROWTH = 0.25  # 前回のスナップショットからこの割合 + 4MB 以上増えたらピークとして取り直す
+TOP_SITES = 10
+MB = 1024 * 1024
+
+
+class _CommandTimer:
+    """Timing of one external command, stopped when the command has finished"""
+
+    def __init__(self, profiler, label):
+        self.profiler = profiler
+        self.label = label
+        self._wall = time.perf_counter()
+        self._children = _children_cpu()
+        self._frames = profiler._push(f"[exec {label}]")
+
+    def stop(self):
+        if self.profiler is None:
+            return
+        self.profiler._pop(self._frames)
+        self.profiler._add('command', self.label, time.perf_counter() - self._wall, _children_cpu() - self._children)
+        self.profiler = None
+
+
+def _children_cpu():
+    # docker exec / 子プロセスの CPU (常駐エージェント経由のコマンドはコンテナ側なので含まれない)
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def command_label(args):
+    """Short name of a command: the program (e.g. 'h2load', 'tc', 'docker exec')"""
+    argv = shlex.split(args) if isinstance(args, str) else [str(a) for a in args]
+    if not argv:
+        return '?'
+    name = os.path.basename(argv[0])
+    if name == 'docker':
+        sub = next((a for a in argv[1:] if not a.startswith('-')), '')
+        return f"docker {sub}".strip()
+    return name
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KiB
+
+
+def _call_site(frames):
+    """Innermost frame in scripts/ (the repo code that caused a library allocation)
+
+    frames: (filename, lineno) pairs from the most recent frame, as tracemalloc stores them.
+    """
+    for filename, lineno in frames:
+        if filename.startswith(SCRIPT_DIR) and filename != __file__:
+            return f"{Path(filename).name}:{lineno}"
+    filename, lineno = frames[0]
+    return f"{filename}:{lineno}"
+
+
+def _group_traces(snapshot):
+    """{raw traceback: live bytes} of a snapshot"""
+    # Snapshot.statistics / filter_traces は割り当てごとに Python オブジェクトを作るので
+    # 数百万件のヒープでは 10 秒以上かかる。生のタプル (domain, size, frames, ...) を直接集計する
+    traces = getattr(snapshot.traces, '_traces', None)
+    if traces is None:
+        return {tuple((f.filename, f.lineno) for f in reversed(stat.traceback)): stat.size
+                for stat in snapshot.statistics('traceback')}
+    sizes = {}
+    for trace in traces:
+        sizes[trace[2]] = sizes.get(trace[2], 0) + trace[1]
+    return sizes
+
+
+class StageProfiler:
+    """cProfile per stage, wall/CPU timings, sampled stacks and (optionally) memory for one script run"""
+
+    def __init__(self, output_dir, name, sample_interval=SAMPLE_INTERVAL, cpu=True, memory=0):
+        self.output_dir = Path(output_dir) / PROFILE_DIR
+        self.name = name
+        self.sample_interval = sample_interval
+        self.cpu = cpu
+        self.memory = memory
+        self.timings = {}  # (kind, label) -> [count, wall, cpu]
+        self.profiles = {}  # stage -> [cProfile.Profile]
+        self.samples = Counter()
+        self.memory_stats = {}  # stage -> {'calls', 'peak', 'rss', 'rss_growth', 'sites': Counter}
+        self._memory_active = []  # 実行中のステージのメモリ状態
+        self._snapshot = None  # (traced size, sites): ヒープがほぼ同じなら次のステージでも再利用
+        self._snapshot_time = 0.0
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(memory)  # memory: traceback frames per allocation
+        self._local = threading.local()
+        self._frames = {}  # thread ident -> [stage / command labels]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name='stage-profiler', daemon=True)
+        self._started = time.perf_counter()
+        self._sampler.start()
+
+    # --- bookkeeping ----------------------------------------------------------------------
+
+    def _push(self, label):
+        with self._lock:
+            frames = self._frames.setdefault(threading.get_ident(), [])
+            frames.append(label)
+        return frames
+
+    def _pop(self, frames):
+        with self._lock:
+            frames.pop()
+            if not frames:
+                self._frames.pop(threading.get_ident(), None)
+
+    def _add(self, kind, label, wall, cpu):
+        with self._lock:
+            timing = self.timings.setdefault((kind, label), [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += wall
+            timing[2] += cpu
+
+    # --- stages and commands --------------------------------------------------------------
+
+    @contextmanager
+    def stage(self, name):
+        """Profile a block as stage `name` (nested stages get their own profile)"""
+        stack = self._local.__dict__.setdefault('profiles', [])
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            parent.disable()
+        profile = cProfile.Profile() if self.cpu else None
+        try:
+            if profile is not None:
+                profile.enable()
+        except ValueError:
+            # 別のプロファイラ (デバッガ等) が有効な場合は時間のみ記録
+            profile = None
+        stack.append(profile)
+        frames = self._push(name)
+        memory = self._memory_enter() if self.memory else None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            if memory is not None:
+                self._memory_exit(name, memory)
+            self._pop(frames)
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    self.profiles.setdefault(name, []).append(profile)
+            if parent is not None:
+                parent.enable()
+            self._add('stage', name, wall, cpu)
+
+    # --- memory ---------------------------------------------------------------------------
+    # tracemalloc はプロセス全体で 1 つなので、ステージの出入りのたびに peak を実行中の
+    # 全ステージへ配ってから reset_peak する (並行するレーンの割り当ても含まれる)
+
+    def _update_peaks(self):
+        current, peak = tracemalloc.get_traced_memory()
+        for state in self._memory_active:
+            state['peak'] = max(state['peak'], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _site_sizes(self):
+        """Live bytes per call site; the snapshot is grouped and dropped right away"""
+        grouped = _group_traces(tracemalloc.take_snapshot())
+        sites = Counter()
+        for frames, size in grouped.items():
+            # プロファイラ自身と tracemalloc の割り当て (最も内側のフレーム) は数えない
+            if frames and frames[0][0] not in (__file__, tracemalloc.__file__):
+                sites[_call_site(frames)] += size
+        return sites
+
+    def _take_snapshot(self, reuse=True):
+        """Heap by call site; the previous one is reused while the heap is within 1MB + 5% of it"""
+        current = tracemalloc.get_traced_memory()[0]
+        cached = self._snapshot
+        if reuse and cached and abs(current - cached[0]) < cached[0] * 0.05 + MB:
+            return cached[1]
+        sites = self._site_sizes()
+        self._snapshot = (current, sites)
+        self._snapshot_time = time.monotonic()
+        return sites
+
+    def _memory_enter(self):
+        sites = self._take_snapshot()
+        with self._lock:
+            current = self._update_peaks()
+            state = {'start': sites, 'base': current, 'peak': current, 'peak_sites': None,
+                     'snapshot_at': current, 'rss': _max_rss_mb()}
+            self._memory_active.append(state)
+        return state
+
+    def _memory_exit(self, name, state):
+        with self._lock:
+            self._update_peaks()
+            self._memory_active.remove(state)
+        # 最大使用時に近いスナップショット (サンプラーが取得) と開始時の差分 = ピーク時に生きていた割り当て
+        end = state['peak_sites'] or self._take_snapshot()
+        sites = end - state['start']  # 増えた呼び出し元だけ残る
+        state['start'] = state['peak_sites'] = None
+        rss = _max_rss_mb()
+        with self._lock:
+            entry = self.memory_stats.setdefault(name, {'calls': 0, 'peak': 0, 'rss': 0.0, 'rss_growth': 0.0,
+                                                        'sites': Counter()})
+            entry['calls'] += 1
+            entry['peak'] = max(entry['peak'], state['peak'] - state['base'])
+            entry['rss'] = max(entry['rss'], rss)
+            entry['rss_growth'] = max(entry['rss_growth'], rss - state['rss'])
+            for site, size in sites.items():
+                entry['sites'][site] = max(entry['sites'][site], size)
+
+    def _sample_memory(self):
+        """Snapshot the heap when a running stage clearly grows past its last snapshot (rate-limited)"""
+        with self._lock:
+            current, peak = tracemalloc.get_traced_memory()
+            for state in self._memory_active:
+                state['peak'] = max(state['peak'], peak)
+            if time.monotonic() - self._snapshot_time < PEAK_SNAPSHOT_INTERVAL:
+                return
+            rising = [state for state in self._memory_active
+                      if current > state['snapshot_at'] * (1 + PEAK_GROWTH) + 4 * MB]
+        if rising:
+            sites = self._take_snapshot(reuse=False)
+            for state in rising:
+                state['peak_sites'], state['snapshot_at'] = sites, current
+
+    def start_command(self, args):
+        return _CommandTimer(self, command_label(args))
+
+    # --- stack sampling -------------------------------------------------------------------
+
+    def _sample(self):
+        while not self._stop.wait(self.sample_interval):
+            if self.memory:
+                self._sample_memory()
+            if not self.cpu:
+                continue
+            current = sys._current_frames()
+            with self._lock:
+                active = {ident: list(labels) for ident, labels in self._frames.items()}
+            for ident, labels in active.items():
+                frame = current.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                # ステージ名を根、コマンド待ちを葉に置く
+                stages = [label for label in labels if not label.startswith('[exec')]
+                waits = [label for label in labels if label.startswith('[exec')]
+                self.samples[';'.join(stages + stack[::-1] + waits[-1:])] += 1
+
+    # --- output ---------------------------------------------------------------------------
+
+    def write(self):
+        """Stop sampling and write pstats, collapsed stacks, the timing table and the memory report"""
+        self._stop.set()
+        self._sampler.join()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        total = time.perf_counter() - self._started
+        outputs = self._write_cpu() if self.cpu else []
+
+        timings = self.output_dir / f"{self.name}_timings.tsv"
+        with open(timings, 'w', encoding='utf-8') as f:
+            f.write("kind\tname\tcount\twall_s\tcpu_s\n")
+            for (kind, label), (count, wall, cpu) in sorted(self.timings.items()):
+                f.write(f"{kind}\t{label}\t{count}\t{wall:.6f}\t{cpu:.6f}\n")
+        outputs.append(timings)
+
+        print(f"\nProfile ({total:.1f}s wall): stage / command        count     wall(s)      cpu(s)")
+        for (kind, label), (count, wall, cpu) in sorted(self.timings.items(), key=lambda item: -item[1][1])[:15]:
+            name = label if kind == 'stage' else f"[exec] {label}"
+            print(f"  {name:<34} {count:>6} {wall:>11.2f} {cpu:>11.2f}")
+        if self.memory:
+            outputs += self._write_memory()
+            tracemalloc.stop()
+        for path in outputs:
+            print(f"  {path}")
+        return outputs
+
+    def _write_cpu(self):
+        outputs = []
+        for stale in self.output_dir.glob(f"{self.name}.*.pstats"):
+            stale.unlink()  # 前回の実行のステージ別ファイル
+        combined = None
+        for stage, profiles in sorted(self.profiles.items()):
+            stats = pstats.Stats(*profiles)
+            stats.dump_stats(self.output_dir / f"{self.name}.{re.sub(r'[^A-Za-z0-9_.-]', '_', stage)}.pstats")
+            if combined is None:
+                combined = pstats.Stats(*profiles)
+            else:
+                combined.add(*profiles)
+        if combined is not None:
+            combined.dump_stats(self.output_dir / f"{self.name}.pstats")
+            outputs.append(self.output_dir / f"{self.name}.pstats")
+
+        collapsed = self.output_dir / f"{self.name}.collapsed"
+        with open(collapsed, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        outputs.append(collapsed)
+        return outputs
+
+    def _write_memory(self):
+        report = self.output_dir / f"{self.name}_memory.txt"
+        by_peak = sorted(self.memory_stats.items(), key=lambda item: -item[1]['peak'])
+        with open(report, 'w', encoding='utf-8') as f:
+            f.write("# traced peak: tracemalloc peak above the stage's starting heap (includes concurrent lanes)\n")
+            f.write("# rss: process peak RSS (ru_maxrss) at the end of the stage, "
+                    "growth: its increase during the stage\n")
+            f.write("# call sites: allocations alive near the stage's peak, by the innermost frame in scripts/\n")
+            for stage, entry in by_peak:
+                f.write(f"\n[{stage}] calls={entry['calls']} traced_peak={entry['peak'] / MB:.1f}MB "
+                        f"rss={entry['rss']:.1f}MB growth={entry['rss_growth']:.1f}MB\n")
+                for site, size in entry['sites'].most_common(TOP_SITES):
+                    if size >= MB / 100:  # 0.00 MB と表示されるものは省く
+                        f.write(f"  {size / MB:>10.2f} MB  {site}\n")
+        print("\nMemory: stage                        calls  traced peak(MB)     RSS(MB)  top call site")
+        for stage, entry in by_peak[:15]:
+            top = entry['sites'].most_common(1)
+            site = f"{top[0][0]} ({top[0][1] / MB:.1f}MB)" if top else ''
+            print(f"  {stage:<34} {entry['calls']:>6} {entry['peak'] / MB:>16.1f} {entry['rss']:>11.1f}  {site}")
+        return [report]
+
+
+_profiler = None
+
+
+def enable(output_dir, name, cpu=True, memory=0):
+    """Start profiling this process; hooks record into the returned profiler"""
+    global _profiler
+    _profiler = StageProfiler(output_dir, name, cpu=cpu, memory=memory)
+    return _profiler
+
+
+def finish():
+    """Write the profile and turn the hooks back into no-ops"""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler.write() if profiler else []
+
+
+def stage(name):
+    """Context manager marking a stage (no-op unless profiling)"""
+    return _profiler.stage(name) if _profiler else nullcontext()
+
+
+def staged(name):
+    """Decorator running every call of a function as stage `name`"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class _NoCommand:
+    def stop(self):
+        pass
+
+
+def start_command(args):
+    """Timer for an external command that outlives a with-block (call .stop() when it ends)"""
+    return _profiler.start_command(args) if _profiler else _NoCommand()
+
+
+@contextmanager
+def command(args):
+    """Context manager timing one external command (no-op unless profiling)"""
+    timer = start_command(args)
+    try:
+        yield
+    finally:
+        timer.stop()
+
+
+@contextmanager
+def profiling(enabled, output_dir, name, memory=0):
+    """Profile the enclosed script run as stage `name`
+
+    enabled: cProfile, timings and stack samples; memory: tracemalloc frames per allocation (0: off)
+    """
+    if not (enabled or memory):
+        yield None
+        return
+    profiler = enable(output_dir, name, cpu=enabled, memory=memory)
+    try:
+        with profiler.stage(name):
+            yield profiler
+    finally:
+        finish()
+
+
+def add_profile_argument(parser):
+    """Add the shared --profile and --profile_memory options to an argparse parser"""
+    parser.add_argument('--profile', action='store_true',
+                        help='Write per-stage cProfile, wall/CPU timings and collapsed stacks to '
+                             f'<output>/{PROFILE_DIR}/')
+    parser.add_argument('--profile_memory', type=int, nargs='?', const=TRACE_FRAMES, default=0, metavar='FRAMES',
+                        help='Track tracemalloc peaks, peak RSS and the top allocating call sites per stage, '
+                             f'keeping FRAMES frames per allocation (default {TRACE_FRAMES}; 1 is fastest, '
+                             'more frames trace library allocations back to the calling script)')
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+In-process system sampler writing compact binary traces
+A daemon thread reads /proc/stat, /proc/meminfo, /proc/net/dev and /proc/net/snmp
+at a fixed rate (default 20 Hz) through file descriptors opened once, packs each
+sample into a fixed-width little-endian record in a preallocated ring buffer, and
+appends half a ring at a time to system_trace_<time>.bin in the log directory.
+The file starts with a JSON header describing the record layout, so the read
+side is a single np.fromfile with the matching dtype (no text parsing). When an
+interface appears or disappears (e.g. a container's veth) the sampler continues
+in system_trace_<time>_<n>.bin with the new interface list.
+
+Counters are stored raw (jiffies, bytes, packets, segments); trace_frames()
+turns them into the system_monitor / network_stats frames that
+analyze_monitoring_data.py reads from the shell samplers' CSV files.
+
+The hooks are no-ops until start() is called, like metrics_exporter.
+
+  system_sampler.py record logs/campaign --hz 20 --duration 10
+  system_sampler.py show logs/campaign/system_trace_20250101_000000.bin [--csv]
+"""
+
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+MAGIC = b'H2TRACE1'
+DEFAULT_HZ = 20  # 50 Hz でも動くが、1 コアの 1% 前後になる
+RING_RECORDS = 256  # リングバッファの容量 (レコード数)、半分たまるごとに書き出す
+TRACE_GLOB = 'system_trace_*.bin'
+
+CPU_FIELDS = ('cpu_user', 'cpu_nice', 'cpu_system', 'cpu_idle', 'cpu_iowait', 'cpu_irq', 'cpu_softirq', 'cpu_steal')
+MEMORY_FIELDS = ('mem_total_kb', 'mem_available_kb')
+# /proc/net/snmp の (行, 列) -> フィールド
+SNMP_FIELDS = {('Tcp', 'OutSegs'): 'tcp_out_segs', ('Tcp', 'RetransSegs'): 'tcp_retrans_segs',
+               ('Udp', 'InErrors'): 'udp_in_errors', ('Udp', 'RcvbufErrors'): 'udp_rcvbuf_errors',
+               ('Udp', 'SndbufErrors'): 'udp_sndbuf_errors'}
+# /proc/net/dev の列番号 -> network_stats.csv の列名
+NET_DEV_COLUMNS = {0: 'rx_bytes', 1: 'rx_packets', 2: 'rx_errors', 3: 'rx_drop',
+                   8: 'tx_bytes', 9: 'tx_packets', 10: 'tx_errors', 11: 'tx_drop'}
+# docker のコンテナ cgroup (systemd ドライバ / cgroupfs ドライバ / cgroup v1)
+DOCKER_CGROUP_DIRS = ('/sys/fs/cgroup/system.slice', '/sys/fs/cgroup/docker', '/sys/fs/cgroup/cpu/docker')
+
+
+def _is_container_cgroup(name):
+    return (name.startswith('docker-') and name.endswith('.scope')) or len(name) == 64
+
+
+class _ProcReader:
+    """Open /proc files once and read each with a single pread per sample"""
+
+    def __init__(self):
+        self.stat = os.open('/proc/stat', os.O_RDONLY)
+        self.meminfo = os.open('/proc/meminfo', os.O_RDONLY)
+        self.net_dev = os.open('/proc/net/dev', os.O_RDONLY)
+        self.snmp = os.open('/proc/net/snmp', os.O_RDONLY)
+        self._index_interfaces(self._read(self.net_dev).split(b'\n')[2:-1])
+        # 行・列の位置は起動時に一度だけ求め、サンプルごとには該当部分だけ split する
+        tokens = self._read(self.meminfo, 256).split()
+        self.memory_index = (tokens.index(b'MemTotal:') + 1,
+                             tokens.index(b'MemAvailable:' if b'MemAvailable:' in tokens else b'MemFree:') + 1)
+        self.snmp_index, self.snmp_fields = [], []
+        lines = self._read(self.snmp).splitlines()
+        for line, header in enumerate(lines[::2]):
+            section, *names = header.decode().split()
+            for column, name in enumerate(names):
+                if (section.rstrip(':'), name) in SNMP_FIELDS:
+                    self.snmp_index.append((line * 2 + 1, column + 1))
+                    self.snmp_fields.append(SNMP_FIELDS[(section.rstrip(':'), name)])
+        self.docker_dir = next((d for d in DOCKER_CGROUP_DIRS if os.path.isdir(d)), None)
+        self._containers = -1
+        self._containers_at = 0.0
+
+    @staticmethod
+    def _read(fd, size=65536):
+        return os.pread(fd, size, 0)
+
+    def _index_interfaces(self, lines):
+        # 各行の先頭 ("  eth0:") を覚えておき、サンプルごとは先頭の一致だけ確かめる
+        self._prefixes = [line[:line.index(b':') + 1] for line in lines]
+        self.interfaces = [prefix[:-1].strip().decode() for prefix in self._prefixes]
+
+    def fields(self):
+        """Record field names and struct codes, fixed for the lifetime of the sampler"""
+        fields = [('time', 'd')] + [(name, 'Q') for name in CPU_FIELDS + MEMORY_FIELDS]
+        fields += [(name, 'Q') for name in self.snmp_fields]
+        fields.append(('docker_containers', 'i'))
+        fields += [(f'{interface}/{column}', 'Q') for interface in self.interfaces
+                   for column in NET_DEV_COLUMNS.values()]
+        return fields
+
+    def containers(self, now):
+        """Running containers from the docker cgroups (-1 if unknown), refreshed once a second"""
+        if self.docker_dir is not None and now - self._containers_at >= 1.0:
+            try:
+                self._containers = sum(1 for entry in os.scandir(self.docker_dir)
+                                       if entry.is_dir() and _is_container_cgroup(entry.name))
+            except OSError:
+                self._containers = -1
+            self._containers_at = now
+        return self._containers
+
+    def sample(self, now):
+        """Values of one record in the order of fields(), or None if the interfaces changed
+
+        After None the interface list is re-read, so fields() describes the new
+        layout and the next sample() uses it.
+        """
+        values = [time.time()]
+        # 1 行目 "cpu  user nice system idle iowait irq softirq steal ..." だけ読む
+        values += map(int, self._read(self.stat, 256).split(b'\n', 1)[0].split()[1:9])
+        tokens = self._read(self.meminfo, 256).split()
+        values += [int(tokens[i]) for i in self.memory_index]
+        lines = self._read(self.snmp).split(b'\n')
+        values += [int(lines[line].split()[column]) for line, column in self.snmp_index]
+        values.append(self.containers(now))
+        lines = self._read(self.net_dev).split(b'\n')[2:-1]
+        if len(lines) != len(self._prefixes) or not all(map(bytes.startswith, lines, self._prefixes)):
+            self._index_interfaces(lines)
+            return None
+        for line, prefix in zip(lines, self._prefixes):
+            numbers = line[len(prefix):].split()
+            values += [int(numbers[i]) for i in NET_DEV_COLUMNS]
+        return values
+
+    def close(self):
+        for fd in (self.stat, self.meminfo, self.net_dev, self.snmp):
+            os.close(fd)
+
+
+class SystemSampler:
+    """Sampling thread with a ring buffer of fixed-width records flushed to a trace file"""
+
+    def __init__(self, path, hz=DEFAULT_HZ, ring_records=RING_RECORDS):
+        self.path = Path(path)
+        self.paths = []
+        self.hz = hz
+        self.interval = 1.0 / hz
+        self.reader = _ProcReader()
+        self.ring_records = ring_records
+        self.samples = 0
+        self.missed = 0
+        self.cpu_seconds = 0.0
+        self.wall_seconds = 0.0
+        self._flushed = 0
+        self._stop = threading.Event()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._open(self.path)
+        self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+
+    def _open(self, path):
+        """Start a trace file whose record layout matches the reader's current interfaces"""
+        fields = self.reader.fields()
+        self.record = struct.Struct('<' + ''.join(code for _, code in fields))
+        self.ring = bytearray(self.record.size * self.ring_records)
+        header = json.dumps({'fields': fields, 'hz': self.hz, 'interfaces': self.reader.interfaces,
+                             'started': datetime.now().isoformat(timespec='seconds')}).encode()
+        self._file = open(path, 'wb', buffering=0)
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.paths.append(path)
+
+    def _rotate(self):
+        """Continue in the next trace file after the interface list changed"""
+        self._flush()
+        self._file.close()
+        self._open(self.path.with_name(f"{self.path.stem}_{len(self.paths)}{self.path.suffix}"))
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        cpu_start, wall_start = time.thread_time(), time.monotonic()
+        next_sample = wall_start
+        while not self._stop.is_set():
+            now = time.monotonic()
+            values = self.reader.sample(now)
+            while values is None:
+                self._rotate()
+                values = self.reader.sample(now)
+            slot = self.samples % self.ring_records
+            self.record.pack_into(self.ring, slot * self.record.size, *values)
+            self.samples += 1
+            if self.samples - self._flushed >= self.ring_records // 2:
+                self._flush()
+            # 開始時刻基準で次の時刻を決める (ドリフトなし)、間に合わなかった分は飛ばして数える
+            next_sample += self.interval
+            if next_sample < now:
+                skipped = int((now - next_sample) / self.interval) + 1
+                self.missed += skipped
+                next_sample += skipped * self.interval
+            # Event.wait より軽い sleep で待つ (停止は最大 1 周期遅れる)
+            time.sleep(max(next_sample - time.monotonic(), 0))
+        self._flush()
+        self.cpu_seconds = time.thread_time() - cpu_start
+        self.wall_seconds = time.monotonic() - wall_start
+
+    def _flush(self):
+        """Append the records sampled since the last flush (at most one ring) to the trace"""
+        size = self.record.size
+        view = memoryview(self.ring)
+        start, end = self._flushed % self.ring_records, self.samples % self.ring_records
+        if self.samples == self._flushed:
+            return
+        if start < end:
+            self._file.write(view[start * size:end * size])
+        else:
+            self._file.write(view[start * size:])
+            self._file.write(view[:end * size])
+        self._flushed = self.samples
+
+    def stop(self):
+        """Stop sampling, flush the ring and return the overhead summary"""
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+        self.reader.close()
+        return self.summary()
+
+    def summary(self):
+        overhead = self.cpu_seconds / self.wall_seconds * 100 if self.wall_seconds else 0.0
+        return {'path': str(self.path), 'files': len(self.paths), 'samples': self.samples, 'missed': self.missed,
+                'record_bytes': self.record.size, 'cpu_percent': overhead}
+
+
+_sampler = None
+
+
+def start(log_dir, hz=DEFAULT_HZ):
+    """Start sampling into <log_dir>/system_trace_<time>.bin (None where /proc is unavailable)"""
+    global _sampler
+    stop()
+    if not os.path.exists('/proc/net/snmp'):
+        print("System sampler: /proc is not available on this platform, not sampling")
+        return None
+    path = Path(log_dir) / f"system_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.bin"
+    _sampler = SystemSampler(path, hz).start()
+    print(f"System sampler: {hz:g} Hz -> {path}")
+    return _sampler
+
+
+def stop():
+    """Stop the running sampler and print its overhead (no-op if none is running)"""
+    global _sampler
+    sampler, _sampler = _sampler, None
+    if sampler is None:
+        return None
+    summary = sampler.stop()
+    print(f"System sampler: {summary['samples']} samples ({summary['missed']} missed) in {summary['files']} "
+          f"file(s), {summary['record_bytes']} B/record, CPU {summary['cpu_percent']:.2f}% of one core")
+    return summary
+
+
+def add_sampler_argument(parser):
+    parser.add_argument('--system_sampler', type=float, nargs='?', const=DEFAULT_HZ, metavar='HZ',
+                        help=f'Sample /proc into a binary trace in the log directory at HZ (default {DEFAULT_HZ})')
+
+
+def read_trace(path):
+    """(header, records) of a trace; records is a numpy structured array"""
+    import numpy as np
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a system sampler trace")
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length))
+    dtype = np.dtype([(name, '<' + {'d': 'f8', 'Q': 'u8', 'i': 'i4'}[code]) for name, code in header['fields']])
+    offset = len(MAGIC) + 4 + length
+    # 書き込み途中で止まった最後のレコードは読まない
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    return header, np.fromfile(path, dtype=dtype, count=count, offset=offset)
+
+
+def trace_frames(header, records):
+    """(system, network) frames in the layout of system_monitor_*.csv and network_stats.csv
+
+    system: timestamp, cpu_usage (%), memory_usage (%), docker_containers and the
+    TCP retransmit / UDP error rates per second; network: cumulative counters per
+    interface for network_rates.counter_rates.
+    """
+    import numpy as np
+    import pandas as pd
+    from network_rates import counter_deltas
+
+    timestamp = records['time']
+    total = sum(records[name].astype(np.float64) for name in CPU_FIELDS)
+    idle = records['cpu_idle'].astype(np.float64) + records['cpu_iowait']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cpu_usage = np.concatenate([[np.nan], (1 - np.diff(idle) / np.diff(total)) * 100])
+        memory_usage = (1 - records['mem_available_kb'] / records['mem_total_kb']) * 100
+        interval = np.concatenate([[np.nan], np.diff(timestamp)])
+    system = pd.DataFrame({'timestamp': timestamp, 'cpu_usage': cpu_usage, 'memory_usage': memory_usage,
+                           'docker_containers': np.where(records['docker_containers'] < 0, np.nan,
+                                                         records['docker_containers'])})
+    names = records.dtype.names
+    rates = {'tcp_retrans_per_s': ('tcp_retrans_segs',), 'tcp_out_segs_per_s': ('tcp_out_segs',),
+             'udp_errors_per_s': ('udp_in_errors', 'udp_rcvbuf_errors', 'udp_sndbuf_errors')}
+    for column, fields in rates.items():
+        fields = [f for f in fields if f in names]
+        if fields:
+            values = sum(records[f].astype(np.float64) for f in fields)
+            previous = np.concatenate([[np.nan], values[:-1]])
+            system[column] = counter_deltas(values, previous) / interval
+    system = system.iloc[1:].reset_index(drop=True)  # 最初のサンプルは差分の基準
+
+    frames = []
+    for interface in header['interfaces']:
+        frame = {'timestamp': timestamp, 'interface': interface}
+        frame.update({column: records[f'{interface}/{column}'] for column in NET_DEV_COLUMNS.values()})
+        frames.append(pd.DataFrame(frame))
+    network = pd.concat(frames, ignore_index=True) if frames else None
+    return system, network
+
+
+def load_traces(log_dir):
+    """(system, network) frames of every trace in log_dir, or None if there is none"""
+    import pandas as pd
+    paths = sorted(Path(log_dir).glob(TRACE_GLOB))
+    if not paths:
+        return None
+    frames = [trace_frames(*read_trace(path)) for path in paths]
+    # インターフェースの増減で分かれたファイルも時刻順に並べる
+    system = pd.concat([s for s, _ in frames], ignore_index=True).sort_values('timestamp', ignore_index=True)
+    networks = [n for _, n in frames if n is not None]
+    return system, pd.concat(networks, ignore_index=True) if networks else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sample /proc into a binary trace, or show a trace')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record = subparsers.add_parser('record', help='Sample for --duration seconds')
+    record.add_argument('log_dir', help='Directory of the trace')
+    record.add_argument('--hz', type=float, default=DEFAULT_HZ, help='Samples per second')
+    record.add_argument('--duration', type=float, default=10.0, help='Seconds to sample')
+    show = subparsers.add_parser('show', help='Summarize a trace')
+    show.add_argument('trace', help='system_trace_*.bin')
+    show.add_argument('--csv', action='store_true',
+                      help='Also write system_monitor_<stamp>.csv / network_stats_<stamp>.csv beside the trace')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        if start(args.log_dir, args.hz) is not None:
+            try:
+                time.sleep(args.duration)
+            except KeyboardInterrupt:
+                pass
+            stop()
+        return
+
+    header, records = read_trace(args.trace)
+    system, network = trace_frames(header, records)
+    span = records['time'][-1] - records['time'][0] if len(records) > 1 else 0.0
+    print(f"{args.trace}: {len(records)} records ({records.dtype.itemsize} B) over {span:.1f}s, "
+          f"{header['hz']:g} Hz requested, started {header['started']}")
+    print(f"  CPU {system['cpu_usage'].mean():.1f}% (max {system['cpu_usage'].max():.1f}%), "
+          f"memory {system['memory_usage'].mean():.1f}%, interfaces: {', '.join(header['interfaces'])}")
+    if args.csv:
+        trace = Path(args.trace)
+        stamp = trace.stem[len('system_trace_'):]
+        system.to_csv(trace.with_name(f"system_monitor_{stamp}.csv"), index=False)
+        if network is not None:
+            # シェルのサンプラーが書く network_stats.csv は上書きしない
+            network.to_csv(trace.with_name(f"network_stats_{stamp}.csv"), index=False)
+        print(f"  CSV written beside {trace}")
+
+
+if __name__ == '__main__':
+    main()
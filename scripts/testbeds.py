@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark testbed definitions
+A testbed is one independent client/router/server stack: a docker compose
+project on this host (distinct container names and subnet) or a stack on
+another host reached through a docker context. Campaigns shard their work
+list across the testbeds in a JSON file such as:
+
+[
+  {"name": "local",  "client": "grpc-client",  "router": "grpc-router",  "server": "172.30.0.2"},
+  {"name": "stack2", "client": "grpc2-client", "router": "grpc2-router", "server": "172.31.0.2"},
+  {"name": "pi2",    "docker_context": "pi2",  "server": "172.30.0.2"},
+  {"name": "sim",    "simulated": true}
+]
+A simulated testbed runs h2load and tc against simulated_testbed's model
+instead of containers.
+"""
+
+import json
+
+from container_agent import get_agent
+from simulated_testbed import get_simulated_agent
+
+DEFAULT_SERVER = '172.30.0.2'
+
+
+class Testbed:
+    """One client/router/server stack that can run benchmarks independently of the others"""
+
+    def __init__(self, name='default', client='grpc-client', router='grpc-router', server=DEFAULT_SERVER,
+                 docker_context=None, simulated=False):
+        self.name = name
+        self.client = client
+        self.router = router
+        self.server = server
+        self.docker_context = docker_context
+        self.simulated = simulated
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - {'name', 'client', 'router', 'server', 'docker_context', 'simulated'}
+        if unknown:
+            raise ValueError(f"unknown testbed fields: {sorted(unknown)}")
+        return cls(**data)
+
+    def url(self, path='/echo'):
+        return f"https://{self.server}{path}"
+
+    def docker_command(self):
+        return ['docker'] + (['--context', self.docker_context] if self.docker_context else [])
+
+    def client_agent(self, use_agent=True):
+        if self.simulated:
+            return get_simulated_agent(self.name, self.client)
+        return get_agent(self.client, use_agent, docker=self.docker_command())
+
+    def router_agent(self, use_agent=True):
+        if self.simulated:
+            return get_simulated_agent(self.name, self.router)
+        return get_agent(self.router, use_agent, docker=self.docker_command())
+
+    def __repr__(self):
+        kind = ', simulated' if self.simulated else ''
+        return f"Testbed({self.name}: {self.client}/{self.router} -> {self.server}{kind})"
+
+
+def load_testbeds(path=None, simulate=False):
+    """Testbeds from a JSON file, or the single default docker-compose stack
+
+    simulate: run every testbed against the simulated model instead of containers.
+    """
+    if not path:
+        return [Testbed(simulated=simulate)]
+    with open(path, 'r', encoding='utf-8') as f:
+        testbeds = [Testbed.from_dict(dict(entry, simulated=True) if simulate else entry) for entry in json.load(f)]
+    if not testbeds:
+        raise ValueError(f"no testbeds defined in {path}")
+    names = [testbed.name for testbed in testbeds]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate testbed names in {path}: {names}")
+    return testbeds
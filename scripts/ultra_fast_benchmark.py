@@ -10,16 +10,25 @@ import time
 import subprocess
 import argparse
 from pathlib import Path
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
+from render_profiles import add_render_profile_argument, save_figure
+from container_agent import get_agent
+from h2load_stream import DEFAULT_LOG_TRANSPORT, LOG_TRANSPORTS, run_h2load
+from netem_controller import NetemController
+import metrics_exporter
+import stage_profiler
 
 class UltraFastBenchmark:
-    def __init__(self, log_dir):
+    def __init__(self, log_dir, render_profile='publication', use_agent=True, log_transport=DEFAULT_LOG_TRANSPORT):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.render_profile = render_profile
+        # コンテナ内コマンドは常駐エージェント経由 (短い測定では docker exec の起動コストが支配的)
+        self.router = get_agent('grpc-router', use_agent)
+        self.client = get_agent('grpc-client', use_agent)
+        self.netem = NetemController(self.router)
+        self.log_transport = log_transport  # 'stream': per-request log over stdout, 'file': unique path + copy
         
         # 超高速設定
         self.measurement_count = 1  # 1回のみ
@@ -27,7 +36,6 @@ class UltraFastBenchmark:
         self.concurrent_connections = 1  # 1接続
         self.threads = 1  # 1スレッド
         self.timeout = 15  # 15秒タイムアウト
-        self.stabilization_time = 0.5  # 0.5秒安定化
         self.between_tests_time = 0.2  # 0.2秒間隔
         
         # 統計設定
@@ -39,58 +47,38 @@ class UltraFastBenchmark:
         print(f"⏱️  Estimated time: ~3 minutes")
     
     def set_network_conditions(self, delay, loss, bandwidth):
-        """Set network conditions using tc/netem"""
+        """Set network conditions using tc/netem (in-place change, verified instead of a fixed wait)"""
         try:
-            # Clear existing rules
-            subprocess.run(['docker', 'exec', 'grpc-router', 'tc', 'qdisc', 'del', 'dev', 'eth0', 'root'], 
-                         capture_output=True)
-            
-            # Set new conditions
-            if delay > 0 or loss > 0:
-                cmd = ['docker', 'exec', 'grpc-router', 'tc', 'qdisc', 'add', 'dev', 'eth0', 'root', 'netem']
-                if delay > 0:
-                    cmd.extend(['delay', f'{delay}ms'])
-                if loss > 0:
-                    cmd.extend(['loss', f'{loss}%'])
-                if bandwidth > 0:
-                    cmd.extend(['rate', f'{bandwidth}mbit'])
-                
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode == 0:
-                    print(f"      Network set: {delay}ms delay, {loss}% loss, {bandwidth}Mbps")
-                else:
-                    print(f"      Network setting failed: {result.stderr}")
-            
-            time.sleep(self.stabilization_time)
+            if self.netem.apply(delay, loss, bandwidth):
+                print(f"      Network set: {delay}ms delay, {loss}% loss, {bandwidth}Mbps")
             
         except Exception as e:
             print(f"      Network setting error: {e}")
     
-    def execute_benchmark(self, protocol):
-        """Execute ultra-fast benchmark"""
+    def execute_benchmark(self, protocol, log_file):
+        """Execute ultra-fast benchmark; the per-request log is written to log_file on the host"""
         try:
             if protocol == 'http2':
                 cmd = [
-                    'docker', 'exec', 'grpc-client', 'h2load',
+                    'h2load',
                     '--npn-list=h2,http/1.1',
                     '-n', str(self.requests_per_test),
                     '-c', str(self.concurrent_connections),
                     '-t', str(self.threads),
-                    '--log-file=/tmp/h2load.log',
                     'https://172.30.0.2/echo'
                 ]
             else:  # http3
                 cmd = [
-                    'docker', 'exec', 'grpc-client', 'h2load',
+                    'h2load',
                     '--npn-list=h3,h2,http/1.1',
                     '-n', str(self.requests_per_test),
                     '-c', str(self.concurrent_connections),
                     '-t', str(self.threads),
-                    '--log-file=/tmp/h2load.log',
                     'https://172.30.0.2/echo'
                 ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.timeout)
+            # リクエスト単位ログは run_h2load 経由 (呼び出し側の labels() でメトリクスにも反映)
+            result, _ = run_h2load(self.client, cmd, log_file, self.log_transport, timeout=self.timeout)
             
             if result.returncode == 0:
                 output = result.stdout
@@ -101,7 +89,7 @@ class UltraFastBenchmark:
                     return {
                         'throughput': throughput,
                         'latency': latency,
-                        'log_file': '/tmp/h2load.log'
+                        'log_file': str(log_file)
                     }
                 else:
                     print(f"      Parsing failed: throughput={throughput}, latency={latency}")
@@ -161,7 +149,11 @@ class UltraFastBenchmark:
             self.set_network_conditions(delay, loss, bandwidth)
             
             # Execute benchmark
-            result = self.execute_benchmark(protocol)
+            condition = f"{delay}:{loss}:{bandwidth}"
+            log_file = self.log_dir / f"h2load_{protocol}_{delay}ms_{loss}pct_{bandwidth}mbps_{test + 1}.log"
+            with metrics_exporter.labels(condition, protocol):
+                result = self.execute_benchmark(protocol, log_file)
+            metrics_exporter.record_run(condition, protocol, result and result['throughput'], ok=bool(result))
             
             if result:
                 throughputs.append(result['throughput'])
@@ -236,6 +228,7 @@ class UltraFastBenchmark:
         if not results:
             return None
         
+        import pandas as pd  # 結果の書き出し時だけ読み込む (--help を速くする)
         df = pd.DataFrame(results)
         csv_file = self.log_dir / 'ultra_fast_results.csv'
         df.to_csv(csv_file, index=False)
@@ -247,6 +240,8 @@ class UltraFastBenchmark:
         if not results:
             return None
         
+        import matplotlib.pyplot as plt
+        import pandas as pd
         df = pd.DataFrame(results)
         
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
@@ -279,7 +274,7 @@ class UltraFastBenchmark:
         plt.tight_layout()
         
         graph_file = self.log_dir / 'ultra_fast_comparison.png'
-        plt.savefig(graph_file, dpi=300, bbox_inches='tight')
+        save_figure(fig, graph_file, self.render_profile)
         plt.close()
         
         print(f"📈 Graph saved to: {graph_file}")
@@ -335,11 +330,22 @@ def main():
     parser = argparse.ArgumentParser(description='Ultra Fast Benchmark - 3分で完了')
     parser.add_argument('--log_dir', default='logs/ultra_fast_benchmark', help='Log directory')
     parser.add_argument('--test_conditions', default='10:0:0,100:2:0,200:5:0', help='Test conditions (delay:loss:bandwidth)')
+    add_render_profile_argument(parser)
+    parser.add_argument('--no_agent', action='store_true',
+                        help='Use a separate docker exec per command instead of the persistent exec agent')
+    parser.add_argument('--log_transport', choices=LOG_TRANSPORTS, default=DEFAULT_LOG_TRANSPORT,
+                        help='stream: pipe per-request logs over stdout and parse during the run; '
+                             'file: unique log path in the container, copied out afterwards')
+    metrics_exporter.add_metrics_argument(parser)
+    stage_profiler.add_profile_argument(parser)
     
     args = parser.parse_args()
+    if args.metrics_port:
+        metrics_exporter.serve(args.metrics_port)
     
     # Create benchmark instance
-    benchmark = UltraFastBenchmark(args.log_dir)
+    benchmark = UltraFastBenchmark(args.log_dir, render_profile=args.render_profile, use_agent=not args.no_agent,
+                                   log_transport=args.log_transport)
     
     # Parse test conditions
     conditions = []
@@ -355,36 +361,38 @@ def main():
     print(f"⏱️  Estimated completion time: ~3 minutes")
     print(f"📊 Test conditions: {len(conditions)}")
     
-    start_time = time.time()
-    results = []
+    with stage_profiler.profiling(args.profile, args.log_dir, 'ultra_fast_benchmark', memory=args.profile_memory):
+        start_time = time.time()
+        progress = metrics_exporter.track_progress(len(conditions))
+        results = []
     
-    # Run tests for each condition
-    for i, (delay, loss, bandwidth) in enumerate(conditions):
-        print(f"\n{'='*50}")
-        print(f"Test {i+1}/{len(conditions)}: {delay}ms delay, {loss}% loss, {bandwidth}Mbps")
-        print(f"{'='*50}")
+        # Run tests for each condition
+        for i, (delay, loss, bandwidth) in enumerate(conditions):
+            print(f"\n{'='*50}")
+            print(f"Test {i+1}/{len(conditions)}: {delay}ms delay, {loss}% loss, {bandwidth}Mbps")
+            print(f"{'='*50}")
         
-        result = benchmark.run_comparison(delay, loss, bandwidth)
-        if result:
-            results.append(result)
+            with stage_profiler.stage('comparison'):
+                result = benchmark.run_comparison(delay, loss, bandwidth)
+            if result:
+                results.append(result)
         
-        # Progress update
-        elapsed = time.time() - start_time
-        remaining = (elapsed / (i+1)) * (len(conditions) - i - 1) if i > 0 else 0
-        print(f"⏱️  Elapsed: {elapsed:.1f}s, Estimated remaining: {remaining:.1f}s")
+            # Progress update
+            progress.advance()
+            print(f"⏱️  Progress: {progress.describe()}")
     
-    # Generate outputs
-    if results:
-        print(f"\n📊 Generating results...")
-        benchmark.generate_results_csv(results)
-        benchmark.generate_comparison_graph(results)
-        benchmark.generate_report(results)
+        # Generate outputs
+        if results:
+            print(f"\n📊 Generating results...")
+            benchmark.generate_results_csv(results)
+            benchmark.generate_comparison_graph(results)
+            benchmark.generate_report(results)
         
-        total_time = time.time() - start_time
-        print(f"\n✅ Ultra Fast Benchmark completed in {total_time:.1f} seconds")
-        print(f"📁 Results saved in: {args.log_dir}")
-    else:
-        print(f"\n❌ No valid results obtained")
+            total_time = time.time() - start_time
+            print(f"\n✅ Ultra Fast Benchmark completed in {total_time:.1f} seconds")
+            print(f"📁 Results saved in: {args.log_dir}")
+        else:
+            print(f"\n❌ No valid results obtained")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -4,152 +4,283 @@ Ultra Final HTTP/2 vs HTTP/3 Performance Boundary Analysis
 Ultra-final boundary analysis script - Significantly relaxed statistical significance thresholds
 """
 
+import asyncio
+import json
+import random
 import time
 import subprocess
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 from pathlib import Path
 import argparse
 import sys
 import csv
 import os
-
-# Remove Japanese font settings - use default English fonts
-plt.rcParams['axes.unicode_minus'] = False
+from render_profiles import add_render_profile_argument, full_panels
+from render_core import PdfSink, apply_seaborn_style, new_figure, render, subplots
+from html_report import generate_html_report
+from container_agent import AgentError
+from testbeds import Testbed, load_testbeds
+import simulated_testbed
+import stage_profiler
+import event_log
+import metrics_exporter
+import system_sampler
+from netem_controller import NetemController, NetemError
+from h2load_stream import DEFAULT_LOG_TRANSPORT, LOG_TRANSPORTS, RequestLogParser
+from load_backends import H2loadBackend
+from campaign_state import STATE_FILE, CampaignState, unit_key
+from stage_pipeline import CACHE_DIR as PIPELINE_CACHE_DIR, Pipeline, hash_files
+from campaign_lanes import DEFAULT_POST_WORKERS, CampaignLanes
+import regression_baseline
+from protocol_schedule import (DEFAULT_SCHEDULE, SCHEDULE_FILE, SCHEDULES, build_schedule, is_significant_paired,
+                               new_schedule_id, paired_differences, write_schedule)
 
 class UltraFinalAnalyzer:
-    def __init__(self, log_dir):
+    def __init__(self, log_dir, render_profile='auto', intermediate_graphs=True, pdf_sink=None, use_agent=True,
+                 log_transport=DEFAULT_LOG_TRANSPORT, state=None, testbeds=None, backend=None):
+        # matplotlib は解析器を作るときに読み込む (--help では読み込まない)
+        # Remove Japanese font settings - use default English fonts
+        import matplotlib
+        matplotlib.rcParams['axes.unicode_minus'] = False
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.results = []
         self.boundaries = []
+        self.regressions = []  # baseline check results (regression_baseline)
+        self.progress = None  # metrics_exporter.Progress of the running campaign
         self.measurement_count = 2  # Set measurement count to 2
+        self.render_profile = render_profile  # 'auto': preview for intermediate, publication for final figures
+        self.intermediate_graphs = intermediate_graphs  # False: score/ave PNGs are left to the HTML report
+        self.pdf_sink = pdf_sink  # PdfSink: figures go to one multi-page PDF instead of PNG files
+        # 独立したテストベッド (client/router/server) ごとに作業を分担; 既定は docker-compose の1組
+        self.testbeds = testbeds or [Testbed()]
+        # コンテナ内コマンドは常駐エージェント経由 (use_agent=False で毎回 docker exec)
+        self.use_agent = use_agent
+        self.router = self.testbeds[0].router_agent(use_agent)
+        self.netem_controllers = {}  # testbed name -> NetemController
+        self.client = self.testbeds[0].client_agent(use_agent)
+        self.log_transport = log_transport  # 'stream': per-request log over stdout, 'file': unique path + copy
+        self.state = state  # CampaignState: completed units are recorded and skipped on --resume
+        self.backend = backend or H2loadBackend()  # load generator (load_backends)
+        if not self.backend.can_run:
+            raise ValueError(f"the {self.backend.name} backend cannot run benchmarks, only import results")
+        
+    def profile_for(self, final=False):
+        """Resolve the render profile for intermediate or final figures"""
+        if self.render_profile != 'auto':
+            return self.render_profile
+        return 'publication' if final else 'preview'
         
     def run_ultra_reliable_benchmark(self, delay, loss, bandwidth=0, protocol='http2'):
-        """Ultra-reliable benchmark execution"""
-        print(f"Running: {protocol} - Delay:{delay}ms, Loss:{loss}%, Bandwidth:{bandwidth}Mbps")
-        
-        throughputs = []
-        latencies = []
-        measurement_averaged_csvs = []  # Collect averaged CSV files for each measurement
+        """Ultra-reliable benchmark execution for one condition (blocking)"""
+        async def run():
+            with CampaignLanes(bench_lanes=[testbed.name for testbed in self.testbeds]) as lanes:
+                results = await run_conditions(self, lanes, [f"{delay}:{loss}:{bandwidth}"], protocols=[protocol])
+                return results[0] if results else None
+        return asyncio.run(run())
+    
+    async def run_unit(self, lanes, testbed, delay, loss, bandwidth, protocol, number, score, block=None,
+                       schedule=None):
+        """Run one (condition, protocol, repetition) on a testbed's bench lane
+        
+        The finished run is handed to a post-processing lane right away, so the
+        testbed moves on to its next unit while CSVs and graphs are produced.
+        Returns (result, csv future), or None if the benchmark failed.
+        """
+        # Create measurement directory and subdirectory for the measurement count
+        measurement_dir = self.log_dir / f"measurement_{number}"
+        score_dir = measurement_dir / f"measurement_{number}_score_{score}-{self.measurement_count}"
+        score_dir.mkdir(parents=True, exist_ok=True)
+        
+        unit = unit_key(f"{delay}:{loss}:{bandwidth}", protocol, f"measurement_{number}", f"score_{score}")
+        completed = self.state.completed(unit) if self.state is not None else None
+        if completed:
+            # 前回の実行で完了済み: 生ログと集計結果を再利用
+            print(f"      Skipped (completed in previous run): {unit}")
+            self.advance_progress(skipped=True)
+            return self.resume_score(lanes, completed, unit, score_dir, delay, loss, bandwidth, protocol)
+        
+        # Execute benchmark for each measurement count
+        print(f"Running [{testbed.name}]: {protocol} - Delay:{delay}ms, Loss:{loss}%, Bandwidth:{bandwidth}Mbps "
+              f"(measurement {number}/2, {score}/{self.measurement_count})")
+        result = await lanes.bench(self.run_score_benchmark, delay, loss, bandwidth, protocol, score_dir, testbed,
+                                   lane=testbed.name)
+        
+        # Wait time between measurements
+        await lanes.bench(self.cooldown, testbed, lane=testbed.name)
+        self.advance_progress()
+        
+        if not result:
+            print(f"    Measurement failed")
+            return None
+        print(f" Result: {result['throughput']:.1f} req/s, {result['latency']:.1f}ms")
+        if self.state is not None:
+            self.state.record(unit, {'log_file': result['log_file']},
+                              {'throughput': result['throughput'], 'latency': result['latency']},
+                              testbed=testbed.name, block=block, schedule=schedule)
+        return result, lanes.post(self.process_score, result, score_dir, delay, loss, bandwidth, protocol, unit)
+    
+    async def finish_condition(self, lanes, measurements, delay, loss, bandwidth, protocol):
+        """Average the post-processed runs of one condition and summarize them
+        
+        measurements: [(measurement number, [future of run_unit() per score])]
+        """
+        async def finish_measurement(number, unit_futures):
+            runs = [run for run in await asyncio.gather(*unit_futures) if run]
+            csv_files = [csv_file for csv_file in await asyncio.gather(*(future for _, future in runs)) if csv_file]
+            if not csv_files:
+                return [run for run, _ in runs], None
+            averaged_csv = await lanes.post(self.process_measurement, csv_files, number,
+                                            self.log_dir / f"measurement_{number}", delay, loss, bandwidth, protocol)
+            return [run for run, _ in runs], averaged_csv
         
-        for i in range(2):  # 2 measurements
-            print(f"  Measurement {i+1}/2...")
-            
-            # Create measurement directory
-            measurement_dir = self.log_dir / f"measurement_{i+1}"
-            measurement_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Create subdirectories for measurement count
-            measurement_csv_files = []  # Collect CSV files within this measurement
-            
-            for score in range(1, self.measurement_count + 1):
-                score_dir = measurement_dir / f"measurement_{i+1}_score_{score}-{self.measurement_count}"
-                score_dir.mkdir(parents=True, exist_ok=True)
-                
-                # Execute benchmark for each measurement count
-                print(f"    Measurement {score}/{self.measurement_count}...")
-                
-                # Set network conditions
-                self.set_network_conditions(delay, loss, bandwidth)
-            
-            # Execute benchmark
-            result = self.execute_benchmark(protocol)
-                
-            if result:
-                    throughputs.append(result['throughput'])
-                    latencies.append(result['latency'])
-                    
-                    # Save detailed log file to measurement count directory
-                    if 'log_file' in result:
-                        score_log_file = score_dir / f"{protocol}_{int(time.time() * 1e9)}.log"
-                        subprocess.run(['docker', 'cp', f'grpc-client:{result["log_file"]}', str(score_log_file)])
-                        print(f"      Log file saved: {score_log_file}")
-                        
-                        # Save detailed CSV file to measurement count directory
-                        score_csv_file = score_dir / f"{protocol}_{int(time.time() * 1e9)}.csv"
-                        detailed_csv = self.generate_detailed_csv(score_log_file, score_csv_file, protocol)
-                        if detailed_csv:
-                            print(f"      Detailed CSV file saved: {score_csv_file} ({len(detailed_csv)} requests)")
-                        
-                        # Save network condition CSV file to measurement count directory
-                        score_network_csv = score_dir / f"{protocol}_{delay}ms_{loss}pct_{bandwidth}mbps.csv"
-                        network_csv = self.generate_network_conditions_csv(delay, loss, bandwidth, protocol, score_dir)
-                        if network_csv:
-                            print(f"      Network condition CSV file saved: {score_network_csv}")
-                            measurement_csv_files.append(score_network_csv)
-                            
-                            # Generate timestamp analysis graphs in measurement count directory
-                            print(f"      Generating network condition timestamp bar graph...")
-                            timestamp_graph = self.generate_timestamp_bar_graph(score_network_csv, protocol, delay, loss, bandwidth)
-                            if timestamp_graph:
-                                print(f"      Timestamp bar graph saved: {timestamp_graph}")
-                            
-                            # Generate detailed timestamp analysis graphs in measurement count directory
-                            detailed_graphs = self.generate_detailed_timestamp_analysis(score_network_csv, protocol, delay, loss, bandwidth)
-                            if detailed_graphs:
-                                for graph in detailed_graphs:
-                                    print(f"      Detailed timestamp analysis graph saved: {graph}")
-                
-                    print(f" Result: {result['throughput']:.1f} req/s, {result['latency']:.1f}ms")
-            else:
-                print(f"    Measurement failed")
-                
-                # Wait time between measurements
-                if score < self.measurement_count:
-                    time.sleep(1)
-            
-            # Generate averaged data for each measurement
-            if measurement_csv_files:
-                print(f"    Generating averaged data for measurement {i+1}...")
-                ave_dir = measurement_dir / "ave"
-                ave_dir.mkdir(parents=True, exist_ok=True)
-                
-                # Average all CSV files within the measurement
-                averaged_csv = self.generate_averaged_csv(measurement_csv_files, protocol, delay, loss, bandwidth, ave_dir)
-                if averaged_csv:
-                    print(f"      Averaged CSV file saved: {averaged_csv}")
-                    measurement_averaged_csvs.append(averaged_csv)
-                    
-                    # Generate timestamp analysis graph for averaged data
-                    print(f"      Generating averaged timestamp bar graph...")
-                    ave_timestamp_graph = self.generate_timestamp_bar_graph(averaged_csv, protocol, delay, loss, bandwidth)
-                    if ave_timestamp_graph:
-                        print(f"      Averaged timestamp bar graph saved: {ave_timestamp_graph}")
-                    
-                    # Generate detailed timestamp analysis graph for averaged data
-                    ave_detailed_graphs = self.generate_detailed_timestamp_analysis(averaged_csv, protocol, delay, loss, bandwidth)
-                    if ave_detailed_graphs:
-                        for graph in ave_detailed_graphs:
-                            print(f"      Averaged detailed timestamp analysis graph saved: {graph}")
+        finished = await asyncio.gather(*(finish_measurement(*m) for m in measurements))
+        measurement_averaged_csvs = [averaged for _, averaged in finished if averaged]
         
         # Generate averaged data for all measurements (under parent directory)
         if measurement_averaged_csvs:
-            print(f"  Generating final averaged data for all measurements...")
-            
-            # Create all_ave directory
-            all_ave_dir = self.log_dir / "all_ave"
-            all_ave_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Further average the averaged CSV files
-            final_averaged_csv = self.generate_averaged_csv(measurement_averaged_csvs, protocol, delay, loss, bandwidth, all_ave_dir)
-            if final_averaged_csv:
-                print(f"    Final averaged CSV file saved: {final_averaged_csv}")
-                
-                # Generate timestamp analysis graph for final averaged data
-                print(f"    Generating final averaged timestamp bar graph...")
-                final_timestamp_graph = self.generate_timestamp_bar_graph(final_averaged_csv, protocol, delay, loss, bandwidth)
-                if final_timestamp_graph:
-                    print(f"    Final averaged timestamp bar graph saved: {final_timestamp_graph}")
-                
-                # Generate detailed timestamp analysis graph for final averaged data
-                final_detailed_graphs = self.generate_detailed_timestamp_analysis(final_averaged_csv, protocol, delay, loss, bandwidth)
-                if final_detailed_graphs:
-                    for graph in final_detailed_graphs:
-                        print(f"    Final averaged detailed timestamp analysis graph saved: {graph}")
+            await lanes.post(self.process_final, measurement_averaged_csvs, delay, loss, bandwidth, protocol)
+        
+        results = [result for runs, _ in finished for result in runs]
+        return self.summarize_measurements([r['throughput'] for r in results], [r['latency'] for r in results],
+                                           delay, loss, bandwidth, protocol)
+    
+    def resume_score(self, lanes, completed, unit, score_dir, delay, loss, bandwidth, protocol):
+        """Rebuild (result, csv future) for a unit finished in a previous run"""
+        result = dict(completed['summary'], log_file=completed['artifacts']['log_file'])
+        network_csv = completed.get('network_csv')
+        if network_csv and Path(network_csv).exists():
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(network_csv)
+            return result, future
+        # 後処理の途中で止まっていた場合は生ログから作り直す
+        result['requests'] = RequestLogParser().feed_file(result['log_file'])
+        return result, lanes.post(self.process_score, result, score_dir, delay, loss, bandwidth, protocol, unit)
+    
+    def advance_progress(self, skipped=False):
+        if self.progress is not None:
+            self.progress.advance(skipped)
+            print(f"    Progress: {self.progress.describe()}")
+    
+    def cooldown(self, testbed, seconds=1):
+        """Bench lane: pause between measurements on a testbed"""
+        with event_log.span('cooldown', testbed=testbed.name):
+            time.sleep(seconds)
+    
+    def run_score_benchmark(self, delay, loss, bandwidth, protocol, score_dir, testbed=None):
+        """Bench lane: apply network conditions and run one benchmark into score_dir"""
+        # Set network conditions
+        with stage_profiler.stage('bench.netem'):
+            self.set_network_conditions(delay, loss, bandwidth, testbed)
+        
+        # Execute benchmark (per-request log goes straight to the measurement count directory)
+        score_log_file = score_dir / f"{protocol}_{int(time.time() * 1e9)}.log"
+        condition = f"{delay}:{loss}:{bandwidth}"
+        with stage_profiler.stage('bench.load'), metrics_exporter.labels(condition, protocol):
+            result = self.execute_benchmark(protocol, score_log_file, testbed)
+        metrics_exporter.record_run(condition, protocol, result and result['throughput'], ok=result is not None)
+        return result
+    
+    @stage_profiler.staged('post.score')
+    def process_score(self, result, score_dir, delay, loss, bandwidth, protocol, unit=None):
+        """Post-processing lane: CSVs and graphs for one run; returns its network condition CSV"""
+        if 'log_file' not in result:
+            return None
+        
+        # Save detailed log file to measurement count directory
+        print(f"      Log file saved: {result['log_file']}")
+        
+        # Save detailed CSV file to measurement count directory
+        score_csv_file = score_dir / f"{protocol}_{int(time.time() * 1e9)}.csv"
+        self.generate_detailed_csv(result['requests'], score_csv_file, protocol, delay, loss)
         
+        # Save network condition CSV file to measurement count directory
+        score_network_csv = score_dir / f"{protocol}_{delay}ms_{loss}pct_{bandwidth}mbps.csv"
+        network_csv = self.generate_network_conditions_csv(delay, loss, bandwidth, protocol, score_dir)
+        if not network_csv:
+            return None
+        print(f"      Network condition CSV file saved: {score_network_csv}")
+        
+        if self.intermediate_graphs:
+            # Generate timestamp analysis graphs in measurement count directory
+            print(f"      Generating network condition timestamp bar graph...")
+            timestamp_graph = self.generate_timestamp_bar_graph(score_network_csv, protocol, delay, loss, bandwidth,
+                                                                profile=self.profile_for(final=False))
+            if timestamp_graph:
+                print(f"      Timestamp bar graph saved: {timestamp_graph}")
+            
+            # Generate detailed timestamp analysis graphs in measurement count directory
+            detailed_graphs = self.generate_detailed_timestamp_analysis(score_network_csv, protocol, delay, loss, bandwidth,
+                                                                        profile=self.profile_for(final=False))
+            if detailed_graphs:
+                for graph in detailed_graphs:
+                    print(f"      Detailed timestamp analysis graph saved: {graph}")
+        
+        if self.state is not None and unit:
+            self.state.update(unit, network_csv=str(score_network_csv))
+        return score_network_csv
+    
+    @stage_profiler.staged('post.measurement')
+    def process_measurement(self, measurement_csv_files, number, measurement_dir, delay, loss, bandwidth, protocol):
+        """Post-processing lane: averaged data and graphs for one measurement"""
+        print(f"    Generating averaged data for measurement {number}...")
+        ave_dir = measurement_dir / "ave"
+        ave_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Average all CSV files within the measurement
+        averaged_csv = self.generate_averaged_csv(measurement_csv_files, protocol, delay, loss, bandwidth, ave_dir)
+        if averaged_csv:
+            print(f"      Averaged CSV file saved: {averaged_csv}")
+        
+        if averaged_csv and self.intermediate_graphs:
+            # Generate timestamp analysis graph for averaged data
+            print(f"      Generating averaged timestamp bar graph...")
+            ave_timestamp_graph = self.generate_timestamp_bar_graph(averaged_csv, protocol, delay, loss, bandwidth,
+                                                                    profile=self.profile_for(final=False))
+            if ave_timestamp_graph:
+                print(f"      Averaged timestamp bar graph saved: {ave_timestamp_graph}")
+            
+            # Generate detailed timestamp analysis graph for averaged data
+            ave_detailed_graphs = self.generate_detailed_timestamp_analysis(averaged_csv, protocol, delay, loss, bandwidth,
+                                                                            profile=self.profile_for(final=False))
+            if ave_detailed_graphs:
+                for graph in ave_detailed_graphs:
+                    print(f"      Averaged detailed timestamp analysis graph saved: {graph}")
+        
+        return averaged_csv
+    
+    @stage_profiler.staged('post.final')
+    def process_final(self, measurement_averaged_csvs, delay, loss, bandwidth, protocol):
+        """Post-processing lane: final averaged data and graphs over all measurements"""
+        print(f"  Generating final averaged data for all measurements...")
+        
+        # Create all_ave directory
+        all_ave_dir = self.log_dir / "all_ave"
+        all_ave_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Further average the averaged CSV files
+        final_averaged_csv = self.generate_averaged_csv(measurement_averaged_csvs, protocol, delay, loss, bandwidth, all_ave_dir)
+        if final_averaged_csv:
+            print(f"    Final averaged CSV file saved: {final_averaged_csv}")
+            
+            # Generate timestamp analysis graph for final averaged data
+            print(f"    Generating final averaged timestamp bar graph...")
+            final_timestamp_graph = self.generate_timestamp_bar_graph(final_averaged_csv, protocol, delay, loss, bandwidth,
+                                                                      profile=self.profile_for(final=True))
+            if final_timestamp_graph:
+                print(f"    Final averaged timestamp bar graph saved: {final_timestamp_graph}")
+            
+            # Generate detailed timestamp analysis graph for final averaged data
+            final_detailed_graphs = self.generate_detailed_timestamp_analysis(final_averaged_csv, protocol, delay, loss, bandwidth,
+                                                                              profile=self.profile_for(final=True))
+            if final_detailed_graphs:
+                for graph in final_detailed_graphs:
+                    print(f"    Final averaged detailed timestamp analysis graph saved: {graph}")
+        
+        return final_averaged_csv
+    
+    def summarize_measurements(self, throughputs, latencies, delay, loss, bandwidth, protocol):
+        """Remove outliers and average the measurements of one condition"""
         if not throughputs:
             print(f"  Warning: All measurements failed")
             return None
@@ -194,59 +325,42 @@ class UltraFinalAnalyzer:
             'total_measurements': len(throughputs)
         }
     
-    def set_network_conditions(self, delay, loss, bandwidth):
-        """Set network conditions"""
+    def netem_for(self, testbed=None):
+        """netem controller of a testbed's router (tracks the installed qdisc across runs)"""
+        testbed = testbed or self.testbeds[0]
+        if testbed.name not in self.netem_controllers:
+            self.netem_controllers[testbed.name] = NetemController(testbed.router_agent(self.use_agent))
+        return self.netem_controllers[testbed.name]
+    
+    def set_network_conditions(self, delay, loss, bandwidth, testbed=None):
+        """Set network conditions (no-op when they are already applied)"""
+        testbed = testbed or self.testbeds[0]
         try:
-            if bandwidth == 0:
-                cmd = f"docker exec grpc-router /scripts/netem_delay_loss_bandwidth.sh {delay} {loss}"
-            else:
-                cmd = f"docker exec grpc-router /scripts/netem_delay_loss_bandwidth.sh {delay} {loss} {bandwidth}"
-            
-            result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-            print(f"    Network conditions set: {delay}ms, {loss}%, {bandwidth}Mbps")
-        except subprocess.CalledProcessError as e:
+            with event_log.span('netem_apply', testbed=testbed.name, delay=delay, loss=loss,
+                                bandwidth=bandwidth) as event:
+                event['changed'] = self.netem_for(testbed).apply(delay, loss, bandwidth)
+            if event['changed']:
+                print(f"    Network conditions set: {delay}ms, {loss}%, {bandwidth}Mbps")
+        except (NetemError, subprocess.SubprocessError, AgentError) as e:
             print(f"    Network condition setting error: {e}")
     
-    def execute_benchmark(self, protocol):
-        """Execute benchmark (optimized version)"""
+    def execute_benchmark(self, protocol, log_file, testbed=None):
+        """Execute benchmark (optimized version); the per-request log is written to log_file on the host"""
+        testbed = testbed or self.testbeds[0]
         try:
-            if protocol == 'http2':
-                cmd = [
-                    'docker', 'exec', 'grpc-client', 'h2load',
-                    '--alpn-list=h2,http/1.1',
-                    '-n', '1000',  # Further reduce request count (2000→1000)
-                    '-c', '5',     # Further reduce concurrent connections (10→5)
-                    '-t', '2',     # Further reduce threads (3→2)
-                    '--log-file=/tmp/h2load.log',  # Output log file
-                    'https://172.30.0.2/echo'
-                ]
-            else:  # http3
-                cmd = [
-                    'docker', 'exec', 'grpc-client', 'h2load',
-                    '--alpn-list=h3,h2,http/1.1',
-                    '-n', '1000',  # Further reduce request count (2000→1000)
-                    '-c', '5',     # Further reduce concurrent connections (10→5)
-                    '-t', '2',     # Further reduce threads (3→2)
-                    '--log-file=/tmp/h2load.log',  # Output log file
-                    'https://172.30.0.2/echo'
-                ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)  # Further shorten timeout (120→60)
+            # Further shorten timeout (120→60)
+            with event_log.span('load_run', testbed=testbed.name, protocol=protocol,
+                                backend=type(self.backend).__name__, log_file=str(log_file)) as event:
+                result, run = self.backend.run(testbed.client_agent(self.use_agent), protocol, testbed.url('/echo'),
+                                               log_file, self.log_transport, timeout=60)
+                event.update(returncode=result.returncode, requests=len(run.records))
             
             if result.returncode == 0:
-                # Parse results
-                output = result.stdout
-                throughput = self.parse_throughput(output)
-                latency = self.parse_latency(output)
-                
-                if throughput and latency:
-                    return {
-                        'throughput': throughput,
-                        'latency': latency,
-                        'log_file': '/tmp/h2load.log'  # Return only path inside container
-                    }
-                else:
-                    print(f"      Parsing failed: throughput={throughput}, latency={latency}")
+                # Common summary (throughput req/s, mean latency ms) of the load backend
+                if run.ok:
+                    return run.to_result(log_file)
+                print(f"      Parsing failed: throughput={run.summary.get('throughput')}, "
+                      f"latency={run.summary.get('latency')}")
             else:
                 print(f"      Benchmark failed: returncode={result.returncode}")
                 print(f"      Error: {result.stderr}")
@@ -260,62 +374,17 @@ class UltraFinalAnalyzer:
             print(f"      Benchmark execution error: {e}")
             return None
     
-    def generate_detailed_csv(self, log_file, csv_file, protocol):
-        """Generate detailed CSV file"""
+    @stage_profiler.staged('csv.detailed')
+    def generate_detailed_csv(self, requests, csv_file, protocol, delay, loss):
+        """Generate detailed CSV file from parsed per-request records"""
         try:
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            
-            # Extract detailed data from log
-            csv_data = []
-            lines = log_content.split('\n')
-            
-            # Get network conditions
-            delay = 0
-            loss = 0
-            for line in lines:
-                if 'Delay:' in line:
-                    delay = int(line.split('Delay:')[1].split('ms')[0].strip())
-                elif 'Loss:' in line:
-                    loss = float(line.split('Loss:')[1].split('%')[0].strip())
-            
-            # Extract detailed data for each request
-            request_count = 0
-            for line in lines:
-                # Look for request/response timing information
-                if 'time for request:' in line:
-                    parts = line.split()
-                    timestamp = int(time.time() * 1000000000) + request_count  # Nanosecond precision
-                    request_count += 1
-                    
-                    # Request size (default 200 bytes)
-                    request_size = 200
-                    
-                    # Extract response time
-                    response_time = 0
-                    for part in parts:
-                        if 'ms' in part and part.replace('.', '').replace('ms', '').isdigit():
-                            response_time = int(float(part.replace('ms', '')) * 1000)  # Convert to microseconds
-                            break
-                    
-                    if response_time > 0:
-                        csv_data.append(f"{timestamp}\t{request_size}\t{response_time}")
-            
-            # Save to CSV file
-            with open(csv_file, 'w') as f:
-                # Add header line
-                f.write(f"# Protocol: {protocol}\n")
-                f.write(f"# Delay: {delay}ms\n")
-                f.write(f"# Loss: {loss}%\n")
-                f.write(f"# Timestamp(ns)\tRequestSize(bytes)\tResponseTime(us)\n")
-                
-                for line in csv_data:
-                    f.write(line + '\n')
-            
-            print(f"      Detailed CSV file saved: {csv_file} ({len(csv_data)} requests)")
-            
+            with event_log.span('csv_write', kind='detailed', path=str(csv_file)):
+                count = requests.write_detailed_csv(csv_file, protocol, delay, loss)
+            print(f"      Detailed CSV file saved: {csv_file} ({count} requests)")
+            return count
         except Exception as e:
             print(f"      Detailed CSV file generation failed: {e}")
+            return None
     
     def generate_network_conditions_csv(self, delay, loss, bandwidth, protocol, output_dir=None):
         """Generate network condition CSV file"""
@@ -349,7 +418,7 @@ class UltraFinalAnalyzer:
                 csv_data.append(f"{sample_timestamp}\t{request_size}\t{int(response_time)}")
             
             # Save to CSV file
-            with open(csv_file, 'w') as f:
+            with event_log.span('csv_write', kind='network', path=str(csv_file)), open(csv_file, 'w') as f:
                 f.write(f"# Protocol: {protocol}\n")
                 f.write(f"# Delay: {delay}ms\n")
                 f.write(f"# Loss: {loss}%\n")
@@ -361,17 +430,7 @@ class UltraFinalAnalyzer:
             
             print(f"      Network condition CSV file saved: {csv_file}")
             
-            # Generate timestamp bar graph
-            print(f"      Generating network condition timestamp bar graph...")
-            graph_file = self.generate_timestamp_bar_graph(
-                str(csv_file), protocol, delay, loss, bandwidth
-            )
-            
-            # Generate detailed timestamp analysis
-            detailed_graph = self.generate_detailed_timestamp_analysis(
-                str(csv_file), protocol, delay, loss, bandwidth
-            )
-            
+            # Graphs are generated by the caller (run_ultra_reliable_benchmark)
             return str(csv_file)
             
         except Exception as e:
@@ -404,11 +463,17 @@ class UltraFinalAnalyzer:
         except:
             return None
     
-    def detect_ultra_boundaries(self, threshold=10.0, confidence_level=0.80):
-        """Detect ultra-final boundary values (significantly relaxed)"""
+    def detect_ultra_boundaries(self, threshold=10.0, confidence_level=0.80, paired=None):
+        """Detect ultra-final boundary values (significantly relaxed)
+        
+        paired: {(delay, loss, bandwidth): paired_differences() of HTTP/2 - HTTP/3 throughput};
+        when given, significance and the difference come from the matched pairs.
+        """
         boundaries = []
         
-        print(f"\nUltra-final boundary value detection (Threshold: {threshold}%, Confidence: {confidence_level*100:.0f}%)")
+        print(f"\nUltra-final boundary value detection (Threshold: {threshold}%, "
+              f"Confidence: {confidence_level*100:.0f}%"
+              f"{', paired' if paired is not None else ''})")
         
         # Comparison of HTTP/2 and HTTP/3 under the same conditions
         conditions = set()
@@ -434,11 +499,20 @@ class UltraFinalAnalyzer:
             print(f"    HTTP/2: {h2_throughput:.1f} ± {h2_std:.1f} req/s")
             print(f"    HTTP/3: {h3_throughput:.1f} ± {h3_std:.1f} req/s")
             
-            # Statistically significant test with significantly relaxed thresholds
-            is_significant = self.is_significant_ultra_relaxed(h2_throughput, h3_throughput, h2_std, h3_std, confidence_level)
+            pair_result = paired.get((delay, loss, bandwidth)) if paired is not None else None
+            if pair_result and pair_result['ci_low'] is not None and pair_result['mean_diff_pct'] is not None:
+                # Paired differences within schedule blocks (drift cancels out)
+                print(f"    Paired difference: {pair_result['mean_diff']:.1f} req/s "
+                      f"[{pair_result['ci_low']:.1f}, {pair_result['ci_high']:.1f}] ({pair_result['pairs']} pairs)")
+                is_significant = is_significant_paired(pair_result)
+                diff_pct = pair_result['mean_diff_pct']
+            else:
+                # Statistically significant test with significantly relaxed thresholds
+                is_significant = self.is_significant_ultra_relaxed(h2_throughput, h3_throughput, h2_std, h3_std,
+                                                                   confidence_level)
+                diff_pct = ((h2_throughput - h3_throughput) / h3_throughput) * 100
             
             if is_significant:
-                diff_pct = ((h2_throughput - h3_throughput) / h3_throughput) * 100
                 print(f"    Performance difference: {diff_pct:.1f}% (Statistically significant)")
                 
                 # Boundary value determination (significantly relaxed threshold)
@@ -486,11 +560,13 @@ class UltraFinalAnalyzer:
             print("Insufficient data")
             return
         
+        import pandas as pd
         df = pd.DataFrame(self.results)
         
         # Graph settings - adjust size to reduce blank space
-        plt.style.use('seaborn-v0_8')
-        fig, axes = plt.subplots(2, 3, figsize=(18, 10))
+        fig, axes = subplots(2, 3, figsize=(18, 10))
+        for ax in axes.flat:
+            apply_seaborn_style(ax)
         
         # Prepare data
         h2_data = df[df['protocol'] == 'http2']
@@ -630,14 +706,12 @@ class UltraFinalAnalyzer:
                 ax.text(i, value + (1 if value >= 0 else -1), f'{value:.1f}%',
                        ha='center', va='bottom' if value >= 0 else 'top', fontsize=8)
         
-        # Adjust layout to reduce blank space
-        plt.tight_layout(pad=2.0)
-        
-        # Remove bbox_inches='tight' and save with appropriate size
-        plt.savefig(self.log_dir / 'ultra_final_boundary_analysis.png', dpi=300)
-        plt.close()
+        # Adjust layout to reduce blank space, and save without bbox_inches='tight'
+        graph_file = render(fig, self.log_dir / 'ultra_final_boundary_analysis.png', self.profile_for(final=True),
+                            tight=False, layout={'pad': 2.0}, sink=self.pdf_sink)
         
-        print(f"Ultra-final graphs saved: {self.log_dir / 'ultra_final_boundary_analysis.png'}")
+        print(f"Ultra-final graphs saved: {graph_file}")
+        return graph_file
     
     def generate_ultra_report(self):
         """Generate ultra-final report"""
@@ -797,7 +871,22 @@ class UltraFinalAnalyzer:
         
         print(f"Performance comparison CSV file saved: {comparison_file}")
 
-    def generate_timestamp_bar_graph(self, csv_file, protocol, delay, loss, bandwidth):
+    def generate_paired_csv(self, paired):
+        """Generate paired HTTP/2 - HTTP/3 throughput difference CSV file"""
+        paired_file = self.log_dir / 'paired_differences.csv'
+        with open(paired_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Delay (ms)', 'Loss (%)', 'Bandwidth (Mbps)', 'Pairs', 'Mean Difference (req/s)',
+                             'Difference Std (req/s)', 'CI Low (req/s)', 'CI High (req/s)', 'Mean Difference (%)',
+                             'Significant'])
+            for (delay, loss, bandwidth), result in sorted(paired.items()):
+                writer.writerow([delay, loss, bandwidth, result['pairs'], result['mean_diff'], result['std_diff'],
+                                 result['ci_low'], result['ci_high'], result['mean_diff_pct'],
+                                 is_significant_paired(result)])
+        print(f"Paired difference CSV file saved: {paired_file}")
+        return str(paired_file)
+
+    def generate_timestamp_bar_graph(self, csv_file, protocol, delay, loss, bandwidth, profile='publication'):
         """Generate timestamp bar graph from CSV file"""
         try:
             # Read CSV file
@@ -823,50 +912,49 @@ class UltraFinalAnalyzer:
             start_time = min(timestamps)
             relative_times = [(t - start_time) / 1e9 for t in timestamps]  # Convert from nanoseconds to seconds
             
-            # Generate graph
-            plt.figure(figsize=(15, 8))
+            # Generate graph (the timestamp distribution panel is skipped in preview)
+            show_distribution = full_panels(profile)
+            fig = new_figure(figsize=(15, 8) if show_distribution else (15, 4))
             
             # Main bar graph (response time)
-            plt.subplot(2, 1, 1)
-            bars = plt.bar(range(len(relative_times)), response_times, 
-                          color='skyblue', alpha=0.7, width=0.8)
-            plt.title(f'{protocol.upper()} Timestamp Analysis - Response Time\n'
-                     f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
-                     fontsize=14, fontweight='bold')
-            plt.xlabel('Request Order', fontsize=12)
-            plt.ylabel('Response Time (μs)', fontsize=12)
-            plt.grid(True, alpha=0.3)
+            ax = fig.add_subplot(2 if show_distribution else 1, 1, 1)
+            bars = ax.bar(range(len(relative_times)), response_times, 
+                         color='skyblue', alpha=0.7, width=0.8)
+            ax.set_title(f'{protocol.upper()} Timestamp Analysis - Response Time\n'
+                        f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
+                        fontsize=14, fontweight='bold')
+            ax.set_xlabel('Request Order', fontsize=12)
+            ax.set_ylabel('Response Time (μs)', fontsize=12)
+            ax.grid(True, alpha=0.3)
             
             # Display statistics
             avg_response = np.mean(response_times)
             std_response = np.std(response_times)
-            plt.text(0.02, 0.98, f'Average: {avg_response:.1f}μs\nStandard Deviation: {std_response:.1f}μs', 
-                    transform=plt.gca().transAxes, verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+            ax.text(0.02, 0.98, f'Average: {avg_response:.1f}μs\nStandard Deviation: {std_response:.1f}μs', 
+                   transform=ax.transAxes, verticalalignment='top',
+                   bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
             
             # Timestamp distribution
-            plt.subplot(2, 1, 2)
-            plt.plot(relative_times, range(len(relative_times)), 'o-', 
-                    color='red', alpha=0.7, linewidth=1, markersize=3)
-            plt.title('Timestamp Distribution', fontsize=12, fontweight='bold')
-            plt.xlabel('Relative Time (seconds)', fontsize=12)
-            plt.ylabel('Request Order', fontsize=12)
-            plt.grid(True, alpha=0.3)
-            
-            # Statistics for time intervals
-            if len(relative_times) > 1:
-                intervals = np.diff(relative_times)
-                avg_interval = np.mean(intervals)
-                plt.text(0.02, 0.98, f'Average Interval: {avg_interval:.3f} seconds', 
-                        transform=plt.gca().transAxes, verticalalignment='top',
-                        bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
-            
-            plt.tight_layout()
+            if show_distribution:
+                ax = fig.add_subplot(2, 1, 2)
+                ax.plot(relative_times, range(len(relative_times)), 'o-', 
+                       color='red', alpha=0.7, linewidth=1, markersize=3)
+                ax.set_title('Timestamp Distribution', fontsize=12, fontweight='bold')
+                ax.set_xlabel('Relative Time (seconds)', fontsize=12)
+                ax.set_ylabel('Request Order', fontsize=12)
+                ax.grid(True, alpha=0.3)
+                
+                # Statistics for time intervals
+                if len(relative_times) > 1:
+                    intervals = np.diff(relative_times)
+                    avg_interval = np.mean(intervals)
+                    ax.text(0.02, 0.98, f'Average Interval: {avg_interval:.3f} seconds', 
+                           transform=ax.transAxes, verticalalignment='top',
+                           bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
             
             # Save file
-            graph_file = csv_file.replace('.csv', '_timestamp_analysis.png')
-            plt.savefig(graph_file, dpi=300, bbox_inches='tight')
-            plt.close()
+            graph_file = str(Path(csv_file).with_suffix('')) + '_timestamp_analysis.png'
+            graph_file = render(fig, graph_file, profile, layout=True, sink=self.pdf_sink)
             
             print(f"      Timestamp bar graph saved: {graph_file}")
             return graph_file
@@ -875,7 +963,7 @@ class UltraFinalAnalyzer:
             print(f"      Timestamp bar graph generation failed: {e}")
             return None
     
-    def generate_detailed_timestamp_analysis(self, csv_file, protocol, delay, loss, bandwidth):
+    def generate_detailed_timestamp_analysis(self, csv_file, protocol, delay, loss, bandwidth, profile='publication'):
         """Generate detailed timestamp analysis graphs (individual files)"""
         try:
             # Read CSV file
@@ -904,112 +992,113 @@ class UltraFinalAnalyzer:
             relative_times = [(t - start_time) / 1e9 for t in timestamps]
             
             # Base filename
-            base_name = csv_file.replace('.csv', '')
+            base_name = str(Path(csv_file).with_suffix(''))  # str / Path のどちらでも受け付ける
             graph_files = []
             
             # 1. Response time bar graph
-            plt.figure(figsize=(12, 8))
-            plt.bar(range(len(response_times)), response_times, 
-                   color='skyblue', alpha=0.7)
-            plt.title(f'{protocol.upper()} Response Time Distribution\n'
-                     f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
-                     fontweight='bold', fontsize=14)
-            plt.xlabel('Request Order', fontsize=12)
-            plt.ylabel('Response Time (μs)', fontsize=12)
-            plt.grid(True, alpha=0.3)
+            fig = new_figure(figsize=(12, 8))
+            ax = fig.add_subplot()
+            ax.bar(range(len(response_times)), response_times, 
+                  color='skyblue', alpha=0.7)
+            ax.set_title(f'{protocol.upper()} Response Time Distribution\n'
+                        f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
+                        fontweight='bold', fontsize=14)
+            ax.set_xlabel('Request Order', fontsize=12)
+            ax.set_ylabel('Response Time (μs)', fontsize=12)
+            ax.grid(True, alpha=0.3)
             
             # Display statistics
             avg_response = np.mean(response_times)
             std_response = np.std(response_times)
-            plt.text(0.02, 0.98, f'Average: {avg_response:.1f}μs\nStandard Deviation: {std_response:.1f}μs', 
-                    transform=plt.gca().transAxes, verticalalignment='top',
-                    bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+            ax.text(0.02, 0.98, f'Average: {avg_response:.1f}μs\nStandard Deviation: {std_response:.1f}μs', 
+                   transform=ax.transAxes, verticalalignment='top',
+                   bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
             
             response_time_file = f"{base_name}_response_time_distribution.png"
-            plt.savefig(response_time_file, dpi=300, bbox_inches='tight')
-            plt.close()
+            response_time_file = render(fig, response_time_file, profile, sink=self.pdf_sink)
             graph_files.append(response_time_file)
             print(f"      Response time distribution graph saved: {response_time_file}")
             
             # 2. Response time histogram
-            plt.figure(figsize=(12, 8))
-            plt.hist(response_times, bins=20, color='lightgreen', alpha=0.7, edgecolor='black')
-            plt.title(f'{protocol.upper()} Response Time Histogram\n'
-                     f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
-                     fontweight='bold', fontsize=14)
-            plt.xlabel('Response Time (μs)', fontsize=12)
-            plt.ylabel('Frequency', fontsize=12)
-            plt.grid(True, alpha=0.3)
+            fig = new_figure(figsize=(12, 8))
+            ax = fig.add_subplot()
+            ax.hist(response_times, bins=20, color='lightgreen', alpha=0.7, edgecolor='black')
+            ax.set_title(f'{protocol.upper()} Response Time Histogram\n'
+                        f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
+                        fontweight='bold', fontsize=14)
+            ax.set_xlabel('Response Time (μs)', fontsize=12)
+            ax.set_ylabel('Frequency', fontsize=12)
+            ax.grid(True, alpha=0.3)
             
             histogram_file = f"{base_name}_response_time_histogram.png"
-            plt.savefig(histogram_file, dpi=300, bbox_inches='tight')
-            plt.close()
+            histogram_file = render(fig, histogram_file, profile, sink=self.pdf_sink)
             graph_files.append(histogram_file)
             print(f"      Response time histogram saved: {histogram_file}")
             
-            # 3. Timestamp time series
-            plt.figure(figsize=(12, 8))
-            plt.plot(relative_times, 'o-', color='red', alpha=0.7, markersize=3)
-            plt.title(f'{protocol.upper()} Timestamp Time Series\n'
-                     f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
-                     fontweight='bold', fontsize=14)
-            plt.xlabel('Request Order', fontsize=12)
-            plt.ylabel('Relative Time (seconds)', fontsize=12)
-            plt.grid(True, alpha=0.3)
-            
-            timeseries_file = f"{base_name}_timestamp_timeseries.png"
-            plt.savefig(timeseries_file, dpi=300, bbox_inches='tight')
-            plt.close()
-            graph_files.append(timeseries_file)
-            print(f"      Timestamp time series graph saved: {timeseries_file}")
+            # 3. Timestamp time series (non-essential, skipped in preview)
+            if full_panels(profile):
+                fig = new_figure(figsize=(12, 8))
+                ax = fig.add_subplot()
+                ax.plot(relative_times, 'o-', color='red', alpha=0.7, markersize=3)
+                ax.set_title(f'{protocol.upper()} Timestamp Time Series\n'
+                            f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
+                            fontweight='bold', fontsize=14)
+                ax.set_xlabel('Request Order', fontsize=12)
+                ax.set_ylabel('Relative Time (seconds)', fontsize=12)
+                ax.grid(True, alpha=0.3)
+                
+                timeseries_file = f"{base_name}_timestamp_timeseries.png"
+                timeseries_file = render(fig, timeseries_file, profile, sink=self.pdf_sink)
+                graph_files.append(timeseries_file)
+                print(f"      Timestamp time series graph saved: {timeseries_file}")
             
-            # 4. Time interval distribution
-            if len(relative_times) > 1:
+            # 4. Time interval distribution (non-essential, skipped in preview)
+            if len(relative_times) > 1 and full_panels(profile):
                 intervals = np.diff(relative_times)
-                plt.figure(figsize=(12, 8))
-                plt.hist(intervals, bins=15, color='orange', alpha=0.7, edgecolor='black')
-                plt.title(f'{protocol.upper()} Time Interval Distribution\n'
-                         f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
-                         fontweight='bold', fontsize=14)
-                plt.xlabel('Time Interval (seconds)', fontsize=12)
-                plt.ylabel('Frequency', fontsize=12)
-                plt.grid(True, alpha=0.3)
+                fig = new_figure(figsize=(12, 8))
+                ax = fig.add_subplot()
+                ax.hist(intervals, bins=15, color='orange', alpha=0.7, edgecolor='black')
+                ax.set_title(f'{protocol.upper()} Time Interval Distribution\n'
+                            f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
+                            fontweight='bold', fontsize=14)
+                ax.set_xlabel('Time Interval (seconds)', fontsize=12)
+                ax.set_ylabel('Frequency', fontsize=12)
+                ax.grid(True, alpha=0.3)
                 
                 # Display statistics
                 avg_interval = np.mean(intervals)
                 std_interval = np.std(intervals)
-                plt.text(0.02, 0.98, f'Average Interval: {avg_interval:.3f} seconds\nInterval Standard Deviation: {std_interval:.3f} seconds', 
-                        transform=plt.gca().transAxes, verticalalignment='top',
-                        bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+                ax.text(0.02, 0.98, f'Average Interval: {avg_interval:.3f} seconds\nInterval Standard Deviation: {std_interval:.3f} seconds', 
+                       transform=ax.transAxes, verticalalignment='top',
+                       bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
                 
                 interval_file = f"{base_name}_time_interval_distribution.png"
-                plt.savefig(interval_file, dpi=300, bbox_inches='tight')
-                plt.close()
+                interval_file = render(fig, interval_file, profile, sink=self.pdf_sink)
                 graph_files.append(interval_file)
                 print(f"      Time interval distribution graph saved: {interval_file}")
             
             # 5. Response time cumulative distribution
-            plt.figure(figsize=(12, 8))
+            fig = new_figure(figsize=(12, 8))
+            ax = fig.add_subplot()
             sorted_response_times = np.sort(response_times)
             cumulative_prob = np.arange(1, len(sorted_response_times) + 1) / len(sorted_response_times)
-            plt.plot(sorted_response_times, cumulative_prob, 'b-', linewidth=2)
-            plt.title(f'{protocol.upper()} Response Time Cumulative Distribution\n'
-                     f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
-                     fontweight='bold', fontsize=14)
-            plt.xlabel('Response Time (μs)', fontsize=12)
-            plt.ylabel('Cumulative Probability', fontsize=12)
-            plt.grid(True, alpha=0.3)
+            ax.plot(sorted_response_times, cumulative_prob, 'b-', linewidth=2)
+            ax.set_title(f'{protocol.upper()} Response Time Cumulative Distribution\n'
+                        f'Conditions: Delay {delay}ms, Loss {loss}%, Bandwidth {bandwidth}Mbps', 
+                        fontweight='bold', fontsize=14)
+            ax.set_xlabel('Response Time (μs)', fontsize=12)
+            ax.set_ylabel('Cumulative Probability', fontsize=12)
+            ax.grid(True, alpha=0.3)
             
             # Add percentile lines
             percentiles = [50, 75, 90, 95, 99]
             for p in percentiles:
                 value = np.percentile(response_times, p)
-                plt.axvline(x=value, color='red', linestyle='--', alpha=0.7)
-                plt.text(value, 0.5, f'{p}%', rotation=90, verticalalignment='center')
+                ax.axvline(x=value, color='red', linestyle='--', alpha=0.7)
+                ax.text(value, 0.5, f'{p}%', rotation=90, verticalalignment='center')
             
             cumulative_file = f"{base_name}_response_time_cumulative.png"
-            plt.savefig(cumulative_file, dpi=300, bbox_inches='tight')
-            plt.close()
+            cumulative_file = render(fig, cumulative_file, profile, sink=self.pdf_sink)
             graph_files.append(cumulative_file)
             print(f"      Response time cumulative distribution graph saved: {cumulative_file}")
             
@@ -1050,6 +1139,7 @@ Time Interval Statistics:
             print(f"      Detailed timestamp analysis generation failed: {e}")
             return None
 
+    @stage_profiler.staged('csv.averaged')
     def generate_averaged_csv(self, csv_files, protocol, delay, loss, bandwidth, output_dir):
         """Generate averaged CSV file from multiple CSV files"""
         try:
@@ -1085,7 +1175,7 @@ Time Interval Statistics:
             # Generate averaged CSV file
             averaged_csv = output_dir / f"{protocol}_{delay}ms_{loss}pct_{bandwidth}mbps_averaged.csv"
             
-            with open(averaged_csv, 'w') as f:
+            with event_log.span('csv_write', kind='averaged', path=str(averaged_csv)), open(averaged_csv, 'w') as f:
                 f.write(f"# Protocol: {protocol}\n")
                 f.write(f"# Delay: {delay}ms\n")
                 f.write(f"# Loss: {loss}%\n")
@@ -1104,10 +1194,11 @@ Time Interval Statistics:
             print(f"      Averaged CSV file generation failed: {e}")
             return None
 
-def generate_timestamp_graphs_from_csv(csv_file, protocol='http2', delay=0, loss=0, bandwidth=0):
+def generate_timestamp_graphs_from_csv(csv_file, protocol='http2', delay=0, loss=0, bandwidth=0, profile='publication',
+                                       pdf_sink=None):
     """Generate timestamp bar graph from existing CSV file"""
     try:
-        analyzer = UltraFinalAnalyzer(Path(csv_file).parent)
+        analyzer = UltraFinalAnalyzer(Path(csv_file).parent, render_profile=profile, pdf_sink=pdf_sink)
         
         # Extract network conditions from filename
         filename = Path(csv_file).name
@@ -1127,10 +1218,10 @@ def generate_timestamp_graphs_from_csv(csv_file, protocol='http2', delay=0, loss
         print(f"Conditions: Protocol={protocol}, Delay={delay}ms, Loss={loss}%, Bandwidth={bandwidth}Mbps")
         
         # Generate timestamp bar graph
-        graph_file = analyzer.generate_timestamp_bar_graph(csv_file, protocol, delay, loss, bandwidth)
+        graph_file = analyzer.generate_timestamp_bar_graph(csv_file, protocol, delay, loss, bandwidth, profile=profile)
         
         # Generate detailed timestamp analysis
-        detailed_graph = analyzer.generate_detailed_timestamp_analysis(csv_file, protocol, delay, loss, bandwidth)
+        detailed_graph = analyzer.generate_detailed_timestamp_analysis(csv_file, protocol, delay, loss, bandwidth, profile=profile)
         
         if graph_file:
             print(f"Timestamp bar graph saved: {graph_file}")
@@ -1143,61 +1234,374 @@ def generate_timestamp_graphs_from_csv(csv_file, protocol='http2', delay=0, loss
         print(f"Timestamp bar graph generation failed: {e}")
         return None, None
 
-def main():
-    parser = argparse.ArgumentParser(description='Ultra-final Boundary Analysis')
-    parser.add_argument('--log_dir', default='logs/ultra_final_analysis', help='Log directory')
-    parser.add_argument('--test_conditions', nargs='+', 
-                       default=['10:0:0', '50:1:0', '100:2:0', '150:3:0', '200:5:0'],
-                       help='Test conditions (Delay:Loss:Bandwidth)')
-    parser.add_argument('--csv_file', help='Generate timestamp bar graph from existing CSV file')
+async def run_conditions(analyzer, lanes, test_conditions, protocols=('http2', 'http3'),
+                         schedule=DEFAULT_SCHEDULE, seed=None, append_schedule=False):
+    """Benchmark every condition, sharding the runs across the analyzer's testbeds
     
-    args = parser.parse_args()
+    The units (condition, protocol, repetition) are grouped into blocks by the
+    protocol schedule and queued in execution order; each testbed pulls its next
+    block as soon as its bench lane is free and runs the block back to back, and
+    each condition is finished in the background once all of its units are done.
+    append_schedule keeps the schedules already recorded in the log directory (--resume).
+    """
+    loop = asyncio.get_running_loop()
+    conditions = {}
+    for condition in test_conditions:
+        try:
+            conditions[condition] = tuple(map(int, condition.split(':')))
+        except ValueError as e:
+            print(f"Condition parsing error: {condition} - {e}")
+    
+    repetitions = [(number, score) for number in (1, 2)  # 2 measurements
+                   for score in range(1, analyzer.measurement_count + 1)]
+    futures = {(condition, protocol, repetition): loop.create_future()
+               for condition in conditions for protocol in protocols for repetition in repetitions}
+    analyzer.progress = metrics_exporter.track_progress(len(futures))
+    pending = []
+    for condition, (delay, loss, bandwidth) in conditions.items():
+        for protocol in protocols:
+            measurements = [(number, [futures[condition, protocol, (number, score)]
+                                      for score in range(1, analyzer.measurement_count + 1)])
+                            for number in (1, 2)]
+            pending.append(asyncio.create_task(
+                analyzer.finish_condition(lanes, measurements, delay, loss, bandwidth, protocol)))
+    
+    # プロトコルを交互/ランダムに並べたブロック (同じブロックの実行が対応のある組になる)
+    if schedule == 'random' and seed is None:
+        seed = random.randrange(2 ** 32)
+    blocks = build_schedule(list(conditions), protocols, repetitions, schedule, seed)
+    # 再開ごとにスケジュールを作り直すので、ブロック番号はこの ID と組で記録する
+    schedule_id = new_schedule_id()
+    schedule_file = write_schedule(analyzer.log_dir / SCHEDULE_FILE, blocks, schedule, seed, schedule_id,
+                                   append=append_schedule)
+    print(f"Protocol schedule: {schedule}" + (f" (seed {seed})" if schedule == 'random' else "")
+          + f", {len(blocks)} blocks -> {schedule_file}")
+    
+    queue = asyncio.Queue()
+    for block_index, block in enumerate(blocks):
+        queue.put_nowait((block_index, block))
+    
+    async def drive(testbed):
+        while not queue.empty():
+            block_index, block = queue.get_nowait()
+            for condition, protocol, (number, score) in block:
+                future = futures[condition, protocol, (number, score)]
+                try:
+                    future.set_result(await analyzer.run_unit(lanes, testbed, *conditions[condition], protocol,
+                                                              number, score, block=block_index,
+                                                              schedule=schedule_id))
+                except Exception as e:
+                    future.set_exception(e)
+    
+    await asyncio.gather(*(drive(testbed) for testbed in analyzer.testbeds))
+    return await asyncio.gather(*pending)
+
+def build_analysis_pipeline(analyzer, threshold=10.0, confidence_level=0.80, warmup_fraction=0.0, use_paired=True,
+                            regression=None):
+    """acquire → parse → trim → aggregate/paired → compare → render → report over the recorded campaign units
+
+    regression: options of the baseline check (registry, against, min_effect, alpha); adds a regression stage
+    """
+    state_file = analyzer.log_dir / STATE_FILE
+    pipeline = Pipeline(analyzer.log_dir / PIPELINE_CACHE_DIR)
+    
+    def load_units():
+        with open(state_file, 'r', encoding='utf-8') as f:
+            units = json.load(f)['units']
+        return {unit: entry for unit, entry in sorted(units.items())
+                if Path(entry['artifacts'].get('log_file', '')).exists()}
+    
+    def raw_fingerprint():
+        # 生ログの内容で識別 (パスや mtime が変わっても内容が同じならキャッシュを使う)
+        units = load_units()
+        return hash_files([state_file] + [units[u]['artifacts']['log_file'] for u in units])
+    
+    @pipeline.stage('acquire', fingerprint=raw_fingerprint)
+    def acquire():
+        units = {}
+        for unit, entry in load_units().items():
+            condition, protocol = unit.split('/')[:2]
+            units[unit] = {
+                'condition': tuple(int(v) for v in condition.split(':')),
+                'protocol': protocol,
+                'log_file': entry['artifacts']['log_file'],
+                'summary': entry['summary'],
+                'block': (entry.get('schedule'), entry['block']) if entry.get('block') is not None else None,
+            }
+        return units
+    
+    @pipeline.stage('parse', inputs=['acquire'])
+    def parse(acquire):
+        parsed = {}
+        for unit, info in acquire.items():
+            requests = RequestLogParser().feed_file(info['log_file'])
+            parsed[unit] = dict(info, start_us=np.asarray(requests.start_us, dtype=np.int64),
+                                duration_us=np.asarray(requests.duration_us, dtype=np.int64))
+        return parsed
+    
+    @pipeline.stage('trim', inputs=['parse'], params={'warmup_fraction': warmup_fraction})
+    def trim(parse, warmup_fraction):
+        # 各実行の先頭 warmup_fraction 分のリクエスト (開始時刻順) を除外
+        trimmed = {}
+        for unit, info in parse.items():
+            order = np.argsort(info['start_us'], kind='stable')
+            keep = order[int(len(order) * warmup_fraction):]
+            trimmed[unit] = dict(info, start_us=info['start_us'][keep], duration_us=info['duration_us'][keep])
+        return trimmed
+    
+    @pipeline.stage('aggregate', inputs=['trim'], code=[UltraFinalAnalyzer.summarize_measurements])
+    def aggregate(trim):
+        groups = {}
+        for info in trim.values():
+            groups.setdefault((info['condition'], info['protocol']), []).append(info)
+        results = []
+        for ((delay, loss, bandwidth), protocol), runs in sorted(groups.items()):
+            result = analyzer.summarize_measurements([r['summary']['throughput'] for r in runs],
+                                                     [r['summary']['latency'] for r in runs],
+                                                     delay, loss, bandwidth, protocol)
+            if result:
+                durations = np.concatenate([r['duration_us'] for r in runs]) / 1000.0
+                if durations.size:
+                    for q in (50, 95, 99):
+                        result[f'latency_p{q}_ms'] = float(np.percentile(durations, q))
+                results.append(result)
+        return results
+    
+    @pipeline.stage('paired', inputs=['acquire'], params={'confidence_level': confidence_level},
+                    code=[paired_differences])
+    def paired(acquire, confidence_level):
+        # 同じスケジュールの同じブロックで続けて実行した HTTP/2 と HTTP/3 を対応のある組として扱う
+        # (ブロックが記録されていない取り込み結果だけは (測定, スコア) で組にする)
+        throughputs = {}
+        for unit, info in acquire.items():
+            block = info.get('block') or ('repetition', '/'.join(unit.split('/')[2:]))
+            throughputs.setdefault(info['condition'], {}).setdefault(block, {})[info['protocol']] = \
+                info['summary']['throughput']
+        results = {}
+        for condition, blocks in sorted(throughputs.items()):
+            pairs = [(b['http2'], b['http3']) for _, b in sorted(blocks.items(), key=lambda item: str(item[0]))
+                     if 'http2' in b and 'http3' in b]
+            result = paired_differences(pairs, confidence_level)
+            if result:
+                results[condition] = result
+        return results
+    
+    @pipeline.stage('compare', inputs=['aggregate', 'paired'],
+                    params={'threshold': threshold, 'confidence_level': confidence_level, 'use_paired': use_paired},
+                    code=[UltraFinalAnalyzer.detect_ultra_boundaries, UltraFinalAnalyzer.is_significant_ultra_relaxed,
+                          is_significant_paired])
+    def compare(aggregate, paired, threshold, confidence_level, use_paired):
+        analyzer.results = aggregate
+        return analyzer.detect_ultra_boundaries(threshold, confidence_level, paired if use_paired else None)
+    
+    @pipeline.stage('render', inputs=['aggregate'], outputs=True,
+                    params={'profile': analyzer.profile_for(final=True), 'pdf': analyzer.pdf_sink is not None},
+                    code=[UltraFinalAnalyzer.generate_ultra_graphs])
+    def render_graphs(aggregate, profile, pdf):
+        analyzer.results = aggregate
+        graph_file = analyzer.generate_ultra_graphs()
+        return [graph_file] if graph_file else []
     
-    if args.csv_file:
-        # Generate timestamp bar graph from existing CSV file
-        generate_timestamp_graphs_from_csv(args.csv_file)
-        return
+    @pipeline.stage('report', inputs=['aggregate', 'paired', 'compare'], outputs=True,
+                    code=[UltraFinalAnalyzer.generate_ultra_report, UltraFinalAnalyzer.generate_csv_report,
+                          UltraFinalAnalyzer.generate_comparison_csv, UltraFinalAnalyzer.generate_paired_csv])
+    def report(aggregate, paired, compare):
+        analyzer.results, analyzer.boundaries = aggregate, compare
+        analyzer.generate_ultra_report()
+        outputs = [str(analyzer.log_dir / name) for name in
+                   ('ultra_final_boundary_report.txt', 'ultra_final_results.csv', 'performance_comparison.csv')]
+        if paired:
+            outputs.append(analyzer.generate_paired_csv(paired))
+        return outputs
+    
+    if regression:
+        registry = regression_baseline.BaselineRegistry(regression['registry'])
+        
+        @pipeline.stage('regression', inputs=['trim'], fingerprint=registry.digest,
+                        params={'against': regression['against'], 'min_effect': regression['min_effect'],
+                                'alpha': regression['alpha']},
+                        code=[trim_durations, regression_baseline.group_durations,
+                              regression_baseline.check_campaign, regression_baseline.compare_distributions])
+        def check_regression(trim, against, min_effect, alpha):
+            return regression_baseline.check_campaign(trim_durations(trim), registry, analyzer.log_dir,
+                                                      against, min_effect, alpha)
+    
+    return pipeline
+
+def trim_durations(trim):
+    """Per-request durations of the trim stage grouped by ('delay:loss:bandwidth', protocol)"""
+    return regression_baseline.group_durations(
+        (':'.join(str(v) for v in info['condition']), info['protocol'], info['start_us'], info['duration_us'])
+        for info in trim.values())
+
+def run_analysis(analyzer, args):
+    """Run the cached analysis pipeline over the campaign recorded in log_dir"""
+    if not (analyzer.log_dir / STATE_FILE).exists():
+        print(f"No campaign state found: {analyzer.log_dir / STATE_FILE}")
+        return False
+    print("\nAnalysis pipeline started")
+    regression = None
+    if args.check_baseline:
+        regression = {'registry': args.registry, 'against': args.against, 'min_effect': args.min_effect,
+                      'alpha': args.alpha}
+    pipeline = build_analysis_pipeline(analyzer, args.threshold, args.confidence, args.warmup_fraction,
+                                       use_paired=not args.unpaired, regression=regression)
+    outputs = pipeline.run()
+    if not pipeline.values.get('aggregate', True):
+        print("No valid results found")
+        return False
+    for path in outputs['render'] + outputs['report']:
+        print(f"  {path}")
+    if 'regression' in outputs:
+        analyzer.regressions = outputs['regression']
+        regression_baseline.print_results(analyzer.regressions, args.min_effect, args.alpha)
+    if args.mark_baseline:
+        # 比較の後に登録 (同じキャンペーン同士を比べないように)
+        stack = args.stack or regression_baseline.stack_version(args.simulate)
+        regression_baseline.BaselineRegistry(args.registry).mark(trim_durations(pipeline.value('trim')), stack,
+                                                                 analyzer.log_dir)
+        print(f"Marked as baseline of stack {stack} in {args.registry}")
+    return True
+
+def run_campaign(args, pdf_sink=None):
+    """Run the benchmark for every test condition and generate graphs and reports
+
+    Returns the results of the baseline check (empty without --check_baseline).
+    """
+    if args.analyze_only:
+        # Re-run only the analysis stages whose inputs or parameters changed
+        analyzer = UltraFinalAnalyzer(args.log_dir, render_profile=args.render_profile, pdf_sink=pdf_sink)
+        if run_analysis(analyzer, args) and args.html_report:
+            with stage_profiler.stage('report.html'):
+                generate_html_report(args.log_dir)
+        return analyzer.regressions
     
     # Normal benchmark execution
-    analyzer = UltraFinalAnalyzer(args.log_dir)
+    if args.simulate:
+        simulated_testbed.configure(seed=args.sim_seed, time_scale=args.sim_time_scale)
+    state = CampaignState(Path(args.log_dir) / STATE_FILE, resume=args.resume,
+                          params={'test_conditions': args.test_conditions})
+    if args.resume:
+        print(f"Resuming campaign: {len(state)} completed units in {state.path}")
+    analyzer = UltraFinalAnalyzer(args.log_dir, render_profile=args.render_profile,
+                                  intermediate_graphs=not args.html_report, pdf_sink=pdf_sink,
+                                  use_agent=not args.no_agent, log_transport=args.log_transport, state=state,
+                                  testbeds=load_testbeds(args.testbeds, simulate=args.simulate),
+                                  backend=H2loadBackend(requests=args.requests, connections=args.clients, threads=2,
+                                                        streams=args.streams))
     
     print("Ultra-final Boundary Analysis Started")
     print(f"Log directory: {args.log_dir}")
     print(f"Test conditions: {args.test_conditions}")
+    print(f"Testbeds: {analyzer.testbeds}")
     
-    # Execute benchmark
-    for condition in args.test_conditions:
-        try:
-            delay, loss, bandwidth = map(int, condition.split(':'))
-            print(f"\nCondition: Delay={delay}ms, Loss={loss}%, Bandwidth={bandwidth}Mbps")
-        
-            # HTTP/2 test
-            h2_result = analyzer.run_ultra_reliable_benchmark(delay, loss, bandwidth, 'http2')
-            if h2_result:
-                analyzer.results.append(h2_result)
-            
-            # HTTP/3 test
-            h3_result = analyzer.run_ultra_reliable_benchmark(delay, loss, bandwidth, 'http3')
-            if h3_result:
-                analyzer.results.append(h3_result)
-        
-        except ValueError as e:
-            print(f"Condition parsing error: {condition} - {e}")
-            continue
-    
-    if analyzer.results:
-        print("\nBoundary value detection started")
-        analyzer.detect_ultra_boundaries()
-        
-        print("\nGraph generation started")
-        analyzer.generate_ultra_graphs()
+    if args.metrics_port:
+        metrics_exporter.serve(args.metrics_port)
+    if args.system_sampler:
+        system_sampler.start(args.log_dir, args.system_sampler)
     
-        print("\nReport generation started")
-        analyzer.generate_ultra_report()
+    # Orchestration timing of every step (appended to the previous campaign's log on --resume)
+    events = event_log.open_log(Path(args.log_dir) / event_log.EVENT_FILE, append=args.resume,
+                                test_conditions=args.test_conditions, schedule=args.schedule,
+                                testbeds=[testbed.name for testbed in analyzer.testbeds], simulated=args.simulate)
+    try:
+        # Execute benchmark (one serial bench lane per testbed, post-processing overlaps with the next runs)
+        with CampaignLanes(post_workers=args.post_workers,
+                           bench_lanes=[testbed.name for testbed in analyzer.testbeds]) as lanes:
+            with stage_profiler.stage('campaign'), event_log.span('benchmark_phase'):
+                results = asyncio.run(run_conditions(analyzer, lanes, args.test_conditions,
+                                                     schedule=args.schedule, seed=args.schedule_seed,
+                                                     append_schedule=args.resume))
+        system_sampler.stop()  # 解析の負荷はトレースに含めない
+        
+        # Boundary detection, graphs and reports (cached per stage in <log_dir>/.pipeline_cache)
+        with event_log.span('analysis_phase'):
+            analyzed = any(results) and run_analysis(analyzer, args)
+            if analyzed and args.html_report:
+                with stage_profiler.stage('report.html'):
+                    generate_html_report(args.log_dir)
+    finally:
+        event_log.close_log()
+        metrics_exporter.shutdown()
+        system_sampler.stop()
     
+    event_log.print_summary([summary for summary in event_log.summarize(event_log.read_events(events.path))
+                             if summary['campaign'] == events.campaign])
+    if analyzed:
         print(f"\nAnalysis complete: {args.log_dir}")
     else:
         print("No valid results found")
+    return analyzer.regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Ultra-final Boundary Analysis')
+    parser.add_argument('--log_dir', default='logs/ultra_final_analysis', help='Log directory')
+    parser.add_argument('--test_conditions', nargs='+', 
+                       default=['10:0:0', '50:1:0', '100:2:0', '150:3:0', '200:5:0'],
+                       help='Test conditions (Delay:Loss:Bandwidth)')
+    parser.add_argument('--csv_file', help='Generate timestamp bar graph from existing CSV file')
+    add_render_profile_argument(parser, default='auto', extra_choices=['auto'])
+    parser.add_argument('--html_report', action='store_true',
+                        help='Write an interactive HTML report instead of per-score/ave PNG graphs')
+    parser.add_argument('--pdf', help='Write all figures into this multi-page PDF instead of PNG files')
+    parser.add_argument('--no_agent', action='store_true',
+                        help='Use a separate docker exec/cp per command instead of the persistent exec agent')
+    parser.add_argument('--analyze_only', action='store_true',
+                        help='Skip benchmarking and re-run the cached analysis pipeline on log_dir')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Boundary threshold (%%)')
+    parser.add_argument('--confidence', type=float, default=0.80, help='Confidence level for boundary detection')
+    parser.add_argument('--warmup_fraction', type=float, default=0.0,
+                        help='Fraction of each run\'s requests (by start time) excluded from latency percentiles')
+    parser.add_argument('--resume', action='store_true',
+                        help=f'Skip units already recorded in <log_dir>/{STATE_FILE} and continue the campaign')
+    parser.add_argument('--testbeds', help='JSON list of independent client/router/server stacks to shard runs across')
+    parser.add_argument('--post_workers', type=int, default=DEFAULT_POST_WORKERS,
+                        help='Concurrent post-processing lanes (CSV, averaging, graphs) beside the serial bench lane')
+    parser.add_argument('--schedule', choices=SCHEDULES, default=DEFAULT_SCHEDULE,
+                        help='Protocol order: sequential (all HTTP/2 then HTTP/3), abba (alternating pairs) '
+                             'or random (seeded shuffled pairs)')
+    parser.add_argument('--schedule_seed', type=int, help='Seed for --schedule random (recorded in the schedule file)')
+    parser.add_argument('--unpaired', action='store_true',
+                        help='Compare protocols as independent samples instead of paired differences')
+    parser.add_argument('--requests', type=int, default=1000, help='h2load requests per run (-n)')
+    parser.add_argument('--clients', type=int, default=5, help='h2load concurrent clients per run (-c)')
+    parser.add_argument('--streams', type=int, help='h2load max concurrent streams per client (-m)')
+    parser.add_argument('--simulate', action='store_true',
+                        help='Run h2load and tc against the simulated testbed model instead of the containers')
+    parser.add_argument('--sim_seed', type=int, help='Seed of the simulated testbed (reproducible logs)')
+    parser.add_argument('--sim_time_scale', type=float, default=0.0,
+                        help='Sleep this fraction of each simulated run\'s duration (0: return immediately)')
+    parser.add_argument('--log_transport', choices=LOG_TRANSPORTS, default=DEFAULT_LOG_TRANSPORT,
+                        help='stream: pipe per-request logs over stdout and parse during the run; '
+                             'file: unique log path in the container, copied out afterwards')
+    parser.add_argument('--check_baseline', action='store_true',
+                        help='Compare per-request latencies with the baseline registry; exit status '
+                             f'{regression_baseline.REGRESSION_EXIT} on regressions')
+    parser.add_argument('--mark_baseline', action='store_true',
+                        help='Register this campaign as the baseline of its stack version for each condition')
+    regression_baseline.add_regression_arguments(parser)
+    metrics_exporter.add_metrics_argument(parser)
+    system_sampler.add_sampler_argument(parser)
+    stage_profiler.add_profile_argument(parser)
+    
+    args = parser.parse_args()
+    
+    pdf_sink = PdfSink(args.pdf) if args.pdf else None
+    profile_dir = Path(args.csv_file).parent if args.csv_file else args.log_dir
+    regressions = []
+    try:
+        with stage_profiler.profiling(args.profile, profile_dir, 'ultra_final_analysis', memory=args.profile_memory):
+            if args.csv_file:
+                # Generate timestamp bar graph from existing CSV file
+                profile = 'publication' if args.render_profile == 'auto' else args.render_profile
+                generate_timestamp_graphs_from_csv(args.csv_file, profile=profile, pdf_sink=pdf_sink)
+            else:
+                regressions = run_campaign(args, pdf_sink)
+    finally:
+        if pdf_sink:
+            pdf_sink.close()
+    if regression_baseline.has_regressions(regressions):
+        sys.exit(regression_baseline.REGRESSION_EXIT)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
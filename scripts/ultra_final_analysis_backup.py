@@ -8,7 +8,6 @@ import time
 import subprocess
 import numpy as np
 import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
 from pathlib import Path
 import argparse
@@ -16,73 +15,9 @@ import sys
 import csv
 import os
 
-# 日本語フォント設定
-import matplotlib.font_manager as fm
-import platform
-import subprocess
-
-# macOSで日本語フォントを確実に設定
-if platform.system() == 'Darwin':  # macOS
-    # システムフォントを直接確認
-    try:
-        # fc-listコマンドで日本語フォントを検索
-        result = subprocess.run(['fc-list', ':lang=ja'], capture_output=True, text=True)
-        if result.returncode == 0 and result.stdout:
-            # 日本語フォントが見つかった場合
-            japanese_fonts = [
-                'Hiragino Sans',
-                'Hiragino Kaku Gothic ProN', 
-                'Yu Gothic',
-                'Arial Unicode MS',
-                'Noto Sans CJK JP',
-                'Source Han Sans JP',
-                'Takao',
-                'VL Gothic',
-                'IPAGothic'
-            ]
-            
-            # 利用可能な日本語フォントを探す
-            font_found = False
-            for font_name in japanese_fonts:
-                try:
-                    # フォントの存在確認
-                    font_path = fm.findfont(fm.FontProperties(family=font_name))
-                    if font_path and 'DejaVu' not in font_path:
-                        plt.rcParams['font.family'] = font_name
-                        font_found = True
-                        print(f"日本語フォント設定: {font_name}")
-                        break
-                except Exception:
-                    continue
-            
-            if not font_found:
-                # フォールバック: システムフォントリストから日本語フォントを探す
-                font_list = result.stdout.split('\n')
-                for font_line in font_list:
-                    if any(name in font_line for name in ['Hiragino', 'Yu Gothic', 'Arial Unicode']):
-                        font_name = font_line.split(':')[0].split(',')[0].strip()
-                        plt.rcParams['font.family'] = font_name
-                        print(f"システム日本語フォント設定: {font_name}")
-                        font_found = True
-                        break
-                
-                if not font_found:
-                    # 最後のフォールバック: デフォルトフォントを使用
-                    plt.rcParams['font.family'] = 'Arial'
-                    print("英語フォントを使用（日本語フォントが見つかりません）")
-        else:
-            # fc-listが利用できない場合
-            plt.rcParams['font.family'] = 'Arial'
-            print("英語フォントを使用（fc-listが利用できません）")
-    except Exception:
-        plt.rcParams['font.family'] = 'Arial'
-        print("英語フォントを使用（フォント検索エラー）")
-elif platform.system() == 'Linux':
-    plt.rcParams['font.family'] = 'DejaVu Sans'
-else:  # Windows
-    plt.rcParams['font.family'] = 'MS Gothic'
-
-plt.rcParams['axes.unicode_minus'] = False
+# 日本語フォント設定 (fc-list を毎回呼ばずに解決結果を font_cache にキャッシュ)
+from font_cache import apply_japanese_font
+apply_japanese_font()
 
 class UltraFinalAnalyzer:
     def __init__(self, log_dir):